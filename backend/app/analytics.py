@@ -0,0 +1,154 @@
+"""
+Sales analytics served from the sales_daily_rollups table.
+
+Purchases by regular users upsert one (sweet, day) row in the same transaction as the
+stock update, so reports scan O(days x sweets) rows however long purchase_history grows.
+A sharded sweet (app.inventory) spreads its day over one row per stock shard - `bucket`,
+picked at random like the shard - so its concurrent buyers don't queue on a single
+rollup row; reports sum the buckets. Weeks (starting Monday) and months are folded from
+the daily rows in Python.
+"""
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import SalesDailyRollup, Sweet
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE; others fall back to update-then-insert
+_UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+# The sale's day as the database sees it: CURRENT_DATE is taken at the same moment as the
+# purchase's now() default, so the live rollup matches date(purchased_at), as in the 0003 backfill
+SALE_DAY = func.current_date()
+
+def rollup_upsert(dialect_name: str):
+    """INSERT ... ON CONFLICT statement adding a purchase line to its (sweet, day) totals"""
+    table = SalesDailyRollup.__table__
+    statement = _UPSERT_INSERTS[dialect_name](table).values(day=SALE_DAY)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.sweet_id, table.c.day, table.c.bucket],
+        set_={
+            "units": table.c.units + statement.excluded.units,
+            "revenue": table.c.revenue + statement.excluded.revenue,
+            "purchases": table.c.purchases + statement.excluded.purchases,
+        },
+    )
+
+def _add_to_rollup_row(db: Session, row: dict) -> int:
+    table = SalesDailyRollup.__table__
+    return db.execute(
+        update(table)
+        .where(table.c.sweet_id == row["sweet_id"], table.c.day == SALE_DAY, table.c.bucket == row["bucket"])
+        .values(
+            units=table.c.units + row["units"],
+            revenue=table.c.revenue + row["revenue"],
+            purchases=table.c.purchases + row["purchases"],
+        )
+    ).rowcount
+
+def add_to_rollup(db: Session, rows: list):
+    """Add rollup_rows to today's totals: one upsert statement, or update-then-insert per row on other databases"""
+    if not rows:
+        return
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name in _UPSERT_INSERTS:
+        db.execute(rollup_upsert(dialect_name), rows)
+        return
+    for row in rows:
+        if _add_to_rollup_row(db, row):
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(insert(SalesDailyRollup).values(day=SALE_DAY), [row])
+        except IntegrityError:
+            # A concurrent purchase created today's row first
+            _add_to_rollup_row(db, row)
+
+def rollup_rows(current_user, history: list, shards: dict = None) -> list:
+    """
+    Rollup parameters for PurchaseHistory values (see routers.sweets.history_values);
+    `shards` maps sharded sweets to their shard count. Admin purchases are left out,
+    matching the admin purchase-history report.
+    """
+    if current_user.role != "user":
+        return []
+    shards = shards or {}
+    return [
+        {
+            "sweet_id": line["sweet_id"],
+            "bucket": random.randrange(shards[line["sweet_id"]]) if shards.get(line["sweet_id"]) else 0,
+            "units": line["quantity"],
+            "revenue": line["total_price"],
+            "purchases": 1,
+        }
+        for line in history
+    ]
+
+def period_start(day: date, period: str) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+def admin_sales_query(admin_id: int, start: date = None, end: date = None):
+    """Daily totals (buckets summed) for the sweets this admin created, with the sweet's name and category"""
+    query = select(
+        SalesDailyRollup.day,
+        SalesDailyRollup.sweet_id,
+        Sweet.name,
+        Sweet.category,
+        func.sum(SalesDailyRollup.units).label("units"),
+        func.sum(SalesDailyRollup.revenue).label("revenue"),
+        func.sum(SalesDailyRollup.purchases).label("purchases"),
+    ).join(
+        Sweet, Sweet.id == SalesDailyRollup.sweet_id
+    ).where(
+        Sweet.created_by_user_id == admin_id
+    )
+    if start is not None:
+        query = query.where(SalesDailyRollup.day >= start)
+    if end is not None:
+        query = query.where(SalesDailyRollup.day < end)
+    return query.group_by(
+        SalesDailyRollup.day, SalesDailyRollup.sweet_id, Sweet.name, Sweet.category
+    ).order_by(SalesDailyRollup.day, SalesDailyRollup.sweet_id)
+
+def _totals():
+    return {"units": 0, "revenue": Decimal("0"), "purchases": 0}
+
+def _add(totals: dict, row):
+    totals["units"] += row.units
+    totals["revenue"] += Decimal(row.revenue)
+    totals["purchases"] += row.purchases
+
+def summarize(rows, period: str = "day") -> dict:
+    """Fold daily rollup rows into overall, per-period, per-sweet and per-category totals"""
+    overall = _totals()
+    by_period = defaultdict(_totals)
+    by_sweet = {}
+    by_category = defaultdict(_totals)
+    for row in rows:
+        _add(overall, row)
+        _add(by_period[period_start(row.day, period)], row)
+        if row.sweet_id not in by_sweet:
+            by_sweet[row.sweet_id] = {"sweet_id": row.sweet_id, "sweet_name": row.name, "category": row.category, **_totals()}
+        _add(by_sweet[row.sweet_id], row)
+        _add(by_category[row.category], row)
+    return {
+        "period": period,
+        "totals": overall,
+        "by_period": [{"period_start": key, **value} for key, value in sorted(by_period.items())],
+        "by_sweet": sorted(by_sweet.values(), key=lambda item: (-item["revenue"], item["sweet_id"])),
+        "by_category": sorted(
+            ({"category": key, **value} for key, value in by_category.items()),
+            key=lambda item: (-item["revenue"], item["category"]),
+        ),
+    }
@@ -0,0 +1,221 @@
+"""
+Streaming catalog import (POST /api/sweets/import).
+
+The upload is read chunk by chunk from the request body and parsed record by record
+(CSV or NDJSON), so memory use depends on IMPORT_CHUNK_SIZE, not on the file size.
+Valid rows are written in chunked bulk statements, one transaction per chunk - COPY on
+PostgreSQL (psycopg2), multi-row INSERTs elsewhere. Invalid rows are reported by line
+number and skipped.
+"""
+import csv
+import io
+import json
+from typing import Iterable, Iterator
+import anyio
+from fastapi import Request
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from app import inventory
+from app.models import Sweet
+from app.schemas import SweetCreate
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Valid rows written per statement/transaction
+IMPORT_CHUNK_SIZE = 1000
+
+# Stop listing individual errors after this many (they are still counted)
+MAX_REPORTED_ERRORS = 1000
+
+COLUMNS = ("name", "category", "price", "quantity")
+
+class ChunkReader(io.RawIOBase):
+    """Readable binary stream over an iterator of byte chunks (e.g. a request body)"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            self._pending = next(self._chunks, None)
+            if self._pending is None:
+                self._pending = b""
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+def body_chunks(request: Request) -> Iterator[bytes]:
+    """
+    Request body as a plain iterator, for parsing in a worker thread (run_in_threadpool):
+    each chunk is awaited on the event loop as the parser asks for it.
+    """
+    stream = request.stream()
+
+    async def next_chunk():
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    while (chunk := anyio.from_thread.run(next_chunk)) is not None:
+        yield chunk
+
+def text_stream(chunks: Iterable[bytes]) -> io.TextIOWrapper:
+    # utf-8-sig drops the BOM spreadsheet exports like to add; newline="" is what csv expects
+    return io.TextIOWrapper(io.BufferedReader(ChunkReader(chunks)), encoding="utf-8-sig", newline="")
+
+def detect_format(content_type: str) -> str:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    for name, expected in FORMATS.items():
+        if media_type == expected:
+            return name
+    if media_type in ("application/jsonl", "application/json-lines"):
+        return "ndjson"
+    return None
+
+def csv_records(stream) -> Iterator[tuple]:
+    """(line number, dict) for each CSV record; the first line is the header"""
+    reader = csv.DictReader(stream)
+    missing = [column for column in COLUMNS if column not in (reader.fieldnames or ())]
+    if missing:
+        yield 1, ValueError(f"CSV header is missing: {', '.join(missing)}")
+        return
+    for record in reader:
+        yield reader.line_num, record
+
+def ndjson_records(stream) -> Iterator[tuple]:
+    """(line number, dict) for each non-blank NDJSON line"""
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, ValueError(f"invalid JSON: {e.msg}")
+            continue
+        if not isinstance(record, dict):
+            yield line_number, ValueError("expected a JSON object")
+            continue
+        yield line_number, record
+
+PARSERS = {
+    "csv": csv_records,
+    "ndjson": ndjson_records,
+}
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, item['loc'])) or 'row'}: {item['msg']}" for item in error.errors()
+    )
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+# --- Writers ---
+
+def _copy_rows(db: Session, rows: list):
+    """COPY ... FROM STDIN: the fastest bulk load psycopg2 offers"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row["name"], row["category"], row["price"], row["quantity"], row["created_by_user_id"]])
+    buffer.seek(0)
+    cursor = db.connection().connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            "COPY sweets (name, category, price, quantity, created_by_user_id) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+def _insert_rows(db: Session, rows: list):
+    bind = db.get_bind()
+    if bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2":
+        _copy_rows(db, rows)
+    else:
+        db.execute(insert(Sweet), rows)
+
+def _update_rows(db: Session, rows: list):
+    # ORM bulk UPDATE by primary key: one executemany for the whole chunk
+    db.execute(update(Sweet), rows)
+
+def write_chunk(db: Session, rows: list, admin_id: int, upsert: bool, report: ImportReport):
+    """Write one chunk of validated rows in its own transaction"""
+    if upsert:
+        # The admin's own sweets with the same name are updated in place; a name repeated
+        # within the chunk keeps its last row
+        by_name = {row["name"]: row for row in rows}
+        existing = {sweet.name: sweet for sweet in db.execute(
+            select(Sweet.name, Sweet.id, Sweet.stock_shards).where(
+                Sweet.created_by_user_id == admin_id, Sweet.name.in_(by_name), Sweet.deleted_at.is_(None)
+            )
+        )}
+        updates = [{**row, "id": existing[name].id} for name, row in by_name.items() if name in existing]
+        rows = [row for name, row in by_name.items() if name not in existing]
+        if updates:
+            _update_rows(db, updates)
+            report.updated += len(updates)
+        # Sharded sweets keep their stock in counter rows (app.inventory)
+        for name, row in by_name.items():
+            if name in existing and existing[name].stock_shards:
+                inventory.rebalance(db, existing[name].id, total=row["quantity"])
+    if rows:
+        _insert_rows(db, rows)
+        report.inserted += len(rows)
+    db.commit()
+
+def import_sweets(db: Session, chunks: Iterable[bytes], file_format: str, admin_id: int,
+                  upsert: bool = False, chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    """Parse, validate and write an uploaded catalog; returns the import report"""
+    report = ImportReport()
+    pending = []
+    line = 0
+    try:
+        for line, record in PARSERS[file_format](text_stream(chunks)):
+            if isinstance(record, Exception):
+                report.error(line, str(record))
+                continue
+            try:
+                sweet = SweetCreate.model_validate(record)
+            except ValidationError as e:
+                report.error(line, _describe(e))
+                continue
+            pending.append({**sweet.model_dump(), "created_by_user_id": admin_id})
+            if len(pending) >= chunk_size:
+                write_chunk(db, pending, admin_id, upsert, report)
+                pending = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        # The rest of the upload can't be read; keep what was parsed so far
+        report.error(line + 1, f"unreadable input, import stopped: {e}")
+    if pending:
+        write_chunk(db, pending, admin_id, upsert, report)
+    return report.as_dict()
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional
+from app.database import settings
+
+@dataclass(frozen=True)
+class CachedUser:
+    """
+    Detached, read-only copy of the User columns request handlers rely on.
+    ORM instances can't be shared between sessions, so the cache stores these instead.
+    """
+    id: int
+    username: str
+    email: str
+    role: str
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user) -> "CachedUser":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            role=user.role,
+            created_at=user.created_at,
+        )
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after a fixed time-to-live. With
+    `max_bytes`, least recently used entries are also dropped once the `weigh`ed values
+    add up to more than that.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, max_bytes: int = 0, weigh: Callable = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.weigh = weigh
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl_seconds > 0
+
+    def _weight(self, value) -> int:
+        return self.weigh(value) if self.weigh is not None and self.max_bytes > 0 else 0
+
+    def _pop(self, key):
+        # Caller holds the lock
+        value, _ = self._entries.pop(key)
+        self._bytes -= self._weight(value)
+
+    def _store(self, key, value):
+        # Caller holds the lock
+        if key in self._entries:
+            self._pop(key)
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._bytes += self._weight(value)
+        while len(self._entries) > self.max_size or (self.max_bytes > 0 and self._bytes > self.max_bytes):
+            self._pop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                self._pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._store(key, value)
+
+    def add(self, key, value) -> bool:
+        """Set `key` only if it is absent or expired; True if this call stored it"""
+        if not self.enabled:
+            return True
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] >= time.monotonic():
+                return False
+            self._store(key, value)
+            return True
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+# Resolved users keyed by token subject (username)
+user_cache = TTLCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+)
+
+# Users who wrote recently, keyed by user id - their reads stay on the primary (see get_read_db)
+recent_writers = TTLCache(
+    max_size=65536,
+    ttl_seconds=settings.READ_YOUR_WRITES_SECONDS,
+)
+
+def mark_recent_write(user_id: int):
+    recent_writers.set(user_id, True)
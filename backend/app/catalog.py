@@ -0,0 +1,81 @@
+import hashlib
+import logging
+import threading
+import uuid
+from typing import Optional
+from fastapi import Request, Response, status
+from app.database import settings
+
+logger = logging.getLogger(__name__)
+
+class CatalogVersion:
+    """
+    In-process version stamp of the sweets catalog.
+    Every write to sweets bumps it after commit, so an unchanged stamp means an unchanged
+    catalog. The random epoch keeps stamps from different processes/restarts from colliding.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def bump(self):
+        with self._lock:
+            self._version += 1
+
+    @property
+    def stamp(self) -> str:
+        return f"{self.epoch}-{self._version}"
+
+catalog_version = CatalogVersion()
+
+def etags_enabled(requested: bool, workers: int, bus: str) -> bool:
+    """
+    ETags only where every write reaches this process's CatalogVersion: one worker, or
+    several relaying their writes through SSE_BUS=postgres (see app.events). Otherwise
+    a worker that didn't serve a write would answer 304 for a stale catalog.
+    """
+    if not requested:
+        return False
+    if workers > 1 and bus != "postgres":
+        logger.warning(
+            "catalog ETags disabled: %d workers need SSE_BUS=postgres to share catalog versions", workers
+        )
+        return False
+    return True
+
+catalog_etags = etags_enabled(settings.CATALOG_ETAGS, settings.WEB_CONCURRENCY, settings.SSE_BUS)
+
+# Authenticated responses: browsers may store them but must revalidate every time
+CACHE_CONTROL = "private, no-cache"
+
+def catalog_etag(request: Request) -> str:
+    """Strong ETag for a catalog read: catalog version plus the query string that shaped the response"""
+    query = request.url.query
+    variant = hashlib.sha1(query.encode()).hexdigest()[:12] if query else "all"
+    return f'"{catalog_version.stamp}-{variant}"'
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+def check_not_modified(request: Request, response: Response) -> Optional[Response]:
+    """
+    Return a 304 response if the client already has the current catalog representation,
+    otherwise tag `response` with the ETag and return None.
+    Call this before querying, so a write that lands mid-request can only make the tag stale.
+    Does nothing when ETags are off (see etags_enabled).
+    """
+    if not catalog_etags:
+        return None
+    etag = catalog_etag(request)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and _matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -1,11 +1,13 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import sys
 import os
 from pathlib import Path
 from dotenv import load_dotenv  # We still need this for the other keys
+from app.metrics import TimedQueuePool
 
 # --- Configuration ---
 
@@ -37,6 +39,90 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 hours
     DEBUG: bool = False
     
+    # In-process cache of authenticated users (0 disables it)
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 1024
+    
+    # bcrypt process pool (0 workers = one per CPU); jobs beyond workers + queue limit get a 503
+    PASSWORD_HASH_WORKERS: int = 0
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64
+    
+    # Logging: LOG_LEVEL=OFF disables it; debug lines can be sampled per route prefix,
+    # e.g. LOG_DEBUG_SAMPLE_ROUTES="/api/sweets=0.01,/api/auth=1"
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" or "text"
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_DEBUG_SAMPLE_RATE: float = 1.0
+    LOG_DEBUG_SAMPLE_ROUTES: str = ""
+    
+    # Opt-in asyncio stack: serve the hot endpoints from app/routers/*_async.py on an AsyncEngine.
+    # ASYNC_DATABASE_URL defaults to DATABASE_URL with an asyncio driver (asyncpg / aiosqlite).
+    ASYNC_DB: bool = False
+    ASYNC_DATABASE_URL: str = ""
+    
+    # Optional read replica for the history, export and analytics reads (empty = everything uses
+    # DATABASE_URL). The ETag'd catalog and search stay on the primary.
+    # A user who wrote within READ_YOUR_WRITES_SECONDS keeps reading from the primary,
+    # so they never see the replica lag behind their own purchase.
+    DATABASE_READ_URL: str = ""
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    
+    # Deleted sweets are hidden at once and purged by a background thread (app/purge.py):
+    # their purchase history is moved to purchase_history_archive ("archive") or dropped
+    # ("delete") in batches. Archive mode keeps the sweet's sales rollups (and its row) for
+    # /admin/analytics. An interval of 0 turns the purger off.
+    SWEET_PURGE_MODE: str = "archive"
+    SWEET_PURGE_BATCH_SIZE: int = 1000
+    SWEET_PURGE_INTERVAL_SECONDS: float = 60.0
+    
+    # Catalog and search reads carry an ETag and answer 304 while nothing changed
+    # (app/catalog.py). The version behind the tag lives in each process, so with several
+    # workers (WEB_CONCURRENCY, which uvicorn also takes as its --workers default) ETags
+    # stay off unless SSE_BUS=postgres brings every worker's writes to every worker.
+    CATALOG_ETAGS: bool = True
+    WEB_CONCURRENCY: int = 1
+    
+    # List endpoints encode their rows directly with orjson instead of validating each one
+    # through the response model (app/serialization.py); same JSON either way
+    FAST_JSON: bool = True
+    
+    # Write requests with an Idempotency-Key header are answered once and replayed from
+    # an in-process store for this long (app/idempotency.py); 0 disables it
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_MAX_KEYS: int = 100000
+    # Total response bytes the store keeps; least recently used responses go first
+    IDEMPOTENCY_MAX_BYTES: int = 64 * 1024 * 1024
+    
+    # Write-behind purchase history (app/write_behind.py): purchases append their history
+    # rows to purchase_history_outbox and a background thread moves them to
+    # purchase_history in batches every PURCHASE_HISTORY_FLUSH_INTERVAL_SECONDS
+    PURCHASE_HISTORY_WRITE_BEHIND: bool = False
+    PURCHASE_HISTORY_FLUSH_BATCH_SIZE: int = 500
+    PURCHASE_HISTORY_FLUSH_INTERVAL_SECONDS: float = 1.0
+    
+    # Stock change events (GET /api/sweets/events, app/events.py). "local" fans them out to
+    # this process's clients only; "postgres" relays them through LISTEN/NOTIFY so clients
+    # of every worker see every write. A client more than SSE_QUEUE_SIZE events behind is
+    # told to refetch; the last SSE_HISTORY_SIZE events are kept for Last-Event-ID resumes.
+    SSE_BUS: str = "local"
+    SSE_KEEPALIVE_SECONDS: float = 15.0
+    SSE_QUEUE_SIZE: int = 1000
+    SSE_HISTORY_SIZE: int = 1000
+    
+    # Token-bucket limits on login, register, password reset and purchase, per client IP and
+    # per username/email/user (app/ratelimit.py). RATE_LIMITS overrides the defaults, e.g.
+    # "login.ip=50/60,purchase.user=0"; RATE_LIMIT_BACKEND (a database URL) shares the
+    # buckets between workers instead of keeping them in each process.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMITS: str = ""
+    RATE_LIMIT_BACKEND: str = ""
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # Reverse proxies in front of the app that append to X-Forwarded-For (1 on Railway or
+    # Heroku). The per-IP buckets use the entry that many hops from the right - the one
+    # the outermost proxy wrote - so addresses a client puts in the header are ignored;
+    # 0 uses the connecting address.
+    RATE_LIMIT_PROXY_HOPS: int = 0
+    
     model_config = SettingsConfigDict(
         case_sensitive=False,  # Allow lowercase access
         env_file=".env",
@@ -65,6 +151,7 @@ if settings.DATABASE_URL:
 
 engine = create_engine(
     settings.DATABASE_URL, # This will use the hardcoded URL
+    poolclass=TimedQueuePool,  # QueuePool that reports checkout waits to /metrics
     pool_pre_ping=True,
     pool_recycle=3600,
 )
@@ -72,6 +159,39 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Read replica: its own pool, used only through dependencies.get_read_db
+read_engine = None
+ReadSessionLocal = None
+if settings.DATABASE_READ_URL:
+    read_engine = create_engine(
+        settings.DATABASE_READ_URL,
+        poolclass=TimedQueuePool,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+    )
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+def to_async_url(url: str) -> str:
+    """Swap the sync driver in a database URL for its asyncio counterpart"""
+    scheme, _, rest = url.partition("://")
+    backend = scheme.split("+")[0]
+    if backend in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    if backend == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+# Only built when ASYNC_DB is on, so the asyncio drivers stay optional
+async_engine = None
+AsyncSessionLocal = None
+if settings.ASYNC_DB:
+    async_engine = create_async_engine(
+        settings.ASYNC_DATABASE_URL or to_async_url(settings.DATABASE_URL),
+        pool_pre_ping=True,
+        pool_recycle=3600,
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # --- Dependency ---
 
 def get_db():
@@ -79,4 +199,10 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database access requires ASYNC_DB=true")
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
@@ -1,35 +1,33 @@
+import logging
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app import database
+from app.database import get_db, get_async_db
 from app.models import User
 from app.utils import decode_access_token
+from app.cache import user_cache, recent_writers, CachedUser
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer(auto_error=False)
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-):
-    import sys
-    print(f"🔍 get_current_user called - Starting authentication", flush=True)
-    print(f"🔍 Credentials object: {credentials}", flush=True)
-    
+def _token_subject(credentials: HTTPAuthorizationCredentials) -> str:
+    """Validate the bearer token and return its subject (username)"""
     if credentials is None:
-        print("❌ No credentials provided", flush=True)
+        logger.debug("no credentials provided")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authenticated - Authorization header missing or invalid",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    print(f"🔍 Credentials received, scheme: {credentials.scheme}, token: {credentials.credentials[:30]}...", flush=True)
-    sys.stderr.write(f"🔍 get_current_user called - token received\n")
-    
     token = credentials.credentials
     payload = decode_access_token(token)
     if payload is None:
-        print("❌ Token decode failed", flush=True)
+        logger.debug("token decode failed")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
@@ -37,41 +35,85 @@ def get_current_user(
         )
     username: str = payload.get("sub")
     if username is None:
-        print("❌ Username not in token", flush=True)
+        logger.debug("username not in token")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
-        print(f"❌ User not found in DB: {username}", flush=True)
+    return username
+
+def _resolved_user(username: str, db_user) -> CachedUser:
+    if db_user is None:
+        logger.info("user not found", extra={"username": username})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    user = CachedUser.from_user(db_user)
+    user_cache.set(username, user)
+    return user
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    username = _token_subject(credentials)
     
-    # Debug: log user info for admin checks
-    print(f"✅ get_current_user: username={user.username}, role={user.role}", flush=True)
-    sys.stderr.write(f"✅ get_current_user: username={user.username}, role={user.role}\n")
+    # Serve repeat requests from the user cache so the users table is only hit on a miss
+    user = user_cache.get(username)
+    if user is None:
+        user = _resolved_user(username, db.query(User).filter(User.username == username).first())
     
+    logger.debug("authenticated", extra={"username": user.username, "role": user.role})
     return user
 
-def require_admin(current_user: User = Depends(get_current_user)):
-    # Debug: log the user info
-    import sys
-    print(f"🔍 require_admin check: user={current_user.username}, role={current_user.role}", flush=True)
-    sys.stderr.write(f"🔍 require_admin check: user={current_user.username}, role={current_user.role}\n")
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """get_current_user for the async routers"""
+    username = _token_subject(credentials)
+    user = user_cache.get(username)
+    if user is None:
+        result = await db.execute(select(User).where(User.username == username))
+        user = _resolved_user(username, result.scalars().first())
     
+    logger.debug("authenticated", extra={"username": user.username, "role": user.role})
+    return user
+
+def _check_admin(current_user):
     # Check role from database (not from token)
     if current_user.role != "admin":
-        print(f"❌ Admin check FAILED: role={current_user.role}, expected='admin'", flush=True)
+        logger.info("admin check failed", extra={"username": current_user.username, "role": current_user.role})
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Admin access required. Current role: {current_user.role}. Username: {current_user.username}"
         )
-    print(f"✅ Admin check PASSED: user={current_user.username}", flush=True)
     return current_user
 
+def require_admin(current_user: User = Depends(get_current_user)):
+    return _check_admin(current_user)
+
+def require_admin_async(current_user: User = Depends(get_current_user_async)):
+    return _check_admin(current_user)
+
+
+def get_read_db(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Session for read-only endpoints.
+    Uses the read replica when one is configured, except for users who wrote recently:
+    they keep the primary session so their own purchases show up immediately.
+    """
+    if database.ReadSessionLocal is None or recent_writers.get(current_user.id):
+        yield db
+        return
+    read_db = database.ReadSessionLocal()
+    try:
+        yield read_db
+    finally:
+        read_db.close()
@@ -0,0 +1,255 @@
+"""
+Stock change events for GET /api/sweets/events (Server-Sent Events).
+
+Every write to a sweet publishes a compact delta after its commit - `stock` with
+{"id", "quantity", "price"}, `deleted` with {"id"} - and connected dashboards patch
+the one card instead of reloading the catalog. A bulk import publishes `reset`: clients
+refetch the list, as they also must after a `reset` caused by falling behind
+(SSE_QUEUE_SIZE undelivered events) or by resuming from an unknown Last-Event-ID.
+
+Fan-out is in-process. With several workers SSE_BUS=postgres relays every event
+through LISTEN/NOTIFY, so each worker's clients see every worker's writes (and each
+worker's catalog ETags change with them); with the default "local" bus a client only
+hears about writes served by its own worker.
+Events from concurrent requests are published in the order their handlers finish,
+not strictly in commit order.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import queue
+import select
+import threading
+import uuid
+from collections import deque
+from typing import Optional
+from sqlalchemy.engine import make_url
+from app.catalog import catalog_version
+from app.database import settings
+from app.serialization import dumps
+
+try:
+    import psycopg2
+except ImportError:  # optional: only the "postgres" bus needs it
+    psycopg2 = None
+
+logger = logging.getLogger(__name__)
+
+BUSES = ("local", "postgres")
+CHANNEL = "sweet_stock_events"
+
+STOCK_FIELDS = ("id", "quantity", "price")
+
+def stock_delta(sweet) -> dict:
+    """The `stock` event data for a sweet: a result row, a response dict or an ORM object"""
+    if isinstance(sweet, dict):
+        return {field: sweet[field] for field in STOCK_FIELDS}
+    return {field: getattr(sweet, field) for field in STOCK_FIELDS}
+
+class Subscription:
+    """One SSE client: a bounded queue filled from any thread, read on the client's event loop"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_size: int):
+        self.loop = loop
+        self.queue = asyncio.Queue(max_size)
+        self.overflowed = False
+
+    def put(self, message: str):
+        # Runs on self.loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout: float) -> Optional[str]:
+        """The next message, None after `timeout` seconds without one (time for a keep-alive)"""
+        if self.overflowed:
+            # Whatever is queued is incomplete; tell the client to start over
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.overflowed = False
+            return format_event("reset", {})
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+def format_event(event: str, data: dict, event_id: str = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {dumps(data).decode()}")
+    return "\n".join(lines) + "\n\n"
+
+class StockEvents:
+    """
+    In-process event fan-out. Event ids are "<epoch>-<sequence>"; the last `history_size`
+    events are kept so a reconnecting client (Last-Event-ID) gets what it missed.
+    """
+
+    def __init__(self, history_size: int = 1000, queue_size: int = 1000, bus: str = "local"):
+        if bus not in BUSES:
+            raise ValueError(f"SSE_BUS must be one of {', '.join(BUSES)}")
+        self.queue_size = queue_size
+        self.bus = bus
+        self.epoch = uuid.uuid4().hex[:8]
+        self._sequence = itertools.count(1)
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._relay = None
+
+    def publish(self, event: str, data: dict):
+        """Send an event to every client; call after the write has committed"""
+        if self._relay is not None:
+            self._relay.send(event, data)
+        else:
+            self.dispatch(event, data)
+
+    def publish_stock(self, rows):
+        for row in rows:
+            self.publish("stock", stock_delta(row))
+
+    def dispatch(self, event: str, data: dict):
+        """Deliver to this process's clients (the relay calls this for every worker's events)"""
+        with self._lock:
+            sequence = next(self._sequence)
+            message = format_event(event, data, f"{self.epoch}-{sequence}")
+            self._history.append((sequence, message))
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.put, message)
+            except RuntimeError:
+                # The client's event loop is gone; its stream's cleanup will unsubscribe it
+                pass
+
+    def subscribe(self, last_event_id: str = None) -> Subscription:
+        """Register a client on the running event loop, queueing the events it missed since `last_event_id`"""
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            if last_event_id:
+                self._replay(subscription, last_event_id)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def _replay(self, subscription: Subscription, last_event_id: str):
+        epoch, _, sequence = last_event_id.partition("-")
+        known = epoch == self.epoch and sequence.isdigit()
+        if not known or (self._history and int(sequence) < self._history[0][0] - 1):
+            # From another process/restart, or older than the history: start over
+            subscription.put(format_event("reset", {}))
+            return
+        for event_sequence, message in self._history:
+            if event_sequence > int(sequence):
+                subscription.put(message)
+
+    async def stream(self, subscription: Subscription, keepalive_seconds: float):
+        """The SSE body for a subscription; a comment line keeps idle connections (and proxies) open"""
+        try:
+            while True:
+                message = await subscription.get(keepalive_seconds)
+                yield message if message is not None else ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def start(self, database_url: str):
+        """Start the cross-worker relay when SSE_BUS=postgres"""
+        if self.bus != "postgres" or self._relay is not None:
+            return
+        if psycopg2 is None:
+            raise RuntimeError("SSE_BUS=postgres needs psycopg2")
+        # psycopg2 takes a plain postgresql:// URL, without SQLAlchemy's driver suffix
+        url = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._relay = PostgresRelay(url, self)
+        self._relay.start()
+
+    def stop(self):
+        if self._relay is not None:
+            self._relay.stop()
+            self._relay = None
+
+class PostgresRelay:
+    """
+    Daemon thread holding one connection that LISTENs on CHANNEL and NOTIFYs it with the
+    events published in this process, so every worker dispatches every event exactly once.
+    """
+
+    # Seconds between checks for outgoing events when nothing arrives
+    POLL_SECONDS = 0.05
+
+    def __init__(self, database_url: str, events: StockEvents):
+        self.database_url = database_url
+        self.events = events
+        self._outgoing = queue.SimpleQueue()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def send(self, event: str, data: dict):
+        self._outgoing.put(dumps({"event": event, "data": data, "origin": self.events.epoch}).decode())
+
+    def receive(self, payload: str):
+        """Dispatch a notification; writes from other workers also invalidate this worker's catalog ETags"""
+        message = json.loads(payload)
+        if message.get("origin") != self.events.epoch:
+            # The publishing worker bumped its own version after the commit
+            catalog_version.bump()
+        self.events.dispatch(message["event"], message["data"])
+
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="sse-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _connect(self):
+        connection = psycopg2.connect(self.database_url)
+        connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        return connection
+
+    def _run(self):
+        connection = None
+        while not self._stopping.is_set():
+            try:
+                if connection is None:
+                    connection = self._connect()
+                with connection.cursor() as cursor:
+                    while not self._outgoing.empty():
+                        cursor.execute("SELECT pg_notify(%s, %s)", (CHANNEL, self._outgoing.get()))
+                if select.select([connection], [], [], self.POLL_SECONDS)[0]:
+                    connection.poll()
+                    while connection.notifies:
+                        self.receive(connection.notifies.pop(0).payload)
+            except Exception:
+                # Events sent or received while reconnecting are lost (clients catch up on their next refetch)
+                logger.exception("stock event relay failed, reconnecting")
+                if connection is not None:
+                    connection.close()
+                connection = None
+                self._stopping.wait(1.0)
+        if connection is not None:
+            connection.close()
+
+stock_events = StockEvents(
+    history_size=settings.SSE_HISTORY_SIZE,
+    queue_size=settings.SSE_QUEUE_SIZE,
+    bus=settings.SSE_BUS,
+)
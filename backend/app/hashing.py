@@ -0,0 +1,66 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException, status
+from app.database import settings
+from app.utils import verify_password, get_password_hash
+
+class HashingPool:
+    """
+    Bounded process pool for bcrypt work.
+    Hashing runs on separate cores instead of the request threadpool, and at most
+    `workers + queue_limit` jobs may be in flight - extra requests get a 503
+    straight away rather than queueing behind a login burst.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit = queue_limit
+        self._slots = threading.BoundedSemaphore(self.workers + queue_limit)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: forking a process that already runs threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    async def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # Free the slot when the job finishes, even if the awaiting request was cancelled
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+hashing_pool = HashingPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_limit=settings.PASSWORD_HASH_QUEUE_LIMIT,
+)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hashing_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await hashing_pool.run(get_password_hash, password)
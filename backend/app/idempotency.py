@@ -0,0 +1,194 @@
+"""
+Idempotency-Key support for write requests.
+
+A POST/PUT/PATCH/DELETE that carries an Idempotency-Key header runs once; its response
+is kept for IDEMPOTENCY_TTL_SECONDS and a retry with the same key (same user, method and
+path) gets that stored response back without touching the database. The body is read in
+full and fingerprinted before the endpoint runs (up to MAX_FINGERPRINTED_BODY_BYTES; larger
+uploads with a key get a 413), so an endpoint that answers without reading it can't leave
+a partial fingerprint behind. The key is reserved
+before the request runs, so a retry that arrives while the first attempt is still in
+flight gets a 409 instead of running concurrently. Reusing a key for a different body
+is a 422.
+
+Server errors (5xx), 409 and 429 are not stored - retrying those may succeed. The store
+is in-process, like the other caches in app/cache.py: with several workers a retry is
+only recognised by the worker that served the first attempt.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Optional
+from app import metrics
+from app.cache import TTLCache
+from app.database import settings
+from app.utils import decode_access_token
+
+HEADER = b"idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+MAX_KEY_LENGTH = 255
+
+# Responses bigger than this are not kept (a purchase answers with a few hundred bytes,
+# a checkout with about 250 per line); IDEMPOTENCY_MAX_BYTES bounds the whole store
+MAX_STORED_BODY_BYTES = 64 * 1024
+
+# Request bodies buffered to fingerprint a keyed request; the JSON write endpoints take a few hundred bytes
+MAX_FINGERPRINTED_BODY_BYTES = 1024 * 1024
+
+# Outcomes a retry should re-run rather than replay
+NOT_STORED_STATUSES = {409, 429}
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    status: int
+    headers: list
+    body: bytes
+
+# Placeholder held while the first request with a key is running
+IN_PROGRESS = object()
+
+# The client went away before sending its whole body
+DISCONNECTED = object()
+
+def _stored_bytes(value) -> int:
+    """Approximate memory held by a store entry (the in-progress placeholder counts as nothing)"""
+    if not isinstance(value, StoredResponse):
+        return 0
+    return len(value.body) + sum(len(name) + len(header) for name, header in value.headers)
+
+idempotency_store = TTLCache(
+    max_size=settings.IDEMPOTENCY_MAX_KEYS,
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    max_bytes=settings.IDEMPOTENCY_MAX_BYTES,
+    weigh=_stored_bytes,
+)
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def bearer_subject(scope) -> Optional[str]:
+    """Username from a valid bearer token, if the request carries one"""
+    authorization = _header(scope, b"authorization") or ""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    payload = decode_access_token(token)
+    return payload.get("sub") if payload else None
+
+async def _send_json(send, status: int, detail: str, headers: list = ()):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+class IdempotencyMiddleware:
+    """Pure ASGI middleware; a keyed request's (small) body is buffered, fingerprinted and replayed to the endpoint"""
+
+    def __init__(self, app, store: TTLCache = idempotency_store):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in UNSAFE_METHODS or not self.store.enabled:
+            return await self.app(scope, receive, send)
+        idempotency_key = _header(scope, HEADER)
+        if idempotency_key is None:
+            return await self.app(scope, receive, send)
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            return await _send_json(send, 400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+        # Keys are scoped per user
+        principal = bearer_subject(scope)
+        if principal is None:
+            # Unauthenticated writes are rejected by the endpoint anyway
+            return await self.app(scope, receive, send)
+
+        key = (principal, scope["method"], scope["path"], idempotency_key)
+        body = await self._read_body(receive)
+        if body is DISCONNECTED:
+            return
+        if body is None:
+            return await _send_json(
+                send, 413, f"Requests with an Idempotency-Key are limited to {MAX_FINGERPRINTED_BODY_BYTES} bytes"
+            )
+        fingerprint = hashlib.sha256(body).hexdigest()
+        replayed = {"done": False}
+
+        async def replay_receive():
+            if replayed["done"]:
+                return await receive()
+            replayed["done"] = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        if not self.store.add(key, IN_PROGRESS):
+            stored = self.store.get(key)
+            if stored is None or stored is IN_PROGRESS:
+                return await _send_json(
+                    send, 409, "A request with this Idempotency-Key is still being processed",
+                    [(b"retry-after", b"1")],
+                )
+            if fingerprint != stored.fingerprint:
+                return await _send_json(send, 422, "Idempotency-Key was already used for a different request")
+            metrics.IDEMPOTENT_REPLAYS.inc()
+            await send({
+                "type": "http.response.start",
+                "status": stored.status,
+                "headers": [*stored.headers, (REPLAYED_HEADER, b"true")],
+            })
+            await send({"type": "http.response.body", "body": stored.body})
+            return
+
+        response = {"status": None, "headers": [], "body": bytearray(), "storable": True}
+
+        async def capturing_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                if len(response["body"]) + len(message.get("body", b"")) > MAX_STORED_BODY_BYTES:
+                    response["storable"] = False
+                elif response["storable"]:
+                    response["body"] += message.get("body", b"")
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capturing_send)
+        except BaseException:
+            self.store.invalidate(key)
+            raise
+
+        status = response["status"]
+        if status is None or status >= 500 or status in NOT_STORED_STATUSES or not response["storable"]:
+            self.store.invalidate(key)
+            return
+        self.store.set(key, StoredResponse(
+            fingerprint=fingerprint,
+            status=status,
+            headers=response["headers"],
+            body=bytes(response["body"]),
+        ))
+
+    @staticmethod
+    async def _read_body(receive) -> Optional[bytes]:
+        """The whole request body; None if it is over MAX_FINGERPRINTED_BODY_BYTES, DISCONNECTED if the client left"""
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                # Nobody is waiting for the response: don't run (or store) a half-received request
+                return DISCONNECTED
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if size > MAX_FINGERPRINTED_BODY_BYTES:
+                return None
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
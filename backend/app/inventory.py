@@ -0,0 +1,120 @@
+"""
+Sharded stock counters for flash-sale sweets.
+
+Every purchase of a sweet decrements its sweets row, so during a promotion all buyers of
+one sweet queue on that row's lock. Sharding the sweet (PUT /api/sweets/{id}/stock-shards)
+moves its stock into `stock_shards` rows of sweet_stock_shards; a purchase decrements one
+shard picked at random - on PostgreSQL skipping shards other transactions hold - so up to
+N purchases of the sweet commit in parallel.
+
+While a sweet is sharded sweets.quantity stays 0; reads report the sum of its shards
+through QUANTITY, and restocks or quantity edits re-spread the total evenly (rebalance).
+"""
+import random
+from typing import Optional
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from app.models import Sweet, SweetStockShard
+
+_shard_total = (
+    select(func.coalesce(func.sum(SweetStockShard.quantity), 0))
+    .where(SweetStockShard.sweet_id == Sweet.id)
+    .correlate(Sweet)
+    .scalar_subquery()
+)
+
+# Stock of a sweet whether sharded or not; the CASE keeps unsharded rows from running the subquery
+QUANTITY = case((Sweet.stock_shards > 0, _shard_total), else_=Sweet.quantity)
+
+def read_columns(columns: tuple) -> tuple:
+    """`columns` with Sweet.quantity swapped for the sharding-aware QUANTITY"""
+    return tuple(QUANTITY.label("quantity") if column is Sweet.quantity else column for column in columns)
+
+def split(total: int, shards: int) -> list:
+    """`total` units spread as evenly as possible over `shards` counters"""
+    base, extra = divmod(total, shards)
+    return [base + (1 if shard < extra else 0) for shard in range(shards)]
+
+def _pick_shard(db: Session, sweet_id: int, quantity: int, shards: int, skip_locked: bool) -> Optional[int]:
+    """A shard holding at least `quantity`, searched from a random starting point"""
+    start = random.randrange(shards)
+    query = (
+        select(SweetStockShard.shard)
+        .where(SweetStockShard.sweet_id == sweet_id, SweetStockShard.quantity >= quantity)
+        .order_by((SweetStockShard.shard + shards - start) % shards)
+        .limit(1)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=skip_locked)
+    return db.execute(query).scalar()
+
+def claim(db: Session, sweet_id: int, quantity: int, shards: int) -> bool:
+    """
+    Take `quantity` units of a sharded sweet's stock in the current transaction.
+    False (nothing taken) if the shards hold fewer units in total.
+    """
+    # First try a shard nobody else holds, then wait for any single shard that is big enough
+    attempts = (True, False) if db.get_bind().dialect.name == "postgresql" else (False,)
+    for skip_locked in attempts:
+        shard = _pick_shard(db, sweet_id, quantity, shards, skip_locked)
+        if shard is None:
+            continue
+        claimed = db.execute(
+            update(SweetStockShard)
+            .where(
+                SweetStockShard.sweet_id == sweet_id,
+                SweetStockShard.shard == shard,
+                SweetStockShard.quantity >= quantity,
+            )
+            .values(quantity=SweetStockShard.quantity - quantity)
+        ).rowcount
+        if claimed:
+            return True
+
+    # No single shard holds enough: lock them all (in shard order) and take from several
+    counters = db.execute(
+        select(SweetStockShard.shard, SweetStockShard.quantity)
+        .where(SweetStockShard.sweet_id == sweet_id)
+        .order_by(SweetStockShard.shard)
+        .with_for_update()
+    ).all()
+    if sum(counter.quantity for counter in counters) < quantity:
+        return False
+    remaining = quantity
+    taken = []
+    for counter in counters:
+        take = min(counter.quantity, remaining)
+        if take:
+            taken.append({"sweet_id": sweet_id, "shard": counter.shard, "quantity": counter.quantity - take})
+            remaining -= take
+    db.execute(update(SweetStockShard), taken)
+    return True
+
+def rebalance(db: Session, sweet_id: int, shards: int = None, add: int = 0, total: int = None):
+    """
+    Re-spread a sweet's stock evenly over `shards` counters (default: its current count;
+    0 folds the stock back into sweets.quantity). `add` units are added to the stock first;
+    `total` replaces it. Locks the sweet and its shards until the transaction ends.
+    """
+    sweet = db.execute(
+        select(Sweet.quantity, Sweet.stock_shards).where(Sweet.id == sweet_id).with_for_update()
+    ).one()
+    counters = db.execute(
+        select(SweetStockShard.quantity).where(SweetStockShard.sweet_id == sweet_id).with_for_update()
+    ).scalars().all()
+    if total is None:
+        total = sweet.quantity + sum(counters)
+    total += add
+    shards = sweet.stock_shards if shards is None else shards
+
+    db.execute(delete(SweetStockShard).where(SweetStockShard.sweet_id == sweet_id))
+    if shards:
+        db.execute(insert(SweetStockShard), [
+            {"sweet_id": sweet_id, "shard": shard, "quantity": quantity}
+            for shard, quantity in enumerate(split(total, shards))
+        ])
+    db.execute(
+        update(Sweet)
+        .where(Sweet.id == sweet_id)
+        .values(stock_shards=shards, quantity=0 if shards else total)
+    )
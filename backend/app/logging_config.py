@@ -0,0 +1,132 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from app.database import settings
+
+# Path of the request being handled, attached to every log record
+request_route: ContextVar[str] = ContextVar("request_route", default="-")
+
+# Attributes every LogRecord has - anything else was passed via `extra=` and is logged as a field
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "route"}
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, route, message and any extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "route": getattr(record, "route", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class RouteFilter(logging.Filter):
+    """Stamp records with the current request route (runs in the calling thread)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.route = request_route.get()
+        return True
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of DEBUG records.
+    Rates are looked up by the longest matching route prefix, falling back to the default.
+    """
+
+    def __init__(self, default_rate: float = 1.0, route_rates: dict = None):
+        super().__init__()
+        self.default_rate = default_rate
+        # Longest prefix first so "/api/sweets/search" wins over "/api/sweets"
+        self.route_rates = sorted((route_rates or {}).items(), key=lambda item: -len(item[0]))
+
+    def rate_for(self, route: str) -> float:
+        for prefix, rate in self.route_rates:
+            if route.startswith(prefix):
+                return rate
+        return self.default_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = self.rate_for(getattr(record, "route", "-"))
+        return rate >= 1 or random.random() < rate
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking (or erroring) when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def parse_route_rates(value: str) -> dict:
+    """Parse "/api/sweets=0.1,/api/auth=1" into {"/api/sweets": 0.1, "/api/auth": 1.0}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        prefix, _, rate = item.partition("=")
+        rates[prefix.strip()] = float(rate)
+    return rates
+
+_listener = None
+_handler = None
+
+def setup_logging():
+    """
+    Route all application logging through a bounded in-memory queue.
+    Request threads only enqueue records; a background listener thread formats and writes them.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    root = logging.getLogger()
+    if settings.LOG_LEVEL.upper() == "OFF":
+        logging.disable(logging.CRITICAL)
+        return
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    output = logging.StreamHandler(sys.stderr)
+    if settings.LOG_FORMAT == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(route)s] %(message)s"))
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    handler.addFilter(RouteFilter())
+    handler.addFilter(DebugSamplingFilter(
+        default_rate=settings.LOG_DEBUG_SAMPLE_RATE,
+        route_rates=parse_route_rates(settings.LOG_DEBUG_SAMPLE_ROUTES),
+    ))
+    root.addHandler(handler)
+    _handler = handler
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener, _handler
+    if _listener is not None:
+        logging.getLogger().removeHandler(_handler)
+        _listener.stop()
+        _listener = None
+        _handler = None
@@ -1,18 +1,73 @@
 import os
+import time
+import logging
 from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
+from app.database import engine, async_engine, read_engine, settings, SessionLocal
 from app.routers import auth, sweets
+from app.cache import user_cache
+from app.hashing import hashing_pool
+from app.idempotency import IdempotencyMiddleware
+from app.ratelimit import RateLimitMiddleware
+from app.purge import sweet_purger
+from app.write_behind import history_flusher
+from app.events import stock_events
+from app.logging_config import setup_logging, request_route
+from app import metrics
+from app.schema import ensure_schema
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+metrics.instrument_engine(engine)
+if async_engine is not None:
+    metrics.instrument_engine(async_engine.sync_engine, pool_gauges=False)
+if read_engine is not None:
+    metrics.instrument_engine(read_engine, pool_gauges=False)
+metrics.registry.gauge("user_cache_hits_total", "Authenticated-user cache hits", lambda: user_cache.hits, "counter")
+metrics.registry.gauge("user_cache_misses_total", "Authenticated-user cache misses", lambda: user_cache.misses, "counter")
+metrics.registry.gauge("stock_event_clients", "Connected GET /api/sweets/events streams", lambda: stock_events.subscribers)
 
 app = FastAPI(title="Sweet Shop Management System API", version="1.0.0", redirect_slashes=False)
 
+# Innermost middleware, so replayed responses are still logged, counted and get CORS headers
+app.add_middleware(IdempotencyMiddleware)
+# Outside it, so a rejected request never reserves an Idempotency-Key; 429s are still logged and counted
+app.add_middleware(RateLimitMiddleware)
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    # Log incoming requests for debugging
-    auth_header = request.headers.get("Authorization")
-    print(f"📥 {request.method} {request.url.path} - Auth header: {'Present' if auth_header else 'MISSING'} - {auth_header[:30] if auth_header else ''}...", flush=True)
-    response = await call_next(request)
-    return response
+    # Tag every log line of this request with its path (drives per-route debug sampling)
+    route_token = request_route.set(request.url.path)
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        route = route_template(request)
+        metrics.HTTP_REQUESTS.inc(method=request.method, route=route, status=str(status_code))
+        metrics.HTTP_LATENCY.observe(elapsed, method=request.method, route=route)
+        logger.debug("request handled", extra={
+            "method": request.method,
+            "status": status_code,
+            "duration_ms": round(elapsed * 1000, 2),
+        })
+        request_route.reset(route_token)
+
+_route_paths = {}
+
+def route_template(request: Request) -> str:
+    """Path template of the matched route (e.g. /api/sweets/{sweet_id}/purchase), to keep label cardinality low"""
+    endpoint = request.scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if not _route_paths:
+        _route_paths.update({route.endpoint: route.path for route in app.routes if hasattr(route, "endpoint")})
+    return _route_paths.get(endpoint, "unmatched")
 
 # CORS middleware
 # Get allowed origins from environment variable (comma-separated) or use default
@@ -28,67 +83,44 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+if settings.ASYNC_DB:
+    from app.routers import auth_async, sweets_async
+    # Registered first so they win these paths; everything else falls through to the sync routers
+    app.include_router(auth_async.router, prefix="/api/auth", tags=["auth"])
+    app.include_router(sweets_async.router, prefix="/api/sweets", tags=["sweets"])
+
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(sweets.router, prefix="/api/sweets", tags=["sweets"])
 
 @app.on_event("startup")
 async def startup_event():
-    """Create database tables and run migrations on startup"""
+    """Apply pending database migrations (a single version check when already up to date), then start the background workers"""
     try:
-        Base.metadata.create_all(bind=engine)
-        print("✅ Database tables created/verified successfully")
-        
-        # Run migration for password reset fields (safe migration - won't fail if columns exist)
-        from sqlalchemy import text, inspect
-        inspector = inspect(engine)
-        
-        # Check if users table exists and has reset_token column
-        if inspector.has_table("users"):
-            columns = [col['name'] for col in inspector.get_columns("users")]
-            
-            # Add reset_token column if it doesn't exist
-            if 'reset_token' not in columns:
-                with engine.begin() as conn:
-                    conn.execute(text("ALTER TABLE users ADD COLUMN reset_token VARCHAR"))
-                    print("✅ Added reset_token column to users table")
-            
-            # Add reset_token_expires column if it doesn't exist
-            if 'reset_token_expires' not in columns:
-                with engine.begin() as conn:
-                    conn.execute(text("ALTER TABLE users ADD COLUMN reset_token_expires TIMESTAMP WITH TIME ZONE"))
-                    print("✅ Added reset_token_expires column to users table")
-            
-            # Create index if it doesn't exist
-            indexes = [idx['name'] for idx in inspector.get_indexes("users")]
-            if 'idx_users_reset_token' not in indexes:
-                try:
-                    with engine.begin() as conn:
-                        conn.execute(text("CREATE INDEX idx_users_reset_token ON users(reset_token)"))
-                        print("✅ Created index on reset_token")
-                except Exception as e:
-                    print(f"⚠️ Index may already exist: {e}")
-            
-            print("✅ Password reset migration completed")
-        
-        # Check if sweets table exists and has created_by_user_id column
-        if inspector.has_table("sweets"):
-            columns = [col['name'] for col in inspector.get_columns("sweets")]
-            
-            # Add created_by_user_id column if it doesn't exist
-            if 'created_by_user_id' not in columns:
-                with engine.begin() as conn:
-                    conn.execute(text("ALTER TABLE sweets ADD COLUMN created_by_user_id INTEGER REFERENCES users(id)"))
-                    print("✅ Added created_by_user_id column to sweets table")
-            
-            print("✅ Sweet ownership migration completed")
-        
+        ensure_schema(engine)
     except Exception as e:
-        print(f"⚠️ Warning: Could not create tables/migrations on startup: {e}")
-        print("Tables will be created on first database access")
+        logger.warning("could not run database migrations on startup", extra={"error": str(e)})
+    sweet_purger.start(SessionLocal)
+    history_flusher.start(SessionLocal)
+    stock_events.start(settings.DATABASE_URL)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the background workers and the stock event relay, flush queued purchase history, and close async connections"""
+    hashing_pool.shutdown()
+    stock_events.stop()
+    sweet_purger.stop()
+    history_flusher.stop()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """Prometheus text exposition of the in-process metrics"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    return {"status": "ok", "user_cache": user_cache.stats()}
 
 if __name__ == "__main__":
     import uvicorn
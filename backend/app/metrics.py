@@ -0,0 +1,189 @@
+"""
+Minimal in-process Prometheus metrics.
+
+Counters and histograms aggregate under a lock in plain dicts (no per-sample
+storage); gauges are read from callbacks only when /metrics is scraped.
+"""
+import threading
+import time
+from bisect import bisect_left
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Latency buckets in seconds (Prometheus client defaults)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, "") for name in self.label_names), 0)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        series = self._series.get(tuple(labels.get(name, "") for name in self.label_names))
+        return series[2] if series else 0
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.label_names, key)} {count}"
+
+class CallbackGauge:
+    """Gauge whose value is read when metrics are rendered"""
+
+    def __init__(self, name: str, help_text: str, callback, metric_type: str = "gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self.metric_type = metric_type
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} {self.metric_type}"
+        yield f"{self.name} {_format_value(self.callback())}"
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, callback, metric_type="gauge"):
+        return self.register(CallbackGauge(name, help_text, callback, metric_type))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # A failing gauge callback must not break the whole scrape
+                continue
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+# --- HTTP ---
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by method, route template and status code", ("method", "route", "status")
+)
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and route template", ("method", "route")
+)
+IDEMPOTENT_REPLAYS = registry.counter("idempotent_replays_total", "Write requests answered from the Idempotency-Key store")
+RATE_LIMITED = registry.counter("rate_limited_requests_total", "Requests rejected with 429 by the rate limiter", ("route", "scope"))
+
+# --- Database ---
+DB_QUERY_LATENCY = registry.histogram(
+    "db_query_duration_seconds", "Time spent executing SQL statements", ("statement",)
+)
+DB_POOL_WAIT = registry.histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the pool"
+)
+
+# --- Business ---
+PURCHASES = registry.counter("sweet_purchases_total", "Completed purchase lines", ("endpoint",))
+PURCHASED_UNITS = registry.counter("sweet_purchased_units_total", "Units sold", ("endpoint",))
+RESTOCKS = registry.counter("sweet_restocks_total", "Completed restocks")
+RESTOCKED_UNITS = registry.counter("sweet_restocked_units_total", "Units added by restocks")
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - started)
+
+def instrument_engine(engine, pool_gauges: bool = True):
+    """Register SQL timing events (and optionally pool gauges) for `engine`"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        DB_QUERY_LATENCY.observe(time.perf_counter() - started, statement=statement.split(None, 1)[0].upper())
+
+    @event.listens_for(engine, "handle_error")
+    def _drop_timer(context):
+        # Failed statements never reach after_cursor_execute
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    pool = engine.pool
+    if pool_gauges and isinstance(pool, QueuePool):
+        registry.gauge("db_pool_size", "Configured pool size", pool.size)
+        registry.gauge("db_pool_checked_out", "Connections currently checked out", pool.checkedout)
+        registry.gauge("db_pool_checked_in", "Idle connections in the pool", pool.checkedin)
+        registry.gauge("db_pool_overflow", "Connections open beyond pool_size", lambda: max(pool.overflow(), 0))
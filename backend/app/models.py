@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Date, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -14,6 +14,10 @@ class User(Base):
     reset_token = Column(String, nullable=True)
     reset_token_expires = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("idx_users_reset_token", "reset_token"),
+    )
 
 class Sweet(Base):
     __tablename__ = "sweets"
@@ -26,9 +30,17 @@ class Sweet(Base):
     created_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Track which admin created this sweet
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # Soft delete - rows are purged in the background (app.purge)
+    stock_shards = Column(Integer, default=0, server_default="0", nullable=False)  # >0: stock lives in sweet_stock_shards (app.inventory)
     
     # Relationship
     created_by = relationship("User", foreign_keys=[created_by_user_id])
+    
+    __table_args__ = (
+        Index("idx_sweets_created_by_user_id", "created_by_user_id"),  # admin history, per-admin analytics
+        Index("idx_sweets_category", "category"),
+        Index("idx_sweets_price", "price"),  # price-range search
+    )
 
 class PurchaseHistory(Base):
     __tablename__ = "purchase_history"
@@ -46,5 +58,57 @@ class PurchaseHistory(Base):
     # Relationships
     user = relationship("User", backref="purchases")
     sweet = relationship("Sweet", backref="purchases", cascade="save-update")
+    
+    __table_args__ = (
+        Index("idx_purchase_history_user_purchased_at", "user_id", "purchased_at"),  # per-user history, newest first
+        Index("idx_purchase_history_sweet_id", "sweet_id"),  # admin history join, delete cascade
+    )
 
+class PurchaseHistoryArchive(Base):
+    """Purchase history of purged sweets (same columns as purchase_history, no sweets foreign key)"""
+    __tablename__ = "purchase_history_archive"
+    
+    id = Column(Integer, primary_key=True)  # id the row had in purchase_history
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    sweet_id = Column(Integer, nullable=False)
+    sweet_name = Column(String, nullable=False)
+    category = Column(String, nullable=False)
+    price = Column(Numeric(10, 2), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    total_price = Column(Numeric(10, 2), nullable=False)
+    purchased_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class PurchaseHistoryOutbox(Base):
+    """Purchase history waiting to be moved into purchase_history (write-behind mode, see app.write_behind)"""
+    __tablename__ = "purchase_history_outbox"
+    
+    # No foreign keys or secondary indexes - the purchase transaction only appends here
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    sweet_id = Column(Integer, nullable=False)
+    sweet_name = Column(String, nullable=False)
+    category = Column(String, nullable=False)
+    price = Column(Numeric(10, 2), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    total_price = Column(Numeric(10, 2), nullable=False)
+    purchased_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class SalesDailyRollup(Base):
+    """Per-sweet daily sales totals, kept up to date by the purchase endpoints (see app.analytics)"""
+    __tablename__ = "sales_daily_rollups"
+    
+    sweet_id = Column(Integer, ForeignKey("sweets.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    bucket = Column(Integer, primary_key=True, default=0, server_default="0")  # >0 only for sharded sweets
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Numeric(12, 2), nullable=False, default=0)
+    purchases = Column(Integer, nullable=False, default=0)
+
+class SweetStockShard(Base):
+    """One of the counters a sharded sweet's stock is split across (see app.inventory)"""
+    __tablename__ = "sweet_stock_shards"
+    
+    sweet_id = Column(Integer, ForeignKey("sweets.id"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
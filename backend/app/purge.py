@@ -0,0 +1,152 @@
+"""
+Background purge of soft-deleted sweets.
+
+DELETE /api/sweets/{id}/ only stamps sweets.deleted_at, so it costs the same for a
+best-seller as for a sweet nobody bought. This worker later moves the sweet's purchase
+history out in batches of SWEET_PURGE_BATCH_SIZE rows, one short transaction per batch -
+copied to purchase_history_archive first ("archive") or dropped ("delete") - and
+removes the sweet itself once nothing references it any more. Archive mode keeps the
+sweet's sales_daily_rollups rows, and the soft-deleted sweets row they reference, so
+its revenue stays in /admin/analytics; delete mode drops them too.
+"""
+import logging
+import threading
+from sqlalchemy import delete, exists, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+from app.database import settings
+from app.models import Sweet, PurchaseHistory, PurchaseHistoryArchive, PurchaseHistoryOutbox, SalesDailyRollup, SweetStockShard
+
+logger = logging.getLogger(__name__)
+
+PURGE_MODES = ("archive", "delete")
+
+# Columns copied from purchase_history into the archive (archived_at takes its default)
+ARCHIVED_COLUMNS = (
+    "id", "user_id", "sweet_id", "sweet_name", "category", "price",
+    "quantity", "total_price", "purchased_at",
+)
+
+def _history_batch(db: Session, sweet_id: int, batch_size: int) -> list:
+    query = (
+        select(PurchaseHistory.id)
+        .where(PurchaseHistory.sweet_id == sweet_id)
+        .order_by(PurchaseHistory.id)
+        .limit(batch_size)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        # Another worker already busy with these rows keeps them; the sweet is then left for it
+        query = query.with_for_update(skip_locked=True)
+    return db.execute(query).scalars().all()
+
+def purge_sweet(db: Session, sweet_id: int, mode: str = "archive", batch_size: int = 1000) -> int:
+    """Remove one soft-deleted sweet and its dependent rows; returns the purchase rows moved"""
+    if mode not in PURGE_MODES:
+        raise ValueError(f"unknown purge mode: {mode}")
+    moved = 0
+    while ids := _history_batch(db, sweet_id, batch_size):
+        if mode == "archive":
+            db.execute(insert(PurchaseHistoryArchive).from_select(
+                ARCHIVED_COLUMNS,
+                select(*(getattr(PurchaseHistory, column) for column in ARCHIVED_COLUMNS))
+                .where(PurchaseHistory.id.in_(ids)),
+            ))
+        db.execute(delete(PurchaseHistory).where(PurchaseHistory.id.in_(ids)))
+        db.commit()
+        moved += len(ids)
+
+    # At most one rollup row per day (and a few stock shards) - small enough for the final transaction
+    if mode == "delete":
+        db.execute(delete(SalesDailyRollup).where(SalesDailyRollup.sweet_id == sweet_id))
+    db.execute(delete(SweetStockShard).where(SweetStockShard.sweet_id == sweet_id))
+    db.execute(delete(Sweet).where(
+        Sweet.id == sweet_id,
+        Sweet.deleted_at.is_not(None),
+        ~exists().where(PurchaseHistory.sweet_id == sweet_id),
+        # Purchases still queued for write-behind are flushed first; the next run removes the sweet
+        ~exists().where(PurchaseHistoryOutbox.sweet_id == sweet_id),
+        # Archived sweets with sales stay for the analytics rollups
+        ~exists().where(SalesDailyRollup.sweet_id == sweet_id),
+    ))
+    db.commit()
+    return moved
+
+def _purgeable(mode: str):
+    """Soft-deleted sweets with something left to purge (archive mode keeps sweets that only have rollups)"""
+    condition = Sweet.deleted_at.is_not(None)
+    if mode == "archive":
+        condition &= (
+            exists().where(PurchaseHistory.sweet_id == Sweet.id)
+            | exists().where(PurchaseHistoryOutbox.sweet_id == Sweet.id)
+            | exists().where(SweetStockShard.sweet_id == Sweet.id)
+            | ~exists().where(SalesDailyRollup.sweet_id == Sweet.id)
+        )
+    return condition
+
+def purge_deleted_sweets(session_factory: sessionmaker, mode: str = "archive", batch_size: int = 1000) -> dict:
+    """Purge every soft-deleted sweet; returns {"sweets": ..., "purchases": ...} processed"""
+    totals = {"sweets": 0, "purchases": 0}
+    with session_factory() as db:
+        sweet_ids = db.execute(
+            select(Sweet.id).where(_purgeable(mode)).order_by(Sweet.id)
+        ).scalars().all()
+        db.commit()
+        for sweet_id in sweet_ids:
+            totals["purchases"] += purge_sweet(db, sweet_id, mode, batch_size)
+            totals["sweets"] += 1
+    if totals["sweets"]:
+        logger.info("deleted sweets purged", extra={"mode": mode, **totals})
+    return totals
+
+class SweetPurger:
+    """
+    Daemon thread running purge_deleted_sweets every `interval_seconds`, or sooner when
+    woken by a delete. An interval of 0 leaves the purger off.
+    """
+
+    def __init__(self, interval_seconds: float, batch_size: int, mode: str):
+        if mode not in PURGE_MODES:
+            raise ValueError(f"SWEET_PURGE_MODE must be one of {', '.join(PURGE_MODES)}")
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.mode = mode
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self, session_factory: sessionmaker):
+        if self.interval_seconds <= 0 or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(session_factory,), name="sweet-purger", daemon=True
+        )
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self, session_factory: sessionmaker):
+        while not self._stopping.is_set():
+            self._wake.wait(self.interval_seconds)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            try:
+                purge_deleted_sweets(session_factory, self.mode, self.batch_size)
+            except Exception:
+                # Whatever was left is picked up again on the next run
+                logger.exception("sweet purge failed")
+
+sweet_purger = SweetPurger(
+    interval_seconds=settings.SWEET_PURGE_INTERVAL_SECONDS,
+    batch_size=settings.SWEET_PURGE_BATCH_SIZE,
+    mode=settings.SWEET_PURGE_MODE,
+)
@@ -0,0 +1,278 @@
+"""
+Token-bucket rate limiting for the auth and purchase endpoints.
+
+Login verifies a bcrypt hash and forgot-password writes a reset token on every call, so
+a credential-stuffing burst costs CPU and database writes real customers need. Each
+limited route has a bucket per client IP and, where the request names one, per subject
+(the username or email in the body, or the bearer token's user for purchases). A request
+that finds either bucket empty is answered 429 with Retry-After by this middleware -
+before any dependency opens a session or hashes a password.
+
+Limits are "requests/seconds" (a burst of `requests`, refilled evenly over `seconds`);
+RATE_LIMITS overrides the defaults below, e.g. "login.ip=50/60,purchase.user=0". A limit
+of 0 turns that bucket off. Buckets live in process memory, so every worker counts on
+its own; RATE_LIMIT_BACKEND=<database URL> shares them through a table instead (a
+SQLite file is enough for the workers of one host).
+"""
+import json
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import parse_qs
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Boolean, Column, Float, MetaData, String, Table, case, create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from app import metrics
+from app.database import settings
+from app.idempotency import bearer_subject
+
+@dataclass(frozen=True)
+class Limit:
+    requests: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        """Tokens added per second"""
+        return self.requests / self.seconds
+
+    @classmethod
+    def parse(cls, text: str) -> Optional["Limit"]:
+        requests, _, seconds = text.partition("/")
+        if int(requests) <= 0:
+            return None
+        return cls(int(requests), float(seconds or 1))
+
+# (route, scope) -> "requests/seconds"; scope "ip" or "user"
+DEFAULT_LIMITS = {
+    ("login", "ip"): "30/60",
+    ("login", "user"): "10/300",
+    ("register", "ip"): "10/3600",
+    ("forgot_password", "ip"): "10/3600",
+    ("forgot_password", "user"): "3/3600",
+    ("reset_password", "ip"): "10/900",
+    ("purchase", "ip"): "600/60",
+    ("purchase", "user"): "60/60",
+}
+
+# Limited routes: (method, path pattern) -> (route name, body field naming the subject)
+ROUTES = (
+    ("POST", re.compile(r"/api/auth/login/?"), "login", "username"),
+    ("POST", re.compile(r"/api/auth/register/?"), "register", "username"),
+    ("POST", re.compile(r"/api/auth/forgot-password/?"), "forgot_password", "email"),
+    ("POST", re.compile(r"/api/auth/reset-password/?"), "reset_password", None),
+    ("POST", re.compile(r"/api/sweets/(\d+/purchase|checkout)/?"), "purchase", None),
+)
+
+# Bodies read to find the subject; the auth forms are a few hundred bytes
+MAX_INSPECTED_BODY_BYTES = 16 * 1024
+
+def parse_limits(overrides: str) -> dict:
+    """DEFAULT_LIMITS with the "route.scope=requests/seconds,..." overrides applied"""
+    texts = dict(DEFAULT_LIMITS)
+    for item in filter(None, (part.strip() for part in overrides.split(","))):
+        name, _, limit = item.partition("=")
+        route, _, scope = name.strip().partition(".")
+        if (route, scope) not in DEFAULT_LIMITS:
+            raise ValueError(f"unknown rate limit {name.strip()!r} in RATE_LIMITS")
+        texts[(route, scope)] = limit.strip()
+    return {key: Limit.parse(text) for key, text in texts.items()}
+
+class MemoryBuckets:
+    """Per-process buckets, least recently used dropped beyond `max_keys` (they come back full)"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit) -> float:
+        """Take one token; 0 if granted, otherwise seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (limit.requests, now))
+            tokens = min(limit.requests, tokens + (now - updated) * limit.rate)
+            granted = tokens >= 1
+            self._buckets[key] = (tokens - 1 if granted else tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return 0.0 if granted else (1 - tokens) / limit.rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+_UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+_metadata = MetaData()
+
+_buckets_table = Table(
+    "rate_limit_buckets", _metadata,
+    Column("key", String, primary_key=True),
+    Column("tokens", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),  # Unix time, shared by every worker
+    Column("granted", Boolean, nullable=False),  # outcome of the last take
+)
+
+class DatabaseBuckets:
+    """Buckets shared by every worker through one upsert per take (PostgreSQL or SQLite)"""
+
+    def __init__(self, url: str):
+        self.engine = create_engine(url)
+        if self.engine.dialect.name not in _UPSERT_INSERTS:
+            raise ValueError("RATE_LIMIT_BACKEND must be a PostgreSQL or SQLite URL")
+        _metadata.create_all(self.engine)
+
+    def take(self, key: str, limit: Limit) -> float:
+        now = time.time()
+        table = _buckets_table
+        refill = table.c.tokens + (now - table.c.updated_at) * limit.rate
+        tokens = case((refill > limit.requests, float(limit.requests)), else_=refill)
+        statement = _UPSERT_INSERTS[self.engine.dialect.name](table).values(
+            key=key, tokens=limit.requests - 1, updated_at=now, granted=True,
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={
+                "tokens": case((tokens >= 1, tokens - 1), else_=tokens),
+                "updated_at": now,
+                "granted": tokens >= 1,
+            },
+        ).returning(table.c.tokens, table.c.granted)
+        with self.engine.begin() as connection:
+            row = connection.execute(statement).one()
+        return 0.0 if row.granted else (1 - row.tokens) / limit.rate
+
+    def clear(self):
+        with self.engine.begin() as connection:
+            connection.execute(_buckets_table.delete())
+
+def _client_ip(scope) -> str:
+    """The address the outermost trusted proxy saw (RATE_LIMIT_PROXY_HOPS), else the peer's"""
+    hops = settings.RATE_LIMIT_PROXY_HOPS
+    if hops > 0:
+        forwarded = ",".join(
+            value.decode("latin-1") for key, value in scope["headers"] if key == b"x-forwarded-for"
+        )
+        hosts = [host.strip() for host in forwarded.split(",") if host.strip()]
+        # Entries left of the proxies' own come from the client and can be anything
+        if len(hosts) >= hops:
+            return hosts[-hops]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+def _body_field(body: bytes, content_type: str, field: str) -> Optional[str]:
+    """`field` from a urlencoded form or JSON object body, if present"""
+    try:
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            values = parse_qs(body.decode("utf-8")).get(field)
+            value = values[0] if values else None
+        elif content_type.startswith("application/json"):
+            data = json.loads(body)
+            value = data.get(field) if isinstance(data, dict) else None
+        else:
+            return None
+    except ValueError:
+        # Malformed bodies are rejected by the endpoint's validation
+        return None
+    return value.strip().lower() if isinstance(value, str) and value.strip() else None
+
+async def _send_429(send, retry_after: float):
+    body = json.dumps({"detail": "Too many requests, please retry later"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware; only auth bodies are read (and replayed to the endpoint) to find the subject"""
+
+    def __init__(self, app, buckets=None, limits: dict = None):
+        self.app = app
+        self.buckets = buckets if buckets is not None else rate_limit_buckets
+        self.limits = limits if limits is not None else rate_limits
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED:
+            return await self.app(scope, receive, send)
+        route = self._route(scope)
+        if route is None:
+            return await self.app(scope, receive, send)
+        name, body_field = route
+
+        subject = None
+        if body_field is not None:
+            receive, subject = await self._read_subject(scope, receive, body_field)
+        elif name == "purchase":
+            subject = bearer_subject(scope)
+
+        for bucket_scope, identity in (("ip", _client_ip(scope)), ("user", subject)):
+            limit = self.limits.get((name, bucket_scope))
+            if limit is None or identity is None:
+                continue
+            key = f"{name}:{bucket_scope}:{identity}"
+            if isinstance(self.buckets, MemoryBuckets):
+                retry_after = self.buckets.take(key, limit)
+            else:
+                retry_after = await run_in_threadpool(self.buckets.take, key, limit)
+            if retry_after:
+                metrics.RATE_LIMITED.inc(route=name, scope=bucket_scope)
+                return await _send_429(send, retry_after)
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _route(scope) -> Optional[tuple]:
+        for method, pattern, name, body_field in ROUTES:
+            if scope["method"] == method and pattern.fullmatch(scope["path"]):
+                return name, body_field
+        return None
+
+    @staticmethod
+    async def _read_subject(scope, receive, field: str) -> tuple:
+        """Buffer the (small) body to find the subject; returns a receive that replays it"""
+        messages = []
+        size = 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            size += len(message.get("body", b""))
+            if not message.get("more_body", False) or size > MAX_INSPECTED_BODY_BYTES:
+                break
+
+        async def replay():
+            return messages.pop(0) if messages else await receive()
+
+        if messages[-1].get("more_body", False) or messages[-1]["type"] != "http.request":
+            # Too big (or the client left) - limit by IP only
+            return replay, None
+        content_type = ""
+        for key, value in scope["headers"]:
+            if key == b"content-type":
+                content_type = value.decode("latin-1").lower()
+        body = b"".join(message.get("body", b"") for message in messages)
+        return replay, _body_field(body, content_type, field)
+
+rate_limits = parse_limits(settings.RATE_LIMITS)
+
+rate_limit_buckets = (
+    DatabaseBuckets(settings.RATE_LIMIT_BACKEND) if settings.RATE_LIMIT_BACKEND
+    else MemoryBuckets(settings.RATE_LIMIT_MAX_KEYS)
+)
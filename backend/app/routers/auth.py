@@ -1,22 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
 from app.database import get_db, settings
 from app.models import User
 from app.schemas import UserCreate, UserResponse, Token, TokenWithUser, ForgotPasswordRequest, ResetPasswordRequest, PasswordResetResponse
-from app.utils import get_password_hash, verify_password, create_access_token, generate_reset_token
+from app.utils import create_access_token, generate_reset_token
+from app.hashing import get_password_hash_async, verify_password_async
 from app.dependencies import get_current_user
+from app.cache import user_cache
 
 router = APIRouter()
 
+# The password endpoints are async so they can await the bcrypt process pool;
+# their (blocking) database calls are pushed to the threadpool with these helpers.
+
+def _commit(db: Session):
+    db.commit()
+
+def _commit_and_refresh(db: Session, instance):
+    db.commit()
+    db.refresh(instance)
+
 @router.post("/register", response_model=TokenWithUser, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     try:
         # Check if username exists
-        existing_user = db.query(User).filter(
-            (User.username == user_data.username) | (User.email == user_data.email)
-        ).first()
+        existing_user = await run_in_threadpool(
+            lambda: db.query(User).filter(
+                (User.username == user_data.username) | (User.email == user_data.email)
+            ).first()
+        )
     except Exception as e:
         # If database connection fails, provide helpful error
         raise HTTPException(
@@ -31,7 +46,7 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     # Use role from user_data if provided, otherwise default to "user"
     # Role is saved directly to database - no manual update needed
     user_role = user_data.role if hasattr(user_data, 'role') and user_data.role else "user"
@@ -42,8 +57,8 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         role=user_role
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await run_in_threadpool(_commit_and_refresh, db, db_user)
+    user_cache.invalidate(db_user.username)
     
     # Create access token
     access_token = create_access_token(
@@ -57,10 +72,12 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     }
 
 @router.post("/login", response_model=TokenWithUser)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await run_in_threadpool(
+        lambda: db.query(User).filter(User.username == form_data.username).first()
+    )
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -107,9 +124,11 @@ def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db
     }
 
 @router.post("/reset-password", response_model=dict)
-def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db)):
+async def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db)):
     """Reset password using the reset token"""
-    user = db.query(User).filter(User.reset_token == request.token).first()
+    user = await run_in_threadpool(
+        lambda: db.query(User).filter(User.reset_token == request.token).first()
+    )
     
     if not user:
         raise HTTPException(
@@ -131,7 +150,7 @@ def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db))
         if token_expires < current_time:
             user.reset_token = None
             user.reset_token_expires = None
-            db.commit()
+            await run_in_threadpool(_commit, db)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Reset token has expired. Please request a new one."
@@ -146,10 +165,13 @@ def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db))
         )
     
     # Update password
-    user.hashed_password = get_password_hash(request.new_password)
+    user.hashed_password = await get_password_hash_async(request.new_password)
     user.reset_token = None
     user.reset_token_expires = None
-    db.commit()
+    # Read before the commit expires the instance - afterwards it would lazy-load on the event loop
+    username = user.username
+    await run_in_threadpool(_commit, db)
+    user_cache.invalidate(username)
     
     return {
         "message": "Password has been reset successfully. You can now login with your new password."
@@ -0,0 +1,82 @@
+"""
+Asyncio versions of the login/register endpoints (enabled with ASYNC_DB=true).
+
+Mounted in front of app/routers/auth.py; the password reset endpoints stay on the sync router.
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.models import User
+from app.schemas import UserCreate, UserResponse, TokenWithUser
+from app.utils import create_access_token
+from app.hashing import get_password_hash_async, verify_password_async
+from app.dependencies import get_current_user_async
+from app.cache import user_cache
+
+router = APIRouter()
+
+@router.post("/register", response_model=TokenWithUser, status_code=status.HTTP_201_CREATED)
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    try:
+        existing_user = await db.scalar(
+            select(User).where((User.username == user_data.username) | (User.email == user_data.email))
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database connection error: {str(e)}. Please check your database configuration."
+        )
+    
+    if existing_user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already exists"
+        )
+    
+    db_user = User(
+        username=user_data.username,
+        email=user_data.email,
+        hashed_password=await get_password_hash_async(user_data.password),
+        role=user_data.role or "user"
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    user_cache.invalidate(db_user.username)
+    
+    access_token = create_access_token(
+        data={"sub": db_user.username, "role": db_user.role}
+    )
+    
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": db_user
+    }
+
+@router.post("/login", response_model=TokenWithUser)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.username == form_data.username))
+    
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    access_token = create_access_token(
+        data={"sub": user.username, "role": user.role}
+    )
+    
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": user
+    }
+
+@router.get("/me", response_model=UserResponse)
+async def get_current_user_info(current_user: User = Depends(get_current_user_async)):
+    return current_user
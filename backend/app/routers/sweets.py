@@ -1,45 +1,286 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from sqlalchemy import update, insert, select, case, func, union_all
 from decimal import Decimal
-from typing import List, Optional
-from app.database import get_db
+from datetime import date, datetime
+from typing import List, Literal, Optional
+from app.database import get_db, settings
 from app.models import Sweet, PurchaseHistory
 from app.schemas import (
     SweetCreate, SweetUpdate, SweetResponse,
-    PurchaseRequest, RestockRequest, PurchaseHistoryResponse, AdminPurchaseHistoryResponse
+    PurchaseRequest, RestockRequest, CheckoutRequest, PurchaseHistoryResponse, AdminPurchaseHistoryResponse,
+    SalesAnalyticsResponse, ImportReportResponse, StockShardsRequest
 )
-from app.dependencies import get_current_user, require_admin
+from app.dependencies import get_current_user, get_read_db, require_admin
+from app.streaming import export_response, ndjson_response, STREAM_BATCH_SIZE
+from app import analytics, bulk_import, inventory, search, metrics, write_behind
+from app.serialization import list_response, schema_columns
+from app.catalog import catalog_version, check_not_modified
+from app.cache import mark_recent_write
+from app.purge import sweet_purger
+from app.events import stock_events
 from app.models import User
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+# Columns needed to build a SweetResponse straight from a row (list queries, UPDATE ... RETURNING),
+# in the schema's field order so list_response can zip them with the field names
+SWEET_RESPONSE_COLUMNS = schema_columns(Sweet, SweetResponse)
+PURCHASE_HISTORY_COLUMNS = schema_columns(PurchaseHistory, PurchaseHistoryResponse)
+
+# The same columns for reads: quantity is the sum of the shards for sharded sweets (app.inventory)
+SWEET_READ_COLUMNS = inventory.read_columns(SWEET_RESPONSE_COLUMNS)
+
+# Soft-deleted sweets wait for the background purge (app/purge.py); every lookup skips them
+NOT_DELETED = Sweet.deleted_at.is_(None)
+
+# Stock kept in sweets.quantity; sharded sweets are bought through inventory.claim
+UNSHARDED = Sweet.stock_shards == 0
+
+# --- Helpers shared with app/routers/sweets_async.py ---
+
+def merge_checkout_lines(checkout_data: CheckoutRequest) -> dict:
+    """Merge repeated lines for the same sweet into {sweet_id: requested quantity}"""
+    wanted = {}
+    for item in checkout_data.items:
+        wanted[item.sweet_id] = wanted.get(item.sweet_id, 0) + item.quantity
+    return wanted
+
+def checkout_update(wanted: dict):
+    """One conditional UPDATE for the whole basket (see purchase_sweet)"""
+    requested = case(wanted, value=Sweet.id)
+    return (
+        update(Sweet)
+        .where(Sweet.id.in_(wanted), NOT_DELETED, UNSHARDED, Sweet.quantity >= requested)
+        .values(quantity=Sweet.quantity - requested)
+        .returning(*SWEET_RESPONSE_COLUMNS)
+    )
+
+def claim_sharded(db: Session, wanted: dict) -> Optional[list]:
+    """
+    Fill {sweet_id: quantity} lines the stock UPDATE skipped because the sweets are sharded.
+    Returns their response rows (plus stock_shards), or None if any line is not a sharded
+    sweet or can't be filled.
+    """
+    shards = dict(db.execute(
+        select(Sweet.id, Sweet.stock_shards).where(Sweet.id.in_(wanted), NOT_DELETED, Sweet.stock_shards > 0)
+    ).all())
+    if len(shards) != len(wanted):
+        return None
+    # In id order, so two baskets with the same sweets lock their shards in the same order
+    for sweet_id in sorted(wanted):
+        if not inventory.claim(db, sweet_id, wanted[sweet_id], shards[sweet_id]):
+            return None
+    return db.execute(select(*SWEET_READ_COLUMNS, Sweet.stock_shards).where(Sweet.id.in_(wanted))).all()
+
+def sweet_response(db: Session, sweet_id: int) -> dict:
+    return dict(db.execute(select(*SWEET_READ_COLUMNS).where(Sweet.id == sweet_id)).one()._mapping)
+
+def history_values(current_user, row, quantity: int) -> dict:
+    """PurchaseHistory row for `quantity` units of the sweet returned by a stock UPDATE"""
+    return {
+        "user_id": current_user.id,
+        "sweet_id": row.id,
+        "sweet_name": row.name,
+        "category": row.category,
+        "price": row.price,
+        "quantity": quantity,
+        "total_price": row.price * quantity,
+    }
+
+def sharded_lines(claimed: list) -> dict:
+    """{sweet_id: shard count} for rows returned by claim_sharded"""
+    return {row.id: row.stock_shards for row in claimed}
+
+def record_sales(db: Session, current_user, history: list, shards: dict = None):
+    """Add purchase lines to the daily sales rollup (one upsert statement for all lines)"""
+    analytics.add_to_rollup(db, analytics.rollup_rows(current_user, history, shards))
+
+def purchase_failure(available: Optional[int]) -> HTTPException:
+    """Why a single-sweet stock UPDATE matched nothing, given the current quantity"""
+    if available is None:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sweet not found"
+        )
+    if available == 0:
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Sweet is out of stock"
+        )
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Insufficient quantity available"
+    )
+
+def checkout_failure(wanted: dict, available: dict) -> HTTPException:
+    """Why a checkout UPDATE came up short, given {sweet_id: current quantity}"""
+    missing = [sweet_id for sweet_id in wanted if sweet_id not in available]
+    if missing:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Sweet not found: {', '.join(map(str, missing))}"
+        )
+    short = [sweet_id for sweet_id in wanted if available[sweet_id] < wanted[sweet_id]]
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Insufficient quantity available for sweet: {', '.join(map(str, short))}"
+    )
+
+def admin_history_query(current_user, start=None, end=None, before=None):
+    """
+    Purchases of this admin's sweets by regular users, newest first.
+    A single joined query brings the buyer's username along with each purchase.
+    """
+    query = select(
+        PurchaseHistory.id,
+        PurchaseHistory.user_id,
+        User.username,
+        PurchaseHistory.sweet_name,
+        PurchaseHistory.category,
+        PurchaseHistory.price,
+        PurchaseHistory.quantity,
+        PurchaseHistory.total_price,
+        PurchaseHistory.purchased_at,
+    ).join(
+        User, User.id == PurchaseHistory.user_id
+    ).join(
+        Sweet, Sweet.id == PurchaseHistory.sweet_id
+    ).where(
+        User.role == 'user',
+        Sweet.created_by_user_id == current_user.id
+    )
+    
+    if start is not None:
+        query = query.where(PurchaseHistory.purchased_at >= start)
+    if end is not None:
+        query = query.where(PurchaseHistory.purchased_at < end)
+    if before is not None:
+        query = query.where(PurchaseHistory.id < before)
+    
+    return query.order_by(PurchaseHistory.id.desc())
+
+def user_history_query(user_id: int, start=None, end=None):
+    """The user's own purchases, newest first - including ones still queued for write-behind"""
+    query = select(*PURCHASE_HISTORY_COLUMNS).where(PurchaseHistory.user_id == user_id)
+    if start is not None:
+        query = query.where(PurchaseHistory.purchased_at >= start)
+    if end is not None:
+        query = query.where(PurchaseHistory.purchased_at < end)
+    if not settings.PURCHASE_HISTORY_WRITE_BEHIND:
+        return query.order_by(PurchaseHistory.purchased_at.desc())
+    # One statement, so a row being flushed shows up exactly once
+    purchases = union_all(query, write_behind.pending_history_query(user_id, PURCHASE_HISTORY_COLUMNS, start, end)).subquery()
+    return select(*purchases.c).order_by(purchases.c.purchased_at.desc())
+
+def page(rows: list, limit: int, response: Response) -> list:
+    """Trim a limit+1 fetch to `limit` rows, setting X-Next-Cursor if there was another page"""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1].id)
+    return rows
+
 @router.post("/", response_model=SweetResponse, status_code=status.HTTP_201_CREATED)
 def create_sweet(
     sweet_data: SweetCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
-    print(f"✅ create_sweet: User {current_user.username} (role: {current_user.role}) creating sweet: {sweet_data.name}", flush=True)
     sweet_dict = sweet_data.dict()
     sweet_dict['created_by_user_id'] = current_user.id  # Track which admin created this sweet
     db_sweet = Sweet(**sweet_dict)
     db.add(db_sweet)
+    # Marked before the commit so reads can never slip in between it and the mark
+    mark_recent_write(current_user.id)
     db.commit()
+    catalog_version.bump()
     db.refresh(db_sweet)
-    print(f"✅ Sweet created successfully: ID={db_sweet.id}", flush=True)
+    stock_events.publish_stock([db_sweet])
+    logger.info("sweet created", extra={"sweet_id": db_sweet.id, "username": current_user.username})
     return db_sweet
 
+@router.post("/import", response_model=ImportReportResponse)
+async def import_sweets(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Upload format (defaults to the Content-Type)"),
+    mode: Literal["insert", "upsert"] = Query("insert", description="upsert updates your sweets with the same name"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Bulk-create sweets from a CSV (name,category,price,quantity header) or NDJSON upload.
+    The body is streamed, parsed and written in chunks; invalid rows are skipped and
+    listed in the response by line number.
+    """
+    file_format = format or bulk_import.detect_format(request.headers.get("content-type"))
+    if file_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Upload text/csv or application/x-ndjson, or pass ?format=csv|ndjson"
+        )
+    
+    # Parsing and the (sync) database writes run in a worker thread that pulls the body as it goes
+    report = await run_in_threadpool(
+        bulk_import.import_sweets, db, bulk_import.body_chunks(request), file_format,
+        current_user.id, mode == "upsert"
+    )
+    if report["inserted"] or report["updated"]:
+        mark_recent_write(current_user.id)
+        catalog_version.bump()
+        # Too many rows for deltas - clients refetch the list
+        stock_events.publish("reset", {})
+    logger.info("sweets imported", extra={"username": current_user.username, **{
+        key: report[key] for key in ("inserted", "updated", "failed")
+    }})
+    return report
+
 @router.get("/", response_model=List[SweetResponse])
 def get_all_sweets(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size for keyset pagination"),
+    after: Optional[int] = Query(None, ge=0, description="Return sweets with id greater than this cursor"),
+    stream: bool = Query(False, description="Stream the catalog as NDJSON from a server-side cursor"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    sweets = db.query(Sweet).all()
-    return sweets
+    """
+    List sweets ordered by id.
+    Without parameters the whole catalog is returned (what the dashboard expects);
+    `limit`/`after` page through it by id and set X-Next-Cursor when more rows remain.
+    Responses carry an ETag; an unchanged catalog answers 304 without querying.
+    Reads the primary, not the replica: the ETag's version stamp is bumped at primary
+    commit, so a lagging replica would pin a stale body under the new tag.
+    """
+    not_modified = check_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    
+    query = db.query(*SWEET_READ_COLUMNS).filter(NOT_DELETED).order_by(Sweet.id)
+    if after is not None:
+        query = query.filter(Sweet.id > after)
+    
+    if stream:
+        # yield_per uses a server-side cursor, so memory stays flat for any catalog size
+        if limit is not None:
+            query = query.limit(limit)
+        return ndjson_response(query.yield_per(STREAM_BATCH_SIZE), SweetResponse, headers=dict(response.headers))
+    
+    if limit is None:
+        return list_response(query.all(), SweetResponse, response)
+    
+    # Fetch one extra row to know whether another page exists
+    return list_response(page(query.limit(limit + 1).all(), limit, response), SweetResponse, response)
 
 @router.get("/search", response_model=List[SweetResponse])
 def search_sweets(
+    request: Request,
+    response: Response,
     name: Optional[str] = Query(None),
     category: Optional[str] = Query(None),
     min_price: Optional[float] = Query(None),
@@ -47,15 +288,12 @@ def search_sweets(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Sweet)
+    """Search sweets by name/category (typo tolerant, most relevant first) and price range (ETag'd, so on the primary)"""
+    not_modified = check_not_modified(request, response)
+    if not_modified:
+        return not_modified
     
-    filters = []
-    
-    if name:
-        filters.append(Sweet.name.ilike(f"%{name}%"))
-    
-    if category:
-        filters.append(Sweet.category.ilike(f"%{category}%"))
+    filters = [NOT_DELETED]
     
     if min_price is not None:
         filters.append(Sweet.price >= Decimal(str(min_price)))
@@ -63,11 +301,28 @@ def search_sweets(
     if max_price is not None:
         filters.append(Sweet.price <= Decimal(str(max_price)))
     
-    if filters:
-        query = query.filter(and_(*filters))
-    
-    sweets = query.all()
-    return sweets
+    sweets = search.search_sweets(db, filters, name=name, category=category, columns=SWEET_READ_COLUMNS)
+    return list_response(sweets, SweetResponse, response)
+
+@router.get("/events")
+async def stream_stock_events(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Server-Sent Events stream of catalog changes (see app.events): `stock` deltas
+    {id, quantity, price}, `deleted` {id}, and `reset` when the client should refetch the list.
+    Reconnecting clients resume from Last-Event-ID.
+    """
+    # The stream outlives the request; don't keep the session's pooled connection for it
+    await run_in_threadpool(db.close)
+    subscription = stock_events.subscribe(request.headers.get("Last-Event-ID"))
+    return StreamingResponse(
+        stock_events.stream(subscription, settings.SSE_KEEPALIVE_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # IMPORTANT: Sub-routes (purchase, restock) must come BEFORE the main {sweet_id} routes
 # Otherwise FastAPI might match {sweet_id} to "purchase" or "restock"
@@ -78,45 +333,90 @@ def purchase_sweet(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    print(f"🔍 purchase_sweet called: sweet_id={sweet_id}, quantity={purchase_data.quantity}", flush=True)
-    db_sweet = db.query(Sweet).filter(Sweet.id == sweet_id).first()
-    if not db_sweet:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Sweet not found"
-        )
-    
-    if db_sweet.quantity < purchase_data.quantity:
+    logger.debug("purchase requested", extra={"sweet_id": sweet_id, "quantity": purchase_data.quantity})
+    if purchase_data.quantity < 1:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Insufficient quantity available"
+            detail="Purchase quantity must be at least 1"
         )
     
-    if db_sweet.quantity == 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Sweet is out of stock"
-        )
+    # Check and decrement stock in one conditional UPDATE so concurrent buyers
+    # can never oversell; RETURNING hands back the new row without a refresh
+    purchased = db.execute(
+        update(Sweet)
+        .where(Sweet.id == sweet_id, NOT_DELETED, UNSHARDED, Sweet.quantity >= purchase_data.quantity)
+        .values(quantity=Sweet.quantity - purchase_data.quantity)
+        .returning(*SWEET_RESPONSE_COLUMNS)
+    ).first()
     
-    db_sweet.quantity -= purchase_data.quantity
-    
-    # Save purchase history
-    total_price = db_sweet.price * purchase_data.quantity
-    purchase_record = PurchaseHistory(
-        user_id=current_user.id,
-        sweet_id=db_sweet.id,
-        sweet_name=db_sweet.name,
-        category=db_sweet.category,
-        price=db_sweet.price,
-        quantity=purchase_data.quantity,
-        total_price=total_price
-    )
-    db.add(purchase_record)
+    shards = {}
+    if purchased is None:
+        # A sharded sweet's stock is claimed from one of its counter rows instead
+        claimed = claim_sharded(db, {sweet_id: purchase_data.quantity})
+        if claimed is None:
+            # Nothing was updated - find out why (only on the failure path)
+            db.rollback()
+            available = db.execute(
+                select(inventory.QUANTITY).where(Sweet.id == sweet_id, NOT_DELETED)
+            ).scalar_one_or_none()
+            raise purchase_failure(available)
+        purchased = claimed[0]
+        shards = sharded_lines(claimed)
     
+    # Save (or, in write-behind mode, queue) purchase history and update the sales rollup in the same transaction
+    history = [history_values(current_user, purchased, purchase_data.quantity)]
+    db.execute(insert(write_behind.history_model()), history)
+    record_sales(db, current_user, history, shards)
+    mark_recent_write(current_user.id)
     db.commit()
-    db.refresh(db_sweet)
-    print(f"✅ Purchase successful: {db_sweet.name} quantity now {db_sweet.quantity}", flush=True)
-    return db_sweet
+    catalog_version.bump()
+    stock_events.publish_stock([purchased])
+    metrics.PURCHASES.inc(endpoint="purchase")
+    metrics.PURCHASED_UNITS.inc(purchase_data.quantity, endpoint="purchase")
+    logger.debug("purchase completed", extra={"sweet_id": purchased.id, "remaining": purchased.quantity})
+    return dict(purchased._mapping)
+
+@router.post("/checkout", response_model=List[SweetResponse])
+def checkout(
+    checkout_data: CheckoutRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Purchase several sweets at once - either every line succeeds or nothing is bought"""
+    wanted = merge_checkout_lines(checkout_data)
+    logger.debug("checkout requested", extra={"lines": len(wanted)})
+    
+    purchased = db.execute(checkout_update(wanted)).all()
+    shards = {}
+    
+    if len(purchased) != len(wanted):
+        # Lines for sharded sweets are claimed from their counter rows
+        filled = {row.id for row in purchased}
+        claimed = claim_sharded(db, {sweet_id: quantity for sweet_id, quantity in wanted.items() if sweet_id not in filled})
+        if claimed is None:
+            # At least one line could not be filled - undo the others and report why
+            db.rollback()
+            available = dict(db.execute(
+                select(Sweet.id, inventory.QUANTITY).where(Sweet.id.in_(wanted), NOT_DELETED)
+            ).all())
+            raise checkout_failure(wanted, available)
+        purchased += claimed
+        shards = sharded_lines(claimed)
+    
+    # Save purchase history for every line with a single bulk INSERT, then update the rollup
+    history = [history_values(current_user, row, wanted[row.id]) for row in purchased]
+    db.execute(insert(write_behind.history_model()), history)
+    record_sales(db, current_user, history, shards)
+    mark_recent_write(current_user.id)
+    db.commit()
+    catalog_version.bump()
+    stock_events.publish_stock(purchased)
+    metrics.PURCHASES.inc(len(wanted), endpoint="checkout")
+    metrics.PURCHASED_UNITS.inc(sum(wanted.values()), endpoint="checkout")
+    
+    # Answer in the order the sweets were requested
+    by_id = {row.id: dict(row._mapping) for row in purchased}
+    return [by_id[sweet_id] for sweet_id in wanted]
 
 @router.post("/{sweet_id}/restock", response_model=SweetResponse)
 def restock_sweet(
@@ -125,17 +425,65 @@ def restock_sweet(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
-    db_sweet = db.query(Sweet).filter(Sweet.id == sweet_id).first()
+    # Add in one UPDATE, like purchases subtract, so a restock racing purchases can't
+    # write back a stale quantity
+    restocked = db.execute(
+        update(Sweet)
+        .where(Sweet.id == sweet_id, NOT_DELETED, UNSHARDED)
+        .values(quantity=Sweet.quantity + restock_data.quantity)
+        .returning(*SWEET_RESPONSE_COLUMNS)
+    ).first()
+    
+    if restocked is None:
+        shards = db.execute(
+            select(Sweet.stock_shards).where(Sweet.id == sweet_id, NOT_DELETED)
+        ).scalar_one_or_none()
+        if shards is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Sweet not found"
+            )
+        # Spread the new stock over the counters, evening them out
+        inventory.rebalance(db, sweet_id, add=restock_data.quantity)
+    mark_recent_write(current_user.id)
+    db.commit()
+    catalog_version.bump()
+    metrics.RESTOCKS.inc()
+    metrics.RESTOCKED_UNITS.inc(restock_data.quantity)
+    restocked = dict(restocked._mapping) if restocked is not None else sweet_response(db, sweet_id)
+    stock_events.publish_stock([restocked])
+    return restocked
+
+@router.put("/{sweet_id}/stock-shards", response_model=SweetResponse)
+def set_stock_shards(
+    sweet_id: int,
+    shard_data: StockShardsRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Split the sweet's stock across `shards` counter rows so concurrent purchases of it
+    don't queue on one row lock (flash sales); 0 folds it back into a single row.
+    """
+    db_sweet = db.query(Sweet).filter(Sweet.id == sweet_id, NOT_DELETED).first()
     if not db_sweet:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Sweet not found"
         )
     
-    db_sweet.quantity += restock_data.quantity
+    if db_sweet.created_by_user_id and db_sweet.created_by_user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only edit sweets that you created"
+        )
+    
+    inventory.rebalance(db, sweet_id, shards=shard_data.shards)
+    mark_recent_write(current_user.id)
     db.commit()
-    db.refresh(db_sweet)
-    return db_sweet
+    catalog_version.bump()
+    logger.info("sweet stock sharded", extra={"sweet_id": sweet_id, "shards": shard_data.shards})
+    return sweet_response(db, sweet_id)
 
 @router.put("/{sweet_id}/", response_model=SweetResponse)
 def update_sweet(
@@ -144,7 +492,7 @@ def update_sweet(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
-    db_sweet = db.query(Sweet).filter(Sweet.id == sweet_id).first()
+    db_sweet = db.query(Sweet).filter(Sweet.id == sweet_id, NOT_DELETED).first()
     if not db_sweet:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -159,13 +507,20 @@ def update_sweet(
         )
     
     update_data = sweet_data.dict(exclude_unset=True)
+    # A sharded sweet's new quantity is spread over its counter rows instead
+    new_total = update_data.pop("quantity", None) if db_sweet.stock_shards else None
     for field, value in update_data.items():
         if value is not None:
             setattr(db_sweet, field, value)
+    if new_total is not None:
+        inventory.rebalance(db, sweet_id, total=new_total)
     
+    mark_recent_write(current_user.id)
     db.commit()
-    db.refresh(db_sweet)
-    return db_sweet
+    catalog_version.bump()
+    updated = sweet_response(db, sweet_id)
+    stock_events.publish_stock([updated])
+    return updated
 
 @router.delete("/{sweet_id}/", status_code=status.HTTP_204_NO_CONTENT)
 def delete_sweet(
@@ -173,82 +528,108 @@ def delete_sweet(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
-    print(f"🗑️ delete_sweet called: sweet_id={sweet_id}, current_user={current_user.username} (ID: {current_user.id})", flush=True)
-    db_sweet = db.query(Sweet).filter(Sweet.id == sweet_id).first()
+    db_sweet = db.query(Sweet).filter(Sweet.id == sweet_id, NOT_DELETED).first()
     if not db_sweet:
-        print(f"❌ Sweet {sweet_id} not found", flush=True)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Sweet not found"
         )
     
-    print(f"🔍 Sweet found: {db_sweet.name}, created_by_user_id={db_sweet.created_by_user_id}", flush=True)
-    
     # Check if this sweet was created by a different admin
     if db_sweet.created_by_user_id and db_sweet.created_by_user_id != current_user.id:
-        print(f"❌ Ownership check failed: {db_sweet.created_by_user_id} != {current_user.id}", flush=True)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You can only delete sweets that you created"
         )
     
-    print(f"✅ Ownership verified, deleting sweet {db_sweet.name}", flush=True)
-    
-    # First delete related purchase history to avoid foreign key constraint violation
-    purchase_count = db.query(PurchaseHistory).filter(PurchaseHistory.sweet_id == sweet_id).delete()
-    print(f"🗑️ Deleted {purchase_count} purchase history records", flush=True)
-    
-    db.delete(db_sweet)
+    # Soft delete: a single-row UPDATE whatever the sales history. The sweet disappears from
+    # the catalog now; its purchase history is archived/purged in batches by app.purge
+    db_sweet.deleted_at = func.now()
+    mark_recent_write(current_user.id)
     db.commit()
-    print(f"✅ Sweet deleted successfully", flush=True)
+    catalog_version.bump()
+    stock_events.publish("deleted", {"id": sweet_id})
+    sweet_purger.wake()
+    logger.info("sweet deleted", extra={"sweet_id": sweet_id})
     return None
 
 @router.get("/purchase-history", response_model=List[PurchaseHistoryResponse])
 def get_purchase_history(
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get purchase history for the current user"""
-    purchases = db.query(PurchaseHistory).filter(
-        PurchaseHistory.user_id == current_user.id
-    ).order_by(PurchaseHistory.purchased_at.desc()).all()
-    return purchases
+    return list_response(db.execute(user_history_query(current_user.id)).all(), PurchaseHistoryResponse, response)
+
+@router.get("/purchase-history/export")
+def export_purchase_history(
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    start: Optional[datetime] = Query(None, description="Only purchases made at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only purchases made before this time"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Download the current user's purchase history, streamed from a server-side cursor"""
+    query = user_history_query(current_user.id, start, end)
+    rows = db.execute(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+    return export_response(rows, PurchaseHistoryResponse, format, "purchase-history")
 
 @router.get("/admin/purchase-history", response_model=List[AdminPurchaseHistoryResponse])
 def get_all_purchase_history(
-    db: Session = Depends(get_db),
+    response: Response,
+    start: Optional[datetime] = Query(None, description="Only purchases made at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only purchases made before this time"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size for keyset pagination"),
+    before: Optional[int] = Query(None, ge=1, description="Return purchases with id lower than this cursor"),
+    stream: bool = Query(False, description="Stream the history as NDJSON from a server-side cursor"),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(require_admin)
 ):
-    """Get purchase history for sweets created by this admin, purchased by regular users only"""
-    from sqlalchemy.orm import joinedload
+    """
+    Get purchase history for sweets created by this admin, purchased by regular users only.
+    Newest first (by id); `limit`/`before` page backwards and set X-Next-Cursor when more rows remain.
+    """
+    query = admin_history_query(current_user, start, end, before)
     
-    # Get IDs of all sweets created by this admin
-    admin_sweet_ids = db.query(Sweet.id).filter(
-        Sweet.created_by_user_id == current_user.id
-    ).subquery()
+    if stream:
+        if limit is not None:
+            query = query.limit(limit)
+        rows = db.execute(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        return ndjson_response(rows, AdminPurchaseHistoryResponse)
     
-    # Only get purchases:
-    # 1. Made by regular users (role='user')
-    # 2. Of sweets created by this admin
-    purchases = db.query(PurchaseHistory).join(User).filter(
-        User.role == 'user',
-        PurchaseHistory.sweet_id.in_(db.query(Sweet.id).filter(Sweet.created_by_user_id == current_user.id))
-    ).order_by(PurchaseHistory.purchased_at.desc()).all()
-    
-    # Convert to AdminPurchaseHistoryResponse format
-    result = []
-    for purchase in purchases:
-        user = db.query(User).filter(User.id == purchase.user_id).first()
-        result.append({
-            "id": purchase.id,
-            "user_id": purchase.user_id,
-            "username": user.username if user else "Unknown",
-            "sweet_name": purchase.sweet_name,
-            "category": purchase.category,
-            "price": purchase.price,
-            "quantity": purchase.quantity,
-            "total_price": purchase.total_price,
-            "purchased_at": purchase.purchased_at
-        })
-    return result
+    if limit is None:
+        return list_response(db.execute(query).all(), AdminPurchaseHistoryResponse, response)
+    
+    return list_response(page(db.execute(query.limit(limit + 1)).all(), limit, response), AdminPurchaseHistoryResponse, response)
+
+@router.get("/admin/purchase-history/export")
+def export_all_purchase_history(
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    start: Optional[datetime] = Query(None, description="Only purchases made at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only purchases made before this time"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Download the sales of this admin's sweets (same rows as /admin/purchase-history),
+    streamed from a server-side cursor so any size of export runs in constant memory.
+    """
+    query = admin_history_query(current_user, start, end)
+    rows = db.execute(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+    return export_response(rows, AdminPurchaseHistoryResponse, format, "sales")
 
+@router.get("/admin/analytics", response_model=SalesAnalyticsResponse)
+def get_sales_analytics(
+    period: Literal["day", "week", "month"] = Query("day", description="Bucket size for by_period"),
+    start: Optional[date] = Query(None, description="First day to include"),
+    end: Optional[date] = Query(None, description="Day after the last one to include"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Revenue and units for this admin's sweets, bought by regular users: overall and
+    by period, sweet and category. Read from the daily rollup, not from purchase_history.
+    """
+    rows = db.execute(analytics.admin_sales_query(current_user.id, start, end)).all()
+    return analytics.summarize(rows, period)
@@ -0,0 +1,214 @@
+"""
+Asyncio versions of the hot sweets endpoints (enabled with ASYNC_DB=true).
+
+They are mounted in front of app/routers/sweets.py, so these paths are served on the
+AsyncEngine while every other sweets endpoint keeps using the sync router.
+Behaviour and responses match the sync handlers; the queries are shared with them.
+"""
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from decimal import Decimal
+from datetime import datetime
+from typing import List, Optional
+from app.database import get_async_db
+from app.models import Sweet, User
+from app.schemas import (
+    SweetResponse, PurchaseRequest, CheckoutRequest, PurchaseHistoryResponse, AdminPurchaseHistoryResponse
+)
+from app.dependencies import get_current_user_async, require_admin_async
+from app.streaming import ndjson_response, STREAM_BATCH_SIZE
+from app import analytics, inventory, search, metrics, write_behind
+from app.serialization import list_response
+from app.cache import mark_recent_write
+from app.catalog import catalog_version, check_not_modified
+from app.events import stock_events
+from app.routers.sweets import (
+    NOT_DELETED, SWEET_READ_COLUMNS, SWEET_RESPONSE_COLUMNS, UNSHARDED, admin_history_query, user_history_query,
+    checkout_failure, checkout_update, claim_sharded, history_values, merge_checkout_lines, page, purchase_failure,
+    sharded_lines,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+async def record_sales(db: AsyncSession, current_user, history: list, shards: dict = None):
+    rows = analytics.rollup_rows(current_user, history, shards)
+    if rows:
+        await db.run_sync(analytics.add_to_rollup, rows)
+
+@router.get("/", response_model=List[SweetResponse])
+async def get_all_sweets(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size for keyset pagination"),
+    after: Optional[int] = Query(None, ge=0, description="Return sweets with id greater than this cursor"),
+    stream: bool = Query(False, description="Stream the catalog as NDJSON from a server-side cursor"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """List sweets ordered by id (see app.routers.sweets.get_all_sweets)"""
+    not_modified = check_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    
+    query = select(*SWEET_READ_COLUMNS).where(NOT_DELETED).order_by(Sweet.id)
+    if after is not None:
+        query = query.where(Sweet.id > after)
+    
+    if stream:
+        if limit is not None:
+            query = query.limit(limit)
+        rows = await db.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        return ndjson_response(rows, SweetResponse, headers=dict(response.headers))
+    
+    if limit is None:
+        return list_response((await db.execute(query)).all(), SweetResponse, response)
+    
+    return list_response(page((await db.execute(query.limit(limit + 1))).all(), limit, response), SweetResponse, response)
+
+@router.get("/search", response_model=List[SweetResponse])
+async def search_sweets(
+    request: Request,
+    response: Response,
+    name: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    min_price: Optional[float] = Query(None),
+    max_price: Optional[float] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Search sweets by name/category (typo tolerant, most relevant first) and price range"""
+    not_modified = check_not_modified(request, response)
+    if not_modified:
+        return not_modified
+    
+    filters = [NOT_DELETED]
+    
+    if min_price is not None:
+        filters.append(Sweet.price >= Decimal(str(min_price)))
+    
+    if max_price is not None:
+        filters.append(Sweet.price <= Decimal(str(max_price)))
+    
+    # The search backends are written against Session; run_sync drives them on the async connection
+    sweets = await db.run_sync(
+        lambda session: search.search_sweets(session, filters, name=name, category=category, columns=SWEET_READ_COLUMNS)
+    )
+    return list_response(sweets, SweetResponse, response)
+
+@router.post("/{sweet_id}/purchase", response_model=SweetResponse)
+async def purchase_sweet(
+    sweet_id: int,
+    purchase_data: PurchaseRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    if purchase_data.quantity < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Purchase quantity must be at least 1"
+        )
+    
+    purchased = (await db.execute(
+        update(Sweet)
+        .where(Sweet.id == sweet_id, NOT_DELETED, UNSHARDED, Sweet.quantity >= purchase_data.quantity)
+        .values(quantity=Sweet.quantity - purchase_data.quantity)
+        .returning(*SWEET_RESPONSE_COLUMNS)
+    )).first()
+    shards = {}
+    
+    if purchased is None:
+        # The shard claim is written against Session; run_sync drives it on the async connection
+        claimed = await db.run_sync(lambda session: claim_sharded(session, {sweet_id: purchase_data.quantity}))
+        if claimed is None:
+            await db.rollback()
+            available = await db.scalar(select(inventory.QUANTITY).where(Sweet.id == sweet_id, NOT_DELETED))
+            raise purchase_failure(available)
+        purchased = claimed[0]
+        shards = sharded_lines(claimed)
+    
+    history = [history_values(current_user, purchased, purchase_data.quantity)]
+    await db.execute(insert(write_behind.history_model()), history)
+    await record_sales(db, current_user, history, shards)
+    mark_recent_write(current_user.id)
+    await db.commit()
+    catalog_version.bump()
+    stock_events.publish_stock([purchased])
+    metrics.PURCHASES.inc(endpoint="purchase")
+    metrics.PURCHASED_UNITS.inc(purchase_data.quantity, endpoint="purchase")
+    return dict(purchased._mapping)
+
+@router.post("/checkout", response_model=List[SweetResponse])
+async def checkout(
+    checkout_data: CheckoutRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Purchase several sweets at once - either every line succeeds or nothing is bought"""
+    wanted = merge_checkout_lines(checkout_data)
+    purchased = (await db.execute(checkout_update(wanted))).all()
+    shards = {}
+    
+    if len(purchased) != len(wanted):
+        filled = {row.id for row in purchased}
+        missing = {sweet_id: quantity for sweet_id, quantity in wanted.items() if sweet_id not in filled}
+        claimed = await db.run_sync(lambda session: claim_sharded(session, missing))
+        if claimed is None:
+            await db.rollback()
+            available = dict((await db.execute(
+                select(Sweet.id, inventory.QUANTITY).where(Sweet.id.in_(wanted), NOT_DELETED)
+            )).all())
+            raise checkout_failure(wanted, available)
+        purchased += claimed
+        shards = sharded_lines(claimed)
+    
+    history = [history_values(current_user, row, wanted[row.id]) for row in purchased]
+    await db.execute(insert(write_behind.history_model()), history)
+    await record_sales(db, current_user, history, shards)
+    mark_recent_write(current_user.id)
+    await db.commit()
+    catalog_version.bump()
+    stock_events.publish_stock(purchased)
+    metrics.PURCHASES.inc(len(wanted), endpoint="checkout")
+    metrics.PURCHASED_UNITS.inc(sum(wanted.values()), endpoint="checkout")
+    
+    by_id = {row.id: dict(row._mapping) for row in purchased}
+    return [by_id[sweet_id] for sweet_id in wanted]
+
+@router.get("/purchase-history", response_model=List[PurchaseHistoryResponse])
+async def get_purchase_history(
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Get purchase history for the current user"""
+    purchases = (await db.execute(user_history_query(current_user.id))).all()
+    return list_response(purchases, PurchaseHistoryResponse, response)
+
+@router.get("/admin/purchase-history", response_model=List[AdminPurchaseHistoryResponse])
+async def get_all_purchase_history(
+    response: Response,
+    start: Optional[datetime] = Query(None, description="Only purchases made at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only purchases made before this time"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size for keyset pagination"),
+    before: Optional[int] = Query(None, ge=1, description="Return purchases with id lower than this cursor"),
+    stream: bool = Query(False, description="Stream the history as NDJSON from a server-side cursor"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(require_admin_async)
+):
+    """Purchase history for sweets created by this admin (see app.routers.sweets.get_all_purchase_history)"""
+    query = admin_history_query(current_user, start, end, before)
+    
+    if stream:
+        if limit is not None:
+            query = query.limit(limit)
+        rows = await db.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        return ndjson_response(rows, AdminPurchaseHistoryResponse)
+    
+    if limit is None:
+        return list_response((await db.execute(query)).all(), AdminPurchaseHistoryResponse, response)
+    
+    return list_response(page((await db.execute(query.limit(limit + 1))).all(), limit, response), AdminPurchaseHistoryResponse, response)
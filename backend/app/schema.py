@@ -0,0 +1,58 @@
+import logging
+from pathlib import Path
+from typing import Optional
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).parent.parent / "alembic.ini"
+
+# Arbitrary constant identifying the migration lock in pg_advisory_xact_lock
+MIGRATION_LOCK_KEY = 727_001
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keep autogenerate away from the SQLite FTS5 search tables (see app.search)"""
+    return not (type_ == "table" and name.startswith("sweets_fts"))
+
+def alembic_config() -> Config:
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    return config
+
+def head_revision(config: Config = None) -> str:
+    """Newest migration shipped with the code (read from disk, no database access)"""
+    return ScriptDirectory.from_config(config or alembic_config()).get_current_head()
+
+def current_revision(engine: Engine) -> Optional[str]:
+    """Revision recorded in the database, or None for a database that was never migrated"""
+    with engine.connect() as connection:
+        try:
+            return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        except DBAPIError:
+            return None
+
+def ensure_schema(engine: Engine) -> bool:
+    """
+    Bring the database up to the latest migration.
+    The common case - already at head - costs a single query. Otherwise the upgrade
+    runs under a PostgreSQL advisory lock so workers booting together migrate once.
+    Returns True if migrations were applied.
+    """
+    config = alembic_config()
+    head = head_revision(config)
+    if current_revision(engine) == head:
+        return False
+
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            # Held until this transaction ends; other workers wait here, then find nothing to do
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+    logger.info("database migrated", extra={"revision": head})
+    return True
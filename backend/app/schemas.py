@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator  # <-- Added 'field_validator'
-from typing import Optional
+from typing import List, Literal, Optional
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime
 
 class UserBase(BaseModel):
     username: str
@@ -99,6 +99,16 @@ class PurchaseRequest(BaseModel):
 class RestockRequest(BaseModel):
     quantity: int
 
+class StockShardsRequest(BaseModel):
+    shards: int = Field(..., ge=0, le=64, description="Counter rows to split the stock across (0 = unsharded)")
+
+class CheckoutItem(BaseModel):
+    sweet_id: int
+    quantity: int = Field(1, ge=1)
+
+class CheckoutRequest(BaseModel):
+    items: List[CheckoutItem] = Field(..., min_length=1)
+
 class PurchaseHistoryResponse(BaseModel):
     id: int
     sweet_name: str
@@ -123,4 +133,38 @@ class AdminPurchaseHistoryResponse(BaseModel):
     purchased_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class SalesTotals(BaseModel):
+    units: int
+    revenue: Decimal
+    purchases: int
+
+class SalesByPeriod(SalesTotals):
+    period_start: date
+
+class SalesBySweet(SalesTotals):
+    sweet_id: int
+    sweet_name: str
+    category: str
+
+class SalesByCategory(SalesTotals):
+    category: str
+
+class SalesAnalyticsResponse(BaseModel):
+    period: Literal["day", "week", "month"]
+    totals: SalesTotals
+    by_period: List[SalesByPeriod]
+    by_sweet: List[SalesBySweet]
+    by_category: List[SalesByCategory]
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportReportResponse(BaseModel):
+    inserted: int
+    updated: int
+    failed: int
+    errors: List[ImportRowError]
+    errors_truncated: bool
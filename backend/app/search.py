@@ -0,0 +1,172 @@
+"""
+Text search for sweets.
+
+PostgreSQL uses pg_trgm GIN indexes on sweets.name / sweets.category, so both the
+substring (ILIKE) match and the typo-tolerant word-similarity match are index scans.
+SQLite keeps an FTS5 trigram shadow table (sweets_fts) in sync with triggers and
+ranks the candidates it returns with the same word-similarity measure in Python.
+Any other database falls back to plain ILIKE filters.
+"""
+import re
+from sqlalchemy import DDL, event, func, or_, select, text, literal_column
+from sqlalchemy.orm import Session
+from app.models import Sweet
+
+# pg_trgm's default pg_trgm.word_similarity_threshold, used on both backends
+SIMILARITY_THRESHOLD = 0.6
+
+# Searchable fields -> model column (the FTS5 columns use the same names)
+SEARCH_COLUMNS = {
+    "name": Sweet.name,
+    "category": Sweet.category,
+}
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_sweets_name_trgm ON sweets USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_sweets_category_trgm ON sweets USING gin (category gin_trgm_ops)",
+]
+
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS sweets_fts USING fts5("
+    "name, category, content='sweets', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS sweets_fts_ai AFTER INSERT ON sweets BEGIN "
+    "INSERT INTO sweets_fts(rowid, name, category) VALUES (new.id, new.name, new.category); END",
+    "CREATE TRIGGER IF NOT EXISTS sweets_fts_ad AFTER DELETE ON sweets BEGIN "
+    "INSERT INTO sweets_fts(sweets_fts, rowid, name, category) VALUES ('delete', old.id, old.name, old.category); END",
+    # Only name/category changes touch the index - stock updates stay cheap
+    "CREATE TRIGGER IF NOT EXISTS sweets_fts_au AFTER UPDATE OF name, category ON sweets BEGIN "
+    "INSERT INTO sweets_fts(sweets_fts, rowid, name, category) VALUES ('delete', old.id, old.name, old.category); "
+    "INSERT INTO sweets_fts(rowid, name, category) VALUES (new.id, new.name, new.category); END",
+    # Index any rows that existed before the shadow table
+    "INSERT INTO sweets_fts(sweets_fts) VALUES ('rebuild')",
+]
+
+SQLITE_SEARCH_DROP_DDL = [
+    "DROP TABLE IF EXISTS sweets_fts",
+]
+
+# Create/drop the search structures alongside the sweets table (create_all / drop_all)
+for statement in POSTGRES_SEARCH_DDL:
+    event.listen(Sweet.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Sweet.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in SQLITE_SEARCH_DROP_DDL:
+    event.listen(Sweet.__table__, "before_drop", DDL(statement).execute_if(dialect="sqlite"))
+
+# --- Trigram similarity (mirrors pg_trgm) ---
+
+def _words(value: str):
+    return re.findall(r"\w+", value.lower())
+
+def _word_trigrams(word: str):
+    padded = f"  {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def trigrams(value: str) -> set:
+    grams = set()
+    for word in _words(value):
+        grams.update(_word_trigrams(word))
+    return grams
+
+def word_similarity(term: str, value: str) -> float:
+    """
+    Greatest similarity between the trigrams of `term` and any contiguous
+    extent of the trigrams of `value` (pg_trgm's word_similarity).
+    """
+    term_grams = trigrams(term)
+    if not term_grams:
+        return 0.0
+    ordered = [gram for word in _words(value) for gram in _word_trigrams(word)]
+    matches = [i for i, gram in enumerate(ordered) if gram in term_grams]
+    best = 0.0
+    # The best extent always starts and ends on a shared trigram
+    for start_index, start in enumerate(matches):
+        for end in matches[start_index:]:
+            extent = set(ordered[start:end + 1])
+            shared = len(extent & term_grams)
+            best = max(best, shared / len(extent | term_grams))
+    return best
+
+def relevance(sweet, terms: dict) -> float:
+    return sum(word_similarity(term, getattr(sweet, field)) for field, term in terms.items())
+
+def matches(sweet, terms: dict) -> bool:
+    for field, term in terms.items():
+        value = getattr(sweet, field)
+        if term.lower() not in value.lower() and word_similarity(term, value) < SIMILARITY_THRESHOLD:
+            return False
+    return True
+
+# --- Backends ---
+
+def _base_query(db: Session, filters: list, columns: tuple = None):
+    return (db.query(*columns) if columns else db.query(Sweet)).filter(*filters)
+
+class IlikeSearch:
+    """Unindexed substring match - used for databases without a search backend"""
+
+    def search(self, db: Session, filters: list, terms: dict, columns: tuple = None):
+        query = _base_query(db, filters, columns)
+        for field, term in terms.items():
+            query = query.filter(SEARCH_COLUMNS[field].ilike(f"%{term}%"))
+        return query.order_by(Sweet.id).all()
+
+class PostgresSearch:
+    """ILIKE or word-similarity (%>) on pg_trgm GIN indexes, ranked by similarity"""
+
+    def search(self, db: Session, filters: list, terms: dict, columns: tuple = None):
+        query = _base_query(db, filters, columns)
+        if not terms:
+            return query.order_by(Sweet.id).all()
+        scores = []
+        for field, term in terms.items():
+            column = SEARCH_COLUMNS[field]
+            query = query.filter(or_(column.ilike(f"%{term}%"), column.op("%>")(term)))
+            scores.append(func.word_similarity(term, column))
+        return query.order_by(sum(scores).desc(), Sweet.id).all()
+
+class SqliteSearch:
+    """FTS5 trigram candidates, filtered and ranked by word similarity in Python"""
+
+    def _candidate_ids(self, field: str, term: str):
+        # The FTS5 tokenizer indexes raw 3-character windows (no word padding)
+        grams = sorted({word[i:i + 3] for word in _words(term) for i in range(len(word) - 2)})
+        if not grams:
+            return None
+        # Any shared trigram makes a row a candidate; similarity decides the rest
+        match = f"{field} : (" + " OR ".join('"' + gram.replace('"', '""') + '"' for gram in grams) + ")"
+        return (
+            select(literal_column("rowid"))
+            .select_from(text("sweets_fts"))
+            .where(text(f"sweets_fts MATCH :match_{field}").bindparams(**{f"match_{field}": match}))
+        )
+
+    def search(self, db: Session, filters: list, terms: dict, columns: tuple = None):
+        query = _base_query(db, filters, columns)
+        if not terms:
+            return query.order_by(Sweet.id).all()
+        for field, term in terms.items():
+            # Terms without a 3+ character word can't use the trigram index
+            candidate_ids = self._candidate_ids(field, term)
+            if candidate_ids is None:
+                query = query.filter(SEARCH_COLUMNS[field].ilike(f"%{term}%"))
+            else:
+                query = query.filter(Sweet.id.in_(candidate_ids))
+        sweets = [sweet for sweet in query.all() if matches(sweet, terms)]
+        sweets.sort(key=lambda sweet: (-relevance(sweet, terms), sweet.id))
+        return sweets
+
+BACKENDS = {
+    "postgresql": PostgresSearch(),
+    "sqlite": SqliteSearch(),
+}
+
+def search_sweets(db: Session, filters: list, name: str = None, category: str = None, columns: tuple = None):
+    """
+    Return sweets matching `filters` and the text terms, most relevant first - as rows of
+    `columns` if given (they must include name and category), Sweet objects otherwise
+    """
+    terms = {field: term for field, term in (("name", name), ("category", category)) if term}
+    backend = BACKENDS.get(db.get_bind().dialect.name, IlikeSearch())
+    return backend.search(db, filters, terms, columns)
@@ -0,0 +1,57 @@
+import csv
+import io
+from typing import AsyncIterable, Iterable, Type, Union
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+
+# CSV rows buffered into each chunk sent to the client
+CSV_ROWS_PER_CHUNK = 200
+
+# Rows fetched per round trip when reading from a server-side cursor
+STREAM_BATCH_SIZE = 500
+
+def iter_ndjson(rows: Iterable, schema: Type[BaseModel]):
+    """Serialize rows one at a time as newline-delimited JSON"""
+    for row in rows:
+        yield schema.model_validate(row).model_dump_json() + "\n"
+
+async def aiter_ndjson(rows: AsyncIterable, schema: Type[BaseModel]):
+    """iter_ndjson for async results (AsyncSession.stream)"""
+    async for row in rows:
+        yield schema.model_validate(row).model_dump_json() + "\n"
+
+def ndjson_response(rows: Union[Iterable, AsyncIterable], schema: Type[BaseModel], headers: dict = None) -> StreamingResponse:
+    """Stream rows (ideally a yield_per query) without materializing the result set"""
+    lines = aiter_ndjson(rows, schema) if hasattr(rows, "__aiter__") else iter_ndjson(rows, schema)
+    return StreamingResponse(
+        lines,
+        media_type=NDJSON_MEDIA_TYPE,
+        headers=headers,
+    )
+
+def iter_csv(rows: Iterable, schema: Type[BaseModel]):
+    """Serialize rows as CSV (header from the schema's fields), a few hundred rows per chunk"""
+    fields = list(schema.model_fields)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for count, row in enumerate(rows, start=1):
+        values = schema.model_validate(row).model_dump(mode="json")
+        writer.writerow([values[field] for field in fields])
+        if count % CSV_ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def export_response(rows: Iterable, schema: Type[BaseModel], export_format: str, filename: str) -> StreamingResponse:
+    """Stream rows as a CSV or NDJSON file download"""
+    if export_format == "csv":
+        response = StreamingResponse(iter_csv(rows, schema), media_type=CSV_MEDIA_TYPE)
+    else:
+        response = ndjson_response(rows, schema)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}.{export_format}"'
+    return response
@@ -0,0 +1,126 @@
+"""
+Write-behind purchase history (PURCHASE_HISTORY_WRITE_BEHIND).
+
+purchase_history carries two secondary indexes, and every purchase pays for their
+maintenance before it commits. In write-behind mode a purchase instead appends its
+history rows to purchase_history_outbox - primary key only, in the same transaction as
+the stock update, so a committed purchase never loses its history - and the
+HistoryFlusher thread moves them to purchase_history in multi-row batches.
+
+Until a row is flushed it is only visible to its buyer: user_history_query merges their
+queued rows in, reporting each with the negated outbox id (the purchase_history id is
+assigned on flush). Admin history lags by up to one flush interval; analytics read the
+sales rollup, which is still updated in the purchase transaction. Shutdown flushes the
+outbox; rows left by a crash are flushed once the app starts again.
+"""
+import logging
+import threading
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import sessionmaker
+from app.database import settings
+from app.models import PurchaseHistory, PurchaseHistoryOutbox
+
+logger = logging.getLogger(__name__)
+
+# Columns moved from the outbox into purchase_history (the history id is assigned there)
+MOVED_COLUMNS = (
+    "user_id", "sweet_id", "sweet_name", "category", "price",
+    "quantity", "total_price", "purchased_at",
+)
+
+def history_model():
+    """Where the purchase endpoints insert their history rows"""
+    return PurchaseHistoryOutbox if settings.PURCHASE_HISTORY_WRITE_BEHIND else PurchaseHistory
+
+def pending_history_query(user_id: int, columns: tuple, start=None, end=None):
+    """A user's queued purchases as `columns` (PurchaseHistory columns, matched by name)"""
+    outbox_columns = [
+        (-PurchaseHistoryOutbox.id).label("id") if column.key == "id" else getattr(PurchaseHistoryOutbox, column.key)
+        for column in columns
+    ]
+    query = select(*outbox_columns).where(PurchaseHistoryOutbox.user_id == user_id)
+    if start is not None:
+        query = query.where(PurchaseHistoryOutbox.purchased_at >= start)
+    if end is not None:
+        query = query.where(PurchaseHistoryOutbox.purchased_at < end)
+    return query
+
+def flush_outbox(session_factory: sessionmaker, batch_size: int = 500) -> int:
+    """Move every queued history row into purchase_history, a batch per transaction; returns the rows moved"""
+    moved = 0
+    with session_factory() as db:
+        while True:
+            batch = select(PurchaseHistoryOutbox.id).order_by(PurchaseHistoryOutbox.id).limit(batch_size)
+            if db.get_bind().dialect.name == "postgresql":
+                # Rows another flusher (another worker process) is moving are left to it
+                batch = batch.with_for_update(skip_locked=True)
+            # Deleting first claims the rows, so two flushers can never both copy one
+            rows = db.execute(
+                delete(PurchaseHistoryOutbox)
+                .where(PurchaseHistoryOutbox.id.in_(batch))
+                .returning(PurchaseHistoryOutbox.id, *(getattr(PurchaseHistoryOutbox, column) for column in MOVED_COLUMNS))
+            ).all()
+            if rows:
+                # In queue order, so history ids follow purchase order
+                db.execute(insert(PurchaseHistory), [
+                    {column: getattr(row, column) for column in MOVED_COLUMNS}
+                    for row in sorted(rows, key=lambda row: row.id)
+                ])
+            db.commit()
+            moved += len(rows)
+            if len(rows) < batch_size:
+                break
+    if moved:
+        logger.debug("purchase history flushed", extra={"rows": moved})
+    return moved
+
+class HistoryFlusher:
+    """
+    Daemon thread running flush_outbox every `interval_seconds` while write-behind is on.
+    stop() flushes whatever is still queued before returning.
+    """
+
+    def __init__(self, interval_seconds: float, batch_size: int):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._stopping = threading.Event()
+        self._thread = None
+        self._session_factory = None
+
+    def start(self, session_factory: sessionmaker):
+        if self._thread is not None:
+            return
+        self._session_factory = session_factory
+        if not settings.PURCHASE_HISTORY_WRITE_BEHIND:
+            # Rows queued before write-behind was turned off would otherwise never show up
+            self.flush()
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="history-flusher", daemon=True)
+        self._thread.start()
+
+    def flush(self) -> int:
+        if self._session_factory is None:
+            return 0
+        try:
+            return flush_outbox(self._session_factory, self.batch_size)
+        except Exception:
+            # The rows stay in the outbox and are picked up by the next flush
+            logger.exception("purchase history flush failed")
+            return 0
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval_seconds):
+            self.flush()
+
+history_flusher = HistoryFlusher(
+    interval_seconds=settings.PURCHASE_HISTORY_FLUSH_INTERVAL_SECONDS,
+    batch_size=settings.PURCHASE_HISTORY_FLUSH_BATCH_SIZE,
+)
@@ -0,0 +1,9 @@
+"""
+Benchmarks and load tests (not part of the regular test run).
+
+    python -m benchmarks.seed --reset                      # synthetic dataset
+    pytest benchmarks/                                     # micro-benchmarks (pytest-benchmark)
+    python -m benchmarks.loadtest --base-url http://localhost:8000
+
+Set BENCH_DATABASE_URL to benchmark against PostgreSQL instead of a temporary SQLite file.
+"""
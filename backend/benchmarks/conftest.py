@@ -0,0 +1,35 @@
+import os
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from app.models import User
+from benchmarks.seed import reset_schema, seed
+
+# Dataset for the micro-benchmarks: big enough for realistic plans, quick to build
+BENCH_SIZES = {"users": 200, "admins": 10, "sweets": 10000, "purchases": 20000}
+
+@pytest.fixture(scope="session")
+def bench_engine(tmp_path_factory):
+    url = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{tmp_path_factory.mktemp('bench') / 'bench.db'}"
+    engine = create_engine(url)
+    reset_schema(engine)
+    seed(engine, **BENCH_SIZES)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def bench_db(bench_engine):
+    session = sessionmaker(bind=bench_engine, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+@pytest.fixture
+def bench_admin(bench_db):
+    return bench_db.scalars(select(User).where(User.role == "admin").order_by(User.id)).first()
+
+@pytest.fixture
+def bench_user(bench_db):
+    return bench_db.scalars(select(User).where(User.role == "user").order_by(User.id)).first()
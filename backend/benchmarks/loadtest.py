@@ -0,0 +1,139 @@
+"""
+HTTP load scenario against a running API.
+
+    RATE_LIMIT_ENABLED=false WEB_CONCURRENCY=4 uvicorn app.main:app &
+    python -m benchmarks.loadtest --base-url http://localhost:8000 --concurrency 50 --duration 30
+
+Start the server with rate limiting off: every client logs in twice from one address,
+which the default login.ip limit (30/60) rejects beyond 15 clients, and the purchases
+would otherwise be throttled per user (app/ratelimit.py). Workers are set through
+WEB_CONCURRENCY so the app knows there are several: catalog ETags then stay off unless
+SSE_BUS=postgres shares catalog versions between them.
+
+Each virtual client logs in as a seeded account (see benchmarks.seed) and loops over a
+weighted mix of browse, search, purchase and admin-history requests. At the end the
+p50/p99 latency, throughput and error count are printed for every endpoint.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+import httpx
+from benchmarks.seed import BENCH_PASSWORD, CATEGORIES, NOUNS, admin_name, user_name
+
+# (name, weight) - roughly a storefront: mostly browsing, some searching, a few purchases
+SCENARIO = [
+    ("browse", 50),
+    ("search", 25),
+    ("purchase", 20),
+    ("admin_history", 5),
+]
+
+def percentile(samples: list, fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name: str, seconds: float, ok: bool):
+        self.latencies[name].append(seconds)
+        if not ok:
+            self.errors[name] += 1
+
+    def report(self, elapsed: float) -> list:
+        rows = []
+        for name in sorted(self.latencies):
+            samples = self.latencies[name]
+            rows.append({
+                "endpoint": name,
+                "requests": len(samples),
+                "errors": self.errors[name],
+                "rps": round(len(samples) / elapsed, 1),
+                "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+                "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+            })
+        return rows
+
+async def login(client: httpx.AsyncClient, username: str) -> dict:
+    response = await client.post("/api/auth/login", data={"username": username, "password": BENCH_PASSWORD})
+    if response.status_code == 429:
+        raise SystemExit("Login was rate limited - start the server with RATE_LIMIT_ENABLED=false")
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def run_request(client, name: str, headers: dict, sweet_ids: list, rng: random.Random):
+    if name == "browse":
+        params = {"limit": 50}
+        if sweet_ids:
+            params["after"] = rng.choice(sweet_ids)
+        return await client.get("/api/sweets/", params=params, headers=headers)
+    if name == "search":
+        params = rng.choice([{"name": rng.choice(NOUNS)}, {"category": rng.choice(CATEGORIES)}, {"min_price": 5, "max_price": 10}])
+        return await client.get("/api/sweets/search", params=params, headers=headers)
+    if name == "purchase":
+        return await client.post(f"/api/sweets/{rng.choice(sweet_ids)}/purchase", json={"quantity": 1}, headers=headers)
+    return await client.get("/api/sweets/admin/purchase-history", params={"limit": 50}, headers=headers)
+
+async def virtual_client(client, index: int, args, sweet_ids: list, stats: Stats, deadline: float):
+    rng = random.Random(index)
+    user_headers = await login(client, user_name(index % args.users))
+    admin_headers = await login(client, admin_name(index % args.admins))
+    names = [name for name, _ in SCENARIO]
+    weights = [weight for _, weight in SCENARIO]
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        headers = admin_headers if name == "admin_history" else user_headers
+        started = time.perf_counter()
+        try:
+            response = await run_request(client, name, headers, sweet_ids, rng)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        stats.record(name, time.perf_counter() - started, ok)
+
+async def run(args) -> list:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        headers = await login(client, user_name(0))
+        catalog = await client.get("/api/sweets/", params={"limit": 1000}, headers=headers)
+        sweet_ids = [sweet["id"] for sweet in catalog.json()]
+        if not sweet_ids:
+            raise SystemExit("No sweets found - seed the database first (python -m benchmarks.seed)")
+
+        stats = Stats()
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            virtual_client(client, index, args, sweet_ids, stats, deadline)
+            for index in range(args.concurrency)
+        ))
+        return stats.report(time.perf_counter() - started)
+
+def format_table(rows: list) -> str:
+    columns = ["endpoint", "requests", "errors", "rps", "p50_ms", "p99_ms"]
+    widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+    lines = ["  ".join(column.ljust(widths[column]) for column in columns)]
+    for row in rows:
+        lines.append("  ".join(str(row[column]).ljust(widths[column]) for column in columns))
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the sweet-shop HTTP load scenario")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=20, help="Virtual clients running in parallel")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    parser.add_argument("--users", type=int, default=1000, help="Seeded user accounts to log in as")
+    parser.add_argument("--admins", type=int, default=10, help="Seeded admin accounts to log in as")
+    args = parser.parse_args(argv)
+
+    rows = asyncio.run(run(args))
+    print(format_table(rows))
+
+if __name__ == "__main__":
+    main()
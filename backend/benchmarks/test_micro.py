@@ -0,0 +1,134 @@
+"""
+Micro-benchmarks for response serialization and the hot queries.
+
+    pytest benchmarks/ --benchmark-sort=mean
+"""
+import json
+from typing import List
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select, update
+from app import analytics, search
+from app.models import Sweet, User, PurchaseHistory, PurchaseHistoryOutbox
+from app.routers.sweets import SWEET_RESPONSE_COLUMNS, admin_history_query
+from app.schemas import SweetResponse
+from app.serialization import list_response
+from app.streaming import iter_ndjson
+
+# Rows in the serialization benchmarks: a full 10k-sweet catalog
+CATALOG_SIZE = 10000
+
+def _catalog(bench_db, size=CATALOG_SIZE):
+    return bench_db.scalars(select(Sweet).order_by(Sweet.id).limit(size)).all()
+
+# --- Serialization ---
+# Compare test_serialize_catalog_response_model (FAST_JSON=false) with test_serialize_catalog_fast_json
+
+def test_serialize_catalog_response_model(benchmark, bench_db):
+    """What FastAPI does for a List[SweetResponse] route: validate, encode, dump"""
+    sweets = _catalog(bench_db)
+    adapter = TypeAdapter(List[SweetResponse])
+
+    def render():
+        return json.dumps(jsonable_encoder(adapter.validate_python(sweets, from_attributes=True)))
+
+    assert benchmark(render)
+
+def test_serialize_catalog_fast_json(benchmark, bench_db):
+    """The FAST_JSON path: response columns zipped into dicts and encoded by orjson"""
+    rows = bench_db.execute(select(*SWEET_RESPONSE_COLUMNS).order_by(Sweet.id).limit(CATALOG_SIZE)).all()
+    assert benchmark(lambda: list_response(rows, SweetResponse, Response()).body)
+
+def test_list_catalog_response_model(benchmark, bench_db):
+    """Query and serialize the catalog the way the endpoint used to: ORM objects + response model"""
+    adapter = TypeAdapter(List[SweetResponse])
+    query = select(Sweet).order_by(Sweet.id)
+
+    def render():
+        sweets = bench_db.scalars(query).all()
+        body = json.dumps(jsonable_encoder(adapter.validate_python(sweets, from_attributes=True)))
+        bench_db.expunge_all()
+        return body
+
+    assert benchmark(render)
+
+def test_list_catalog_fast_json(benchmark, bench_db):
+    """Query and serialize the catalog the FAST_JSON way: column tuples + orjson"""
+    query = select(*SWEET_RESPONSE_COLUMNS).order_by(Sweet.id)
+    assert benchmark(lambda: list_response(bench_db.execute(query).all(), SweetResponse, Response()).body)
+
+def test_serialize_catalog_ndjson(benchmark, bench_db):
+    sweets = _catalog(bench_db)
+    lines = benchmark(lambda: list(iter_ndjson(sweets, SweetResponse)))
+    assert len(lines) == len(sweets)
+
+# --- Queries ---
+
+def test_catalog_keyset_page(benchmark, bench_db):
+    middle = bench_db.scalar(select(Sweet.id).order_by(Sweet.id).offset(1000).limit(1))
+    query = select(Sweet).where(Sweet.id > middle).order_by(Sweet.id).limit(51)
+    assert len(benchmark(lambda: bench_db.scalars(query).all())) == 51
+
+def test_search_typo_tolerant_name(benchmark, bench_db):
+    results = benchmark(lambda: search.search_sweets(bench_db, [], name="trufle"))
+    assert results
+
+def test_admin_history_page(benchmark, bench_db, bench_admin):
+    query = admin_history_query(bench_admin).limit(51)
+    assert benchmark(lambda: bench_db.execute(query).all())
+
+def test_admin_analytics_by_week(benchmark, bench_db, bench_admin):
+    query = analytics.admin_sales_query(bench_admin.id)
+    summary = benchmark(lambda: analytics.summarize(bench_db.execute(query).all(), "week"))
+    assert summary["totals"]["purchases"] > 0
+
+def test_purchase_conditional_update(benchmark, bench_db):
+    sweet_id = bench_db.scalar(select(Sweet.id).order_by(Sweet.id).limit(1))
+    statement = (
+        update(Sweet)
+        .where(Sweet.id == sweet_id, Sweet.quantity >= 1)
+        .values(quantity=Sweet.quantity - 1)
+        .returning(*SWEET_RESPONSE_COLUMNS)
+    )
+
+    def purchase():
+        row = bench_db.execute(statement).first()
+        bench_db.rollback()
+        return row
+
+    assert benchmark(purchase) is not None
+
+def _history_rows(bench_db, count=50):
+    user_id = bench_db.scalar(select(User.id).order_by(User.id).limit(1))
+    sweet = bench_db.execute(select(Sweet.id, Sweet.name, Sweet.category, Sweet.price).order_by(Sweet.id).limit(1)).one()
+    return [
+        {"user_id": user_id, "sweet_id": sweet.id, "sweet_name": sweet.name, "category": sweet.category,
+         "price": sweet.price, "quantity": 1, "total_price": sweet.price}
+        for _ in range(count)
+    ]
+
+# Compare with test_history_insert_outbox: the history write a purchase pays for with
+# PURCHASE_HISTORY_WRITE_BEHIND off and on (50 single-row inserts each)
+def test_history_insert_indexed(benchmark, bench_db):
+    rows = _history_rows(bench_db)
+
+    def record():
+        for row in rows:
+            bench_db.execute(insert(PurchaseHistory), [row])
+        bench_db.rollback()
+
+    benchmark(record)
+
+def test_history_insert_outbox(benchmark, bench_db):
+    rows = _history_rows(bench_db)
+
+    def record():
+        for row in rows:
+            bench_db.execute(insert(PurchaseHistoryOutbox), [row])
+        bench_db.rollback()
+
+    benchmark(record)
+
+def test_word_similarity(benchmark):
+    assert benchmark(search.word_similarity, "chocolat", "Dark Chocolate Truffle") > 0.6
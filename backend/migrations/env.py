@@ -0,0 +1,37 @@
+from alembic import context
+from sqlalchemy import create_engine
+from app.database import Base, settings
+from app.schema import include_object
+import app.models  # noqa: F401 - register models on Base.metadata
+
+target_metadata = Base.metadata
+
+def run_migrations_offline():
+    """Emit SQL to stdout instead of running it (alembic upgrade --sql)"""
+    context.configure(
+        url=settings.DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    # app.schema passes in the connection that holds the migration lock
+    connection = context.config.attributes.get("connection")
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    engine = create_engine(settings.DATABASE_URL)
+    with engine.begin() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,83 @@
+"""Baseline schema: users, sweets, purchase_history
+
+Databases created before migrations existed (create_all plus the old
+startup ALTERs) are adopted as-is: existing tables are left alone and
+only the columns/indexes the old startup code used to patch in are added.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("role", sa.String()),
+            sa.Column("reset_token", sa.String(), nullable=True),
+            sa.Column("reset_token_expires", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+    else:
+        columns = {column["name"] for column in inspector.get_columns("users")}
+        if "reset_token" not in columns:
+            op.add_column("users", sa.Column("reset_token", sa.String(), nullable=True))
+        if "reset_token_expires" not in columns:
+            op.add_column("users", sa.Column("reset_token_expires", sa.DateTime(timezone=True), nullable=True))
+
+    if "idx_users_reset_token" not in {index["name"] for index in inspector.get_indexes("users")}:
+        op.create_index("idx_users_reset_token", "users", ["reset_token"])
+
+    if not inspector.has_table("sweets"):
+        op.create_table(
+            "sweets",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("category", sa.String(), nullable=False),
+            sa.Column("price", sa.Numeric(10, 2), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.Column("created_by_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_sweets_id", "sweets", ["id"])
+    elif "created_by_user_id" not in {column["name"] for column in inspector.get_columns("sweets")}:
+        op.add_column("sweets", sa.Column("created_by_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True))
+
+    if not inspector.has_table("purchase_history"):
+        op.create_table(
+            "purchase_history",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("sweet_id", sa.Integer(), sa.ForeignKey("sweets.id"), nullable=False),
+            sa.Column("sweet_name", sa.String(), nullable=False),
+            sa.Column("category", sa.String(), nullable=False),
+            sa.Column("price", sa.Numeric(10, 2), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.Column("total_price", sa.Numeric(10, 2), nullable=False),
+            sa.Column("purchased_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_purchase_history_id", "purchase_history", ["id"])
+
+
+def downgrade():
+    op.drop_table("purchase_history")
+    op.drop_table("sweets")
+    op.drop_table("users")
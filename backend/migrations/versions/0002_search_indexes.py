@@ -0,0 +1,35 @@
+"""Search indexes: pg_trgm GIN indexes (PostgreSQL) / FTS5 shadow table (SQLite)
+
+Revision ID: 0002_search_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-18
+"""
+from alembic import op
+from app.search import POSTGRES_SEARCH_DDL, SQLITE_SEARCH_DDL, SQLITE_SEARCH_DROP_DDL
+
+revision = "0002_search_indexes"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        for statement in POSTGRES_SEARCH_DDL:
+            op.execute(statement)
+    elif dialect == "sqlite":
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_sweets_category_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_sweets_name_trgm")
+    elif dialect == "sqlite":
+        for trigger in ("sweets_fts_ai", "sweets_fts_ad", "sweets_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        for statement in SQLITE_SEARCH_DROP_DDL:
+            op.execute(statement)
@@ -0,0 +1,58 @@
+"""Daily sales rollup table, backfilled from purchase_history
+
+Revision ID: 0003_sales_daily_rollups
+Revises: 0002_search_indexes
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_sales_daily_rollups"
+down_revision = "0002_search_indexes"
+branch_labels = None
+depends_on = None
+
+# Snapshots of the tables as of this revision (the models may change later)
+users = sa.table("users", sa.column("id"), sa.column("role"))
+purchase_history = sa.table(
+    "purchase_history",
+    sa.column("user_id"),
+    sa.column("sweet_id"),
+    sa.column("quantity"),
+    sa.column("total_price"),
+    sa.column("purchased_at"),
+)
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table("sales_daily_rollups"):
+        # Already created by create_all from the current models
+        return
+
+    rollups = op.create_table(
+        "sales_daily_rollups",
+        sa.Column("sweet_id", sa.Integer(), sa.ForeignKey("sweets.id"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Numeric(12, 2), nullable=False),
+        sa.Column("purchases", sa.Integer(), nullable=False),
+    )
+
+    # Same rule as the live rollup: only purchases by regular users count
+    day = sa.func.date(purchase_history.c.purchased_at)
+    totals = sa.select(
+        purchase_history.c.sweet_id,
+        day,
+        sa.func.sum(purchase_history.c.quantity),
+        sa.func.sum(purchase_history.c.total_price),
+        sa.func.count(),
+    ).select_from(
+        purchase_history.join(users, users.c.id == purchase_history.c.user_id)
+    ).where(
+        users.c.role == "user"
+    ).group_by(purchase_history.c.sweet_id, day)
+    op.execute(rollups.insert().from_select(["sweet_id", "day", "units", "revenue", "purchases"], totals))
+
+
+def downgrade():
+    op.drop_table("sales_daily_rollups")
@@ -0,0 +1,34 @@
+"""Indexes for the purchase-history, admin-history, delete and price-range queries
+
+Revision ID: 0004_hot_query_indexes
+Revises: 0003_sales_daily_rollups
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_hot_query_indexes"
+down_revision = "0003_sales_daily_rollups"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("idx_purchase_history_user_purchased_at", "purchase_history", ["user_id", "purchased_at"]),
+    ("idx_purchase_history_sweet_id", "purchase_history", ["sweet_id"]),
+    ("idx_sweets_created_by_user_id", "sweets", ["created_by_user_id"]),
+    ("idx_sweets_category", "sweets", ["category"]),
+    ("idx_sweets_price", "sweets", ["price"]),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        # Databases built by create_all from the current models already have them
+        if name not in {index["name"] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
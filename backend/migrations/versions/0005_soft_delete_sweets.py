@@ -0,0 +1,41 @@
+"""Soft delete for sweets and an archive table for purged purchase history
+
+Revision ID: 0005_soft_delete_sweets
+Revises: 0004_hot_query_indexes
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_soft_delete_sweets"
+down_revision = "0004_hot_query_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if "deleted_at" not in {column["name"] for column in inspector.get_columns("sweets")}:
+        op.add_column("sweets", sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True))
+
+    if not inspector.has_table("purchase_history_archive"):
+        op.create_table(
+            "purchase_history_archive",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("sweet_id", sa.Integer(), nullable=False),
+            sa.Column("sweet_name", sa.String(), nullable=False),
+            sa.Column("category", sa.String(), nullable=False),
+            sa.Column("price", sa.Numeric(10, 2), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.Column("total_price", sa.Numeric(10, 2), nullable=False),
+            sa.Column("purchased_at", sa.DateTime(timezone=True)),
+            sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+
+
+def downgrade():
+    op.drop_table("purchase_history_archive")
+    with op.batch_alter_table("sweets") as batch:
+        batch.drop_column("deleted_at")
@@ -0,0 +1,34 @@
+"""Sharded stock counters for hot sweets
+
+Revision ID: 0006_sweet_stock_shards
+Revises: 0005_soft_delete_sweets
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_sweet_stock_shards"
+down_revision = "0005_soft_delete_sweets"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if "stock_shards" not in {column["name"] for column in inspector.get_columns("sweets")}:
+        op.add_column("sweets", sa.Column("stock_shards", sa.Integer(), server_default="0", nullable=False))
+
+    if not inspector.has_table("sweet_stock_shards"):
+        op.create_table(
+            "sweet_stock_shards",
+            sa.Column("sweet_id", sa.Integer(), sa.ForeignKey("sweets.id"), primary_key=True),
+            sa.Column("shard", sa.Integer(), primary_key=True),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+        )
+
+
+def downgrade():
+    op.drop_table("sweet_stock_shards")
+    with op.batch_alter_table("sweets") as batch:
+        batch.drop_column("stock_shards")
@@ -0,0 +1,35 @@
+"""Outbox for write-behind purchase history
+
+Revision ID: 0007_purchase_history_outbox
+Revises: 0006_sweet_stock_shards
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_purchase_history_outbox"
+down_revision = "0006_sweet_stock_shards"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("purchase_history_outbox"):
+        op.create_table(
+            "purchase_history_outbox",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("sweet_id", sa.Integer(), nullable=False),
+            sa.Column("sweet_name", sa.String(), nullable=False),
+            sa.Column("category", sa.String(), nullable=False),
+            sa.Column("price", sa.Numeric(10, 2), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.Column("total_price", sa.Numeric(10, 2), nullable=False),
+            sa.Column("purchased_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+
+
+def downgrade():
+    op.drop_table("purchase_history_outbox")
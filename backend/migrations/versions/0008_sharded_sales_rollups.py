@@ -0,0 +1,78 @@
+"""Rollup bucket per stock shard, so buyers of a sharded sweet don't share one rollup row
+
+Revision ID: 0008_sharded_sales_rollups
+Revises: 0007_purchase_history_outbox
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_sharded_sales_rollups"
+down_revision = "0007_purchase_history_outbox"
+branch_labels = None
+depends_on = None
+
+KEY = ["sweet_id", "day", "bucket"]
+
+
+def _rebuild(key: list):
+    """SQLite can't alter a primary key: copy the rows into a table keyed on `key`"""
+    columns = [
+        sa.Column("sweet_id", sa.Integer(), sa.ForeignKey("sweets.id"), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Numeric(12, 2), nullable=False),
+        sa.Column("purchases", sa.Integer(), nullable=False),
+    ]
+    if "bucket" in key:
+        columns.append(sa.Column("bucket", sa.Integer(), server_default="0", nullable=False))
+    op.create_table(
+        "_sales_daily_rollups_new", *columns, sa.PrimaryKeyConstraint(*key, name="sales_daily_rollups_pkey"),
+    )
+    copied = "sweet_id, day, units, revenue, purchases"
+    op.execute(f"INSERT INTO _sales_daily_rollups_new ({copied}) SELECT {copied} FROM sales_daily_rollups")
+    op.drop_table("sales_daily_rollups")
+    op.rename_table("_sales_daily_rollups_new", "sales_daily_rollups")
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if "bucket" in {column["name"] for column in inspector.get_columns("sales_daily_rollups")}:
+        # Already created by create_all from the current models
+        return
+
+    if bind.dialect.name == "sqlite":
+        _rebuild(KEY)
+        return
+    op.add_column("sales_daily_rollups", sa.Column("bucket", sa.Integer(), server_default="0", nullable=False))
+    primary_key = inspector.get_pk_constraint("sales_daily_rollups")["name"]
+    op.drop_constraint(primary_key, "sales_daily_rollups", type_="primary")
+    op.create_primary_key("sales_daily_rollups_pkey", "sales_daily_rollups", KEY)
+
+
+def downgrade():
+    rollups = sa.table(
+        "sales_daily_rollups",
+        sa.column("sweet_id"), sa.column("day"), sa.column("bucket"),
+        sa.column("units"), sa.column("revenue"), sa.column("purchases"),
+    )
+    # Fold every sweet's buckets back into one row per day (a few rows per sweet and day)
+    bind = op.get_bind()
+    totals = bind.execute(sa.select(
+        rollups.c.sweet_id,
+        rollups.c.day,
+        sa.func.sum(rollups.c.units).label("units"),
+        sa.func.sum(rollups.c.revenue).label("revenue"),
+        sa.func.sum(rollups.c.purchases).label("purchases"),
+    ).group_by(rollups.c.sweet_id, rollups.c.day)).all()
+    op.execute(rollups.delete())
+    if totals:
+        op.bulk_insert(rollups, [{**row._mapping, "bucket": 0} for row in totals])
+
+    if bind.dialect.name == "sqlite":
+        _rebuild(["sweet_id", "day"])
+        return
+    op.drop_constraint("sales_daily_rollups_pkey", "sales_daily_rollups", type_="primary")
+    op.drop_column("sales_daily_rollups", "bucket")
+    op.create_primary_key("sales_daily_rollups_pkey", "sales_daily_rollups", ["sweet_id", "day"])
@@ -6,6 +6,9 @@ from app.main import app
 from app.database import Base, get_db
 from app.models import User, Sweet
 from app.utils import get_password_hash
+from app.cache import user_cache, recent_writers
+from app.idempotency import idempotency_store
+from app.ratelimit import rate_limit_buckets
 
 # Test database (use SQLite for tests, or separate PostgreSQL)
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -17,6 +20,10 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 
 @pytest.fixture
 def db():
+    user_cache.clear()
+    recent_writers.clear()
+    idempotency_store.clear()
+    rate_limit_buckets.clear()
     Base.metadata.create_all(bind=engine)
     db = TestingSessionLocal()
     try:
@@ -25,6 +32,11 @@ def db():
         db.close()
         Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture
+def session_factory(db):
+    """Sessions bound to the test database, for tests that need one session per thread"""
+    return TestingSessionLocal
+
 @pytest.fixture
 def client(db):
     def override_get_db():
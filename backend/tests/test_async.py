@@ -0,0 +1,148 @@
+import asyncio
+import json
+import httpx
+import pytest
+from decimal import Decimal
+from fastapi import FastAPI, status
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app import database
+from app.database import get_async_db, get_db, to_async_url
+from app.models import Sweet, PurchaseHistory
+from app.routers import auth_async, sweets, sweets_async
+from tests.conftest import SQLALCHEMY_DATABASE_URL, TestingSessionLocal
+
+# Same file as the sync test database; NullPool keeps connections from outliving a test's event loop
+async_engine = create_async_engine(
+    to_async_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool, connect_args={"timeout": 30}
+)
+AsyncTestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as session:
+        yield session
+
+# Only the async routers are mounted, so nothing here can fall back to a sync session
+async_app = FastAPI()
+async_app.include_router(auth_async.router, prefix="/api/auth")
+async_app.include_router(sweets_async.router, prefix="/api/sweets")
+async_app.dependency_overrides[get_async_db] = override_get_async_db
+
+@pytest.fixture
+def async_client(db):
+    return httpx.AsyncClient(app=async_app, base_url="http://test")
+
+async def _token(client, username, password):
+    response = await client.post("/api/auth/login", data={"username": username, "password": password})
+    assert response.status_code == status.HTTP_200_OK
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def _add_sweets(db, *sweets):
+    db.add_all(sweets)
+    db.commit()
+    return [sweet.id for sweet in sweets]
+
+def test_to_async_url():
+    """Sync URLs are mapped to their asyncio drivers"""
+    assert to_async_url("postgresql://u:p@host/db") == "postgresql+asyncpg://u:p@host/db"
+    assert to_async_url("postgresql+psycopg2://u:p@host/db") == "postgresql+asyncpg://u:p@host/db"
+    assert to_async_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+
+async def test_async_register_login_and_me(async_client, db):
+    """Auth works end to end on the async session"""
+    async with async_client as client:
+        response = await client.post("/api/auth/register", json={
+            "username": "asyncuser", "email": "async@example.com", "password": "asyncpassword"
+        })
+        assert response.status_code == status.HTTP_201_CREATED
+        headers = await _token(client, "asyncuser", "asyncpassword")
+        response = await client.get("/api/auth/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["username"] == "asyncuser"
+
+async def test_async_list_pagination_and_stream(async_client, db, test_user):
+    """Pagination, streaming and search behave as on the sync router"""
+    ids = _add_sweets(db, *(Sweet(name=f"Sweet {i}", category="Candy", price=Decimal("1.00"), quantity=i) for i in range(5)))
+    async with async_client as client:
+        headers = await _token(client, "testuser", "testpassword")
+        first = await client.get("/api/sweets/", params={"limit": 3}, headers=headers)
+        second = await client.get("/api/sweets/", params={"limit": 3, "after": first.headers["X-Next-Cursor"]}, headers=headers)
+        streamed = await client.get("/api/sweets/", params={"stream": "true"}, headers=headers)
+        searched = await client.get("/api/sweets/search", params={"name": "Sweet 4"}, headers=headers)
+    assert [sweet["id"] for sweet in first.json()] == ids[:3]
+    assert [sweet["id"] for sweet in second.json()] == ids[3:]
+    assert "X-Next-Cursor" not in second.headers
+    assert [json.loads(line)["id"] for line in streamed.text.splitlines()] == ids
+    assert searched.json()[0]["id"] == ids[4]
+
+async def test_async_purchase_checkout_and_history(async_client, db, test_user):
+    """Purchases and checkout update stock and history; failures leave both untouched"""
+    candy_id, toffee_id = _add_sweets(
+        db,
+        Sweet(name="Candy", category="Candy", price=Decimal("2.00"), quantity=5),
+        Sweet(name="Toffee", category="Toffee", price=Decimal("3.00"), quantity=1),
+    )
+    async with async_client as client:
+        headers = await _token(client, "testuser", "testpassword")
+        bought = await client.post(f"/api/sweets/{candy_id}/purchase", json={"quantity": 2}, headers=headers)
+        short = await client.post("/api/sweets/checkout", json={"items": [
+            {"sweet_id": candy_id, "quantity": 1}, {"sweet_id": toffee_id, "quantity": 2}
+        ]}, headers=headers)
+        basket = await client.post("/api/sweets/checkout", json={"items": [
+            {"sweet_id": toffee_id, "quantity": 1}, {"sweet_id": candy_id, "quantity": 3}
+        ]}, headers=headers)
+        missing = await client.post("/api/sweets/9999/purchase", json={"quantity": 1}, headers=headers)
+        history = await client.get("/api/sweets/purchase-history", headers=headers)
+
+    assert bought.status_code == status.HTTP_200_OK
+    assert bought.json()["quantity"] == 3
+    assert short.status_code == status.HTTP_400_BAD_REQUEST
+    assert [line["quantity"] for line in basket.json()] == [0, 0]
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
+    assert sorted(item["quantity"] for item in history.json()) == [1, 2, 3]
+
+async def test_async_concurrent_purchases_never_oversell(async_client, db, test_user):
+    """Many in-flight purchases on one event loop sell exactly the available stock"""
+    (sweet_id,) = _add_sweets(db, Sweet(name="Limited", category="Candy", price=Decimal("1.00"), quantity=20))
+    async with async_client as client:
+        headers = await _token(client, "testuser", "testpassword")
+        responses = await asyncio.gather(*(
+            client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 1}, headers=headers)
+            for _ in range(50)
+        ))
+
+    codes = [response.status_code for response in responses]
+    assert codes.count(status.HTTP_200_OK) == 20
+    assert codes.count(status.HTTP_400_BAD_REQUEST) == 30
+    db.expire_all()
+    assert db.get(Sweet, sweet_id).quantity == 0
+    assert db.query(PurchaseHistory).count() == 20
+
+async def test_async_purchase_keeps_buyer_off_replica(db, test_user, tmp_path, monkeypatch):
+    """An async purchase routes the buyer's next replica-backed read (sync export) to the primary"""
+    replica_engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    database.Base.metadata.create_all(bind=replica_engine)
+    monkeypatch.setattr(database, "ReadSessionLocal", sessionmaker(bind=replica_engine))
+    (sweet_id,) = _add_sweets(db, Sweet(name="Async Primary", category="Candy", price=Decimal("1.00"), quantity=5))
+    
+    def override_get_db():
+        with TestingSessionLocal() as session:
+            yield session
+    
+    # As app.main mounts them with ASYNC_DB: the async routes first, the sync router for the rest
+    mixed_app = FastAPI()
+    mixed_app.include_router(auth_async.router, prefix="/api/auth")
+    mixed_app.include_router(sweets_async.router, prefix="/api/sweets")
+    mixed_app.include_router(sweets.router, prefix="/api/sweets")
+    mixed_app.dependency_overrides[get_async_db] = override_get_async_db
+    mixed_app.dependency_overrides[get_db] = override_get_db
+    async with httpx.AsyncClient(app=mixed_app, base_url="http://test") as client:
+        headers = await _token(client, "testuser", "testpassword")
+        bought = await client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 1}, headers=headers)
+        exported = await client.get("/api/sweets/purchase-history/export", params={"format": "ndjson"}, headers=headers)
+    replica_engine.dispose()
+    
+    assert bought.status_code == status.HTTP_200_OK
+    assert [json.loads(line)["sweet_name"] for line in exported.text.splitlines()] == ["Async Primary"]
@@ -1,5 +1,6 @@
 import pytest
 from fastapi import status
+from app.cache import user_cache
 
 def test_register_user(client, db):
     """Test user registration"""
@@ -61,3 +62,29 @@ def test_login_invalid_password(client, db, test_user):
     })
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
+
+def test_current_user_is_cached(client, db, auth_token):
+    """Test that repeat requests resolve the user from the cache"""
+    user_cache.clear()
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    
+    assert client.get("/api/auth/me", headers=headers).status_code == status.HTTP_200_OK
+    before = user_cache.stats()
+    response = client.get("/api/auth/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["username"] == "testuser"
+    after = user_cache.stats()
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"]
+
+def test_reset_password_invalidates_cached_user(client, db, test_user, auth_token):
+    """Test that a password reset drops the cached user"""
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    client.get("/api/auth/me", headers=headers)
+    assert user_cache.get("testuser") is not None
+    
+    response = client.post("/api/auth/forgot-password", json={"email": "test@example.com"})
+    token = response.json()["reset_token"]
+    response = client.post("/api/auth/reset-password", json={"token": token, "new_password": "newpassword123"})
+    assert response.status_code == status.HTTP_200_OK
+    assert user_cache.get("testuser") is None
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import threading
+from decimal import Decimal
+from fastapi import status
+from app.catalog import catalog_version
+from app.events import PostgresRelay, StockEvents, stock_events
+from app.models import Sweet
+
+def _parse(message):
+    """(event, id, data) of one SSE message"""
+    fields = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+    return fields["event"], fields.get("id"), json.loads(fields["data"])
+
+async def test_events_fan_out_from_any_thread():
+    """Test that an event published on a worker thread reaches every subscriber"""
+    events = StockEvents()
+    first, second = events.subscribe(), events.subscribe()
+    
+    worker = threading.Thread(target=events.publish, args=("stock", {"id": 1, "quantity": 4, "price": Decimal("2.50")}))
+    worker.start()
+    worker.join()
+    
+    for subscription in (first, second):
+        event, event_id, data = _parse(await subscription.get(1))
+        assert event == "stock"
+        assert event_id == f"{events.epoch}-1"
+        assert data == {"id": 1, "quantity": 4, "price": "2.50"}
+    assert events.subscribers == 2
+
+async def test_resume_from_last_event_id():
+    """Test that a reconnecting client gets the events it missed, or a reset if they are gone"""
+    events = StockEvents(history_size=3)
+    for quantity in range(5):
+        events.publish("stock", {"id": 1, "quantity": quantity, "price": "1.00"})
+    
+    resumed = events.subscribe(f"{events.epoch}-3")
+    assert [_parse(await resumed.get(1))[2]["quantity"] for _ in range(2)] == [3, 4]
+    assert await resumed.get(0.01) is None
+    
+    # Older than the history, or from another process: start over
+    for last_event_id in (f"{events.epoch}-1", "otherepoch-4"):
+        assert _parse(await events.subscribe(last_event_id).get(1))[0] == "reset"
+
+async def test_slow_client_gets_reset():
+    """Test that a client whose queue overflows is told to refetch instead of getting a gap"""
+    events = StockEvents(queue_size=2)
+    subscription = events.subscribe()
+    for quantity in range(5):
+        events.publish("stock", {"id": 1, "quantity": quantity, "price": "1.00"})
+    # Let the loop run the queued deliveries
+    await asyncio.sleep(0)
+    
+    assert _parse(await subscription.get(1))[0] == "reset"
+    # Back to normal after the reset
+    events.publish("stock", {"id": 1, "quantity": 9, "price": "1.00"})
+    assert _parse(await subscription.get(1))[2]["quantity"] == 9
+
+async def test_relayed_events_from_other_workers_bump_catalog_version():
+    """Test that a write relayed from another worker invalidates this worker's catalog ETags"""
+    events = StockEvents()
+    relay = PostgresRelay("postgresql://unused", events)
+    subscription = events.subscribe()
+    
+    stamp = catalog_version.stamp
+    relay.receive(json.dumps({"event": "stock", "data": {"id": 1, "quantity": 2, "price": "1.00"}, "origin": "otherepoch"}))
+    assert catalog_version.stamp != stamp
+    
+    # This worker's own events come back too; it bumped when it committed
+    stamp = catalog_version.stamp
+    relay.receive(json.dumps({"event": "deleted", "data": {"id": 1}, "origin": events.epoch}))
+    assert catalog_version.stamp == stamp
+    
+    assert [_parse(await subscription.get(1))[0] for _ in range(2)] == ["stock", "deleted"]
+
+async def test_stream_sends_keepalives_and_unsubscribes():
+    """Test that an idle stream sends comment lines and closing it removes the subscriber"""
+    events = StockEvents()
+    body = events.stream(events.subscribe(), keepalive_seconds=0.01)
+    assert await body.__anext__() == ": keep-alive\n\n"
+    await body.aclose()
+    assert events.subscribers == 0
+
+async def test_writes_publish_stock_deltas(client, auth_token, admin_token, db, test_admin):
+    """Test that purchase, restock, update and delete each publish a compact event"""
+    sweet = Sweet(name="Live Lolly", category="Lolly", price=Decimal("1.25"), quantity=10, created_by_user_id=test_admin.id)
+    db.add(sweet)
+    db.commit()
+    sweet_id = sweet.id
+    user = {"Authorization": f"Bearer {auth_token}"}
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    subscription = stock_events.subscribe()
+    try:
+        assert client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 3}, headers=user).status_code == status.HTTP_200_OK
+        assert _parse(await subscription.get(1))[::2] == ("stock", {"id": sweet_id, "quantity": 7, "price": "1.25"})
+        
+        assert client.post(f"/api/sweets/{sweet_id}/restock", json={"quantity": 5}, headers=admin).status_code == status.HTTP_200_OK
+        assert _parse(await subscription.get(1))[2]["quantity"] == 12
+        
+        assert client.put(f"/api/sweets/{sweet_id}/", json={"price": 2.0}, headers=admin).status_code == status.HTTP_200_OK
+        assert _parse(await subscription.get(1))[2] == {"id": sweet_id, "quantity": 12, "price": "2.00"}
+        
+        assert client.delete(f"/api/sweets/{sweet_id}/", headers=admin).status_code == status.HTTP_204_NO_CONTENT
+        assert _parse(await subscription.get(1))[::2] == ("deleted", {"id": sweet_id})
+    finally:
+        stock_events.unsubscribe(subscription)
+
+def test_events_require_authentication(client):
+    """Test that the event stream is not open to anonymous clients"""
+    response = client.get("/api/sweets/events")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
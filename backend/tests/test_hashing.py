@@ -0,0 +1,25 @@
+import asyncio
+import time
+import pytest
+from fastapi import HTTPException, status
+from app.hashing import HashingPool, verify_password_async, get_password_hash_async
+
+async def test_hash_and_verify_in_pool():
+    """Test hashing round trip through the process pool"""
+    hashed = await get_password_hash_async("secretpassword")
+    assert await verify_password_async("secretpassword", hashed)
+    assert not await verify_password_async("wrongpassword", hashed)
+
+async def test_pool_rejects_work_beyond_queue_limit():
+    """Test that a full pool answers 503 instead of queueing"""
+    pool = HashingPool(workers=1, queue_limit=0)
+    try:
+        busy = asyncio.ensure_future(pool.run(time.sleep, 1))
+        await asyncio.sleep(0)  # let the first job take the only slot
+        with pytest.raises(HTTPException) as exc:
+            await pool.run(time.sleep, 0)
+        assert exc.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert exc.value.headers["Retry-After"] == "1"
+        await busy
+    finally:
+        pool.shutdown()
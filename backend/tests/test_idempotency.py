@@ -0,0 +1,162 @@
+import asyncio
+import httpx
+from decimal import Decimal
+from fastapi import FastAPI, HTTPException, status
+from sqlalchemy import event
+from app.cache import TTLCache
+from app.idempotency import REPLAYED_HEADER, IdempotencyMiddleware, StoredResponse, _stored_bytes
+from app.models import Sweet, PurchaseHistory, User
+from app.utils import create_access_token
+
+def _sweet(db, **fields):
+    sweet = Sweet(**{"name": "Peda", "category": "Indian", "price": Decimal("2.00"), "quantity": 10, **fields})
+    db.add(sweet)
+    db.commit()
+    return sweet.id
+
+def test_purchase_retry_is_replayed(client, auth_token, db):
+    """Test that a retried purchase returns the stored response without touching the database"""
+    sweet_id = _sweet(db)
+    headers = {"Authorization": f"Bearer {auth_token}", "Idempotency-Key": "order-1"}
+    
+    first = client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 2}, headers=headers)
+    assert first.status_code == status.HTTP_200_OK
+    assert "idempotent-replayed" not in first.headers
+    
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(db.get_bind(), "before_cursor_execute", record)
+    try:
+        retry = client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 2}, headers=headers)
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", record)
+    assert statements == []
+    assert retry.status_code == status.HTTP_200_OK
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.content == first.content
+    
+    db.expire_all()
+    assert db.query(Sweet).filter(Sweet.id == sweet_id).one().quantity == 8
+    assert db.query(PurchaseHistory).count() == 1
+    
+    # A new key is a new purchase
+    response = client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 2},
+                           headers={**headers, "Idempotency-Key": "order-2"})
+    assert response.json()["quantity"] == 6
+
+def test_restock_retry_is_replayed(client, admin_token, db, test_admin):
+    """Test that a retried restock adds the stock once"""
+    sweet_id = _sweet(db, created_by_user_id=test_admin.id)
+    headers = {"Authorization": f"Bearer {admin_token}", "Idempotency-Key": "restock-1"}
+    for _ in range(3):
+        response = client.post(f"/api/sweets/{sweet_id}/restock", json={"quantity": 5}, headers=headers)
+        assert response.json()["quantity"] == 15
+    db.expire_all()
+    assert db.query(Sweet).filter(Sweet.id == sweet_id).one().quantity == 15
+
+def test_idempotency_key_scope_and_mismatch(client, auth_token, db):
+    """Test that keys are per user and path, errors are replayed, and a reused key with another body is rejected"""
+    sweet_id = _sweet(db, quantity=1)
+    user = {"Authorization": f"Bearer {auth_token}", "Idempotency-Key": "k"}
+    
+    response = client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 5}, headers=user)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    # The stored 400 is replayed even though the request would now be the same
+    response = client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 5}, headers=user)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.headers["idempotent-replayed"] == "true"
+    
+    response = client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 1}, headers=user)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    
+    # Same key on the same path from another user is unrelated
+    db.add(User(username="otheruser", email="other@example.com", hashed_password="unused", role="user"))
+    db.commit()
+    other = {"Authorization": f"Bearer {create_access_token({'sub': 'otheruser'})}", "Idempotency-Key": "k"}
+    response = client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 1}, headers=other)
+    assert response.status_code == status.HTTP_200_OK
+    assert "idempotent-replayed" not in response.headers
+    
+    response = client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 1},
+                           headers={**user, "Idempotency-Key": "x" * 256})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+async def test_concurrent_retry_gets_conflict():
+    """Test that a retry arriving while the first attempt runs gets a 409, and a failed attempt frees the key"""
+    release = asyncio.Event()
+    calls = []
+    app = FastAPI()
+    
+    @app.post("/slow")
+    async def slow():
+        calls.append(1)
+        if len(calls) == 1:
+            await release.wait()
+            raise HTTPException(status_code=503, detail="try again")
+        return {"ok": True}
+    
+    wrapped = IdempotencyMiddleware(app, store=TTLCache(max_size=10, ttl_seconds=60))
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'someone'})}", "Idempotency-Key": "same"}
+    async with httpx.AsyncClient(app=wrapped, base_url="http://test") as client:
+        first = asyncio.create_task(client.post("/slow", headers=headers))
+        while not calls:
+            await asyncio.sleep(0.01)
+        assert (await client.post("/slow", headers=headers)).status_code == status.HTTP_409_CONFLICT
+        release.set()
+        assert (await first).status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        # 5xx results are not stored, so the retry runs
+        response = await client.post("/slow", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(calls) == 2
+
+async def _call(app, headers: list, chunks: list) -> list:
+    """Drive an ASGI app like a server: the body arrives in chunks, and once the response is complete only a disconnect is left"""
+    scope = {"type": "http", "method": "POST", "path": "/upload", "headers": headers, "query_string": b""}
+    incoming = [{"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1} for index, chunk in enumerate(chunks)]
+    sent = []
+    
+    async def receive():
+        if incoming and not any(message["type"] == "http.response.body" for message in sent):
+            return incoming.pop(0)
+        return {"type": "http.disconnect"}
+    
+    async def send(message):
+        sent.append(message)
+    
+    await app(scope, receive, send)
+    return sent
+
+async def test_early_answer_fingerprints_the_whole_body():
+    """Test that an endpoint answering before reading the body still leaves a full-body fingerprint"""
+    calls = []
+    
+    async def reject_early(scope, receive, send):
+        # Like a 415: answered without reading the body
+        calls.append(1)
+        await send({"type": "http.response.start", "status": 415, "headers": []})
+        await send({"type": "http.response.body", "body": b"unsupported"})
+    
+    wrapped = IdempotencyMiddleware(reject_early, store=TTLCache(max_size=10, ttl_seconds=60))
+    token = create_access_token({"sub": "someone"})
+    headers = [(b"authorization", f"Bearer {token}".encode()), (b"idempotency-key", b"upload-1")]
+    
+    assert (await _call(wrapped, headers, [b"first half,", b"second half"]))[0]["status"] == 415
+    retry = await _call(wrapped, headers, [b"first half,", b"second half"])
+    assert retry[0]["status"] == 415
+    assert (REPLAYED_HEADER, b"true") in retry[0]["headers"]
+    # Same opening chunk, different rest: a different request
+    assert (await _call(wrapped, headers, [b"first half,", b"other half"]))[0]["status"] == 422
+    assert len(calls) == 1
+
+def test_store_keeps_within_byte_budget():
+    """Test that stored responses beyond the byte budget evict the least recently used ones"""
+    store = TTLCache(max_size=100, ttl_seconds=60, max_bytes=250, weigh=_stored_bytes)
+    for key in ("a", "b", "c"):
+        store.set(key, StoredResponse(fingerprint="", status=200, headers=[], body=b"x" * 100))
+    
+    assert store.get("a") is None
+    assert store.get("b") is not None and store.get("c") is not None
+    store.invalidate("c")
+    store.set("d", StoredResponse(fingerprint="", status=200, headers=[], body=b"x" * 100))
+    assert store.get("b") is not None
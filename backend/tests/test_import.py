@@ -0,0 +1,78 @@
+import json
+from decimal import Decimal
+from fastapi import status
+from app.bulk_import import import_sweets, text_stream
+from app.models import Sweet
+
+def _upload(client, token, body, content_type, **params):
+    return client.post(
+        "/api/sweets/import",
+        params=params,
+        content=body,
+        headers={"Authorization": f"Bearer {token}", "Content-Type": content_type},
+    )
+
+def test_text_stream_handles_split_chunks():
+    """Test that records and multi-byte characters split across chunks are reassembled"""
+    data = "﻿name,category\r\nCrème Brûlée,Dessert\r\n".encode("utf-8")
+    chunks = [data[i:i + 3] for i in range(0, len(data), 3)]
+    assert text_stream(chunks).read() == "name,category\r\nCrème Brûlée,Dessert\r\n"
+
+def test_import_csv_reports_bad_rows(client, admin_token, db, test_admin):
+    """Test that valid CSV rows are created for the admin and invalid ones are reported by line"""
+    body = (
+        "name,category,price,quantity\n"
+        "Kaju Katli,Indian,12.50,40\n"
+        "Broken,Indian,not-a-price,5\n"
+        '"Toffee, Salted",Toffee,3.00,100\n'
+        "No Quantity,Candy,1.00,\n"
+    )
+    # Sent in small chunks so rows arrive split across reads
+    encoded = body.encode()
+    response = _upload(client, admin_token, iter([encoded[i:i + 7] for i in range(0, len(encoded), 7)]), "text/csv")
+
+    assert response.status_code == status.HTTP_200_OK
+    report = response.json()
+    assert (report["inserted"], report["updated"], report["failed"]) == (2, 0, 2)
+    assert [error["line"] for error in report["errors"]] == [3, 5]
+    assert "price" in report["errors"][0]["error"]
+
+    sweets = {sweet.name: sweet for sweet in db.query(Sweet).all()}
+    assert set(sweets) == {"Kaju Katli", "Toffee, Salted"}
+    assert sweets["Kaju Katli"].price == Decimal("12.50")
+    assert sweets["Kaju Katli"].created_by_user_id == test_admin.id
+
+def test_import_ndjson_and_upsert(client, admin_token, db, test_admin):
+    """Test NDJSON parsing errors and that upsert updates the admin's sweet with the same name"""
+    db.add(Sweet(name="Gulab Jamun", category="Indian", price=Decimal("2.00"), quantity=1, created_by_user_id=test_admin.id))
+    db.commit()
+    lines = [
+        json.dumps({"name": "Gulab Jamun", "category": "Indian", "price": "2.50", "quantity": 30}),
+        "{not json",
+        "",
+        json.dumps(["a", "list"]),
+        json.dumps({"name": "Jalebi", "category": "Indian", "price": 1.75, "quantity": 60}),
+    ]
+    response = _upload(client, admin_token, "\n".join(lines), "application/x-ndjson", mode="upsert")
+
+    report = response.json()
+    assert (report["inserted"], report["updated"], report["failed"]) == (1, 1, 2)
+    assert [error["line"] for error in report["errors"]] == [2, 4]
+    db.expire_all()
+    quantities = {sweet.name: sweet.quantity for sweet in db.query(Sweet).all()}
+    assert quantities == {"Gulab Jamun": 30, "Jalebi": 60}
+
+def test_import_writes_in_chunks(db, test_admin):
+    """Test that an import spanning several chunks writes every row"""
+    rows = "".join(json.dumps({"name": f"Sweet {i}", "category": "Candy", "price": 1, "quantity": i}) + "\n" for i in range(5))
+    report = import_sweets(db, [rows.encode()], "ndjson", test_admin.id, chunk_size=2)
+    assert report["inserted"] == 5
+    assert db.query(Sweet).count() == 5
+
+def test_import_rejects_unknown_format_and_non_admins(client, admin_token, auth_token, db):
+    """Test the content-type check and the admin requirement"""
+    response = _upload(client, admin_token, "<sweets/>", "application/xml")
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+    response = _upload(client, auth_token, "name,category,price,quantity\n", "text/csv")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,152 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from fastapi import HTTPException, status
+from app import inventory
+from app.models import User, Sweet, SweetStockShard, PurchaseHistory, SalesDailyRollup
+from app.routers.sweets import purchase_sweet
+from app.schemas import PurchaseRequest
+
+def _shard(client, token, sweet_id, shards):
+    return client.put(
+        f"/api/sweets/{sweet_id}/stock-shards",
+        json={"shards": shards},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+def _counters(db, sweet_id):
+    db.expire_all()
+    return [row.quantity for row in db.query(SweetStockShard).filter(SweetStockShard.sweet_id == sweet_id).order_by(SweetStockShard.shard)]
+
+def test_split_is_even():
+    """Test that stock is spread as evenly as possible"""
+    assert inventory.split(10, 4) == [3, 3, 2, 2]
+    assert inventory.split(2, 4) == [1, 1, 0, 0]
+
+def test_sharded_sweet_lifecycle(client, auth_token, admin_token, db, test_admin):
+    """Test sharding, purchases from one or several counters, restock rebalancing and unsharding"""
+    sweet = Sweet(name="Flash Fudge", category="Fudge", price=Decimal("1.00"), quantity=100, created_by_user_id=test_admin.id)
+    db.add(sweet)
+    db.commit()
+    sweet_id = sweet.id
+    user = {"Authorization": f"Bearer {auth_token}"}
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    
+    response = _shard(client, admin_token, sweet_id, 4)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["quantity"] == 100
+    assert _counters(db, sweet_id) == [25, 25, 25, 25]
+    assert db.get(Sweet, sweet_id).quantity == 0
+    
+    # One purchase takes from a single counter; the catalog reports the sum
+    response = client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 3}, headers=user)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["quantity"] == 97
+    assert sorted(_counters(db, sweet_id)) == [22, 25, 25, 25]
+    assert client.get("/api/sweets/", headers=user).json()[0]["quantity"] == 97
+    assert client.get("/api/sweets/search?name=fudge", headers=user).json()[0]["quantity"] == 97
+    
+    # More than any one counter holds is taken from several
+    response = client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 60}, headers=user)
+    assert response.json()["quantity"] == 37
+    response = client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 38}, headers=user)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert sum(_counters(db, sweet_id)) == 37
+    
+    response = client.post(f"/api/sweets/{sweet_id}/restock", json={"quantity": 3}, headers=admin)
+    assert response.json()["quantity"] == 40
+    assert _counters(db, sweet_id) == [10, 10, 10, 10]
+    
+    response = client.put(f"/api/sweets/{sweet_id}/", json={"quantity": 6}, headers=admin)
+    assert response.json()["quantity"] == 6
+    assert _counters(db, sweet_id) == [2, 2, 1, 1]
+    
+    response = _shard(client, admin_token, sweet_id, 0)
+    assert response.json()["quantity"] == 6
+    assert _counters(db, sweet_id) == []
+    assert db.get(Sweet, sweet_id).quantity == 6
+    assert db.query(PurchaseHistory).count() == 2
+
+def test_checkout_mixes_sharded_and_plain_sweets(client, auth_token, admin_token, db, test_admin):
+    """Test that a basket can hold sharded sweets and a failed line undoes the counter claims"""
+    plain = Sweet(name="Plain", category="Candy", price=Decimal("1.00"), quantity=5, created_by_user_id=test_admin.id)
+    hot = Sweet(name="Hot", category="Candy", price=Decimal("2.00"), quantity=8, created_by_user_id=test_admin.id)
+    db.add_all([plain, hot])
+    db.commit()
+    plain_id, hot_id = plain.id, hot.id
+    _shard(client, admin_token, hot_id, 2)
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    
+    response = client.post("/api/sweets/checkout", json={"items": [
+        {"sweet_id": hot_id, "quantity": 3}, {"sweet_id": plain_id, "quantity": 1}
+    ]}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert [(line["id"], line["quantity"]) for line in response.json()] == [(hot_id, 5), (plain_id, 4)]
+    
+    response = client.post("/api/sweets/checkout", json={"items": [
+        {"sweet_id": hot_id, "quantity": 1}, {"sweet_id": plain_id, "quantity": 9}
+    ]}, headers=headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert str(plain_id) in response.json()["detail"]
+    assert sum(_counters(db, hot_id)) == 5
+    
+    response = client.post("/api/sweets/checkout", json={"items": [{"sweet_id": hot_id, "quantity": 6}]}, headers=headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert str(hot_id) in response.json()["detail"]
+
+def test_sharding_requires_owner(client, admin_token, db, test_admin):
+    """Test that only the sweet's creator can shard it and the shard count is bounded"""
+    owner = User(username="otheradmin", email="other@example.com", hashed_password="x", role="admin")
+    db.add(owner)
+    db.commit()
+    other = Sweet(name="Other", category="Candy", price=Decimal("1.00"), quantity=5, created_by_user_id=owner.id)
+    db.add(other)
+    db.commit()
+    assert _shard(client, admin_token, other.id, 2).status_code == status.HTTP_403_FORBIDDEN
+    assert _shard(client, admin_token, other.id, 65).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert _shard(client, admin_token, 999999, 2).status_code == status.HTTP_404_NOT_FOUND
+
+def test_concurrent_sharded_purchases_never_oversell(client, admin_token, db, test_user, test_admin, session_factory):
+    """Test that parallel buyers of a sharded sweet take exactly its stock"""
+    sweet = Sweet(name="Hot Item", category="Test", price=Decimal("2.50"), quantity=50, created_by_user_id=test_admin.id)
+    db.add(sweet)
+    db.commit()
+    sweet_id = sweet.id
+    buyer_id = test_user.id
+    _shard(client, admin_token, sweet_id, 8)
+    
+    def buy(_):
+        session = session_factory()
+        buyer = session.get(type(test_user), buyer_id)
+        try:
+            purchase_sweet(sweet_id, PurchaseRequest(quantity=1), session, buyer)
+            return True
+        except HTTPException as e:
+            assert e.status_code == status.HTTP_400_BAD_REQUEST
+            return False
+        finally:
+            session.close()
+    
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(buy, range(120)))
+    
+    assert sum(results) == 50
+    assert _counters(db, sweet_id) == [0] * 8
+    assert db.query(PurchaseHistory).filter(PurchaseHistory.sweet_id == sweet_id).count() == 50
+
+def test_sharded_sales_spread_over_rollup_buckets(client, auth_token, admin_token, db, test_admin):
+    """Test that a sharded sweet's sales land in per-shard rollup rows and analytics sums them"""
+    sweet = Sweet(name="Bucket Brittle", category="Brittle", price=Decimal("1.00"), quantity=40, created_by_user_id=test_admin.id)
+    db.add(sweet)
+    db.commit()
+    sweet_id = sweet.id
+    _shard(client, admin_token, sweet_id, 4)
+    user = {"Authorization": f"Bearer {auth_token}"}
+    
+    for _ in range(20):
+        assert client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 1}, headers=user).status_code == status.HTTP_200_OK
+    
+    buckets = {row.bucket for row in db.query(SalesDailyRollup).filter(SalesDailyRollup.sweet_id == sweet_id)}
+    assert len(buckets) > 1 and buckets <= set(range(4))
+    analytics = client.get("/api/sweets/admin/analytics", headers={"Authorization": f"Bearer {admin_token}"}).json()
+    assert analytics["totals"] == {"units": 20, "revenue": "20.00", "purchases": 20}
+    assert [(row["sweet_id"], row["units"]) for row in analytics["by_sweet"]] == [(sweet_id, 20)]
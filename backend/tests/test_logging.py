@@ -0,0 +1,36 @@
+import json
+import logging
+import queue
+from app.logging_config import (
+    JSONFormatter, DebugSamplingFilter, DroppingQueueHandler, parse_route_rates
+)
+
+def make_record(level=logging.DEBUG, route="-", **extra):
+    record = logging.makeLogRecord({"name": "app.test", "levelno": level, "levelname": logging.getLevelName(level),
+                                    "msg": "purchase %s", "args": ("done",), **extra})
+    record.route = route
+    return record
+
+def test_json_formatter_includes_extra_fields():
+    """Test that records are rendered as one JSON object with their extra fields"""
+    entry = json.loads(JSONFormatter().format(make_record(route="/api/sweets/", sweet_id=7)))
+    assert entry["message"] == "purchase done"
+    assert entry["level"] == "DEBUG"
+    assert entry["route"] == "/api/sweets/"
+    assert entry["sweet_id"] == 7
+
+def test_debug_sampling_by_route():
+    """Test that debug lines are sampled per route prefix and other levels always pass"""
+    sampler = DebugSamplingFilter(default_rate=1.0, route_rates=parse_route_rates("/api/sweets=0,/api/sweets/search=1"))
+    assert not sampler.filter(make_record(route="/api/sweets/"))
+    assert sampler.filter(make_record(route="/api/sweets/search"))
+    assert sampler.filter(make_record(route="/api/auth/login"))
+    assert sampler.filter(make_record(level=logging.INFO, route="/api/sweets/"))
+
+def test_queue_handler_drops_when_full():
+    """Test that logging never blocks the caller when the queue is full"""
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(make_record(level=logging.INFO))
+    handler.handle(make_record(level=logging.INFO))
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
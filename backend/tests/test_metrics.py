@@ -0,0 +1,48 @@
+from fastapi import status
+from decimal import Decimal
+from app import metrics
+from app.models import Sweet
+from app.metrics import Counter, Histogram
+
+def test_histogram_renders_cumulative_buckets():
+    """Test Prometheus histogram exposition"""
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, route="/a")
+    histogram.observe(0.5, route="/a")
+    histogram.observe(5, route="/a")
+    lines = list(histogram.render())
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+
+def test_counter_escapes_label_values():
+    """Test that label values are escaped"""
+    counter = Counter("events_total", "Events", ("name",))
+    counter.inc(name='say "hi"')
+    assert 'events_total{name="say \\"hi\\""} 1' in list(counter.render())
+
+def test_metrics_endpoint_tracks_routes_and_purchases(client, auth_token, db):
+    """Test that requests are counted by route template and purchases are counted"""
+    sweet = Sweet(name="Metered", category="Test", price=Decimal("1.00"), quantity=5)
+    db.add(sweet)
+    db.commit()
+    route = "/api/sweets/{sweet_id}/purchase"
+    requests_before = metrics.HTTP_REQUESTS.value(method="POST", route=route, status="200")
+    purchases_before = metrics.PURCHASED_UNITS.value(endpoint="purchase")
+    
+    response = client.post(
+        f"/api/sweets/{sweet.id}/purchase",
+        json={"quantity": 2},
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    
+    assert metrics.HTTP_REQUESTS.value(method="POST", route=route, status="200") == requests_before + 1
+    assert metrics.PURCHASED_UNITS.value(endpoint="purchase") == purchases_before + 2
+    
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert "db_pool_checked_out" in response.text
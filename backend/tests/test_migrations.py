@@ -0,0 +1,75 @@
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from alembic import command
+from sqlalchemy import create_engine, event, inspect, text
+from app.database import Base
+from app.schema import alembic_config, ensure_schema, current_revision, head_revision, include_object
+
+@pytest.fixture
+def fresh_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    yield engine
+    engine.dispose()
+
+def test_migrations_build_the_model_schema(fresh_engine):
+    """Test that migrating an empty database creates every mapped table"""
+    assert ensure_schema(fresh_engine) is True
+    assert current_revision(fresh_engine) == head_revision()
+    
+    tables = set(inspect(fresh_engine).get_table_names())
+    assert set(Base.metadata.tables) <= tables
+    assert "sweets_fts" in tables
+
+def test_migrations_match_models(fresh_engine):
+    """Test that the migrations and models.py describe the same schema"""
+    ensure_schema(fresh_engine)
+    with fresh_engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={"include_object": include_object})
+        assert compare_metadata(context, Base.metadata) == []
+
+def test_up_to_date_schema_costs_one_query(fresh_engine):
+    """Test that a boot against a migrated database is a single version check"""
+    ensure_schema(fresh_engine)
+    
+    statements = []
+    event.listen(fresh_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    assert ensure_schema(fresh_engine) is False
+    assert statements == ["SELECT version_num FROM alembic_version"]
+
+def test_migrations_adopt_legacy_database(fresh_engine):
+    """Test that a database created by the old create_all startup is upgraded in place"""
+    Base.metadata.create_all(bind=fresh_engine)
+    
+    assert ensure_schema(fresh_engine) is True
+    indexes = {index["name"] for index in inspect(fresh_engine).get_indexes("users")}
+    assert "idx_users_reset_token" in indexes
+
+def test_rollup_migration_backfills_history(fresh_engine):
+    """Test that adding the sales rollup table sums existing purchases by regular users per day"""
+    config = alembic_config()
+    with fresh_engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "0002_search_indexes")
+        connection.execute(text(
+            "INSERT INTO users (id, username, email, hashed_password, role) VALUES "
+            "(1, 'buyer', 'b@example.com', 'x', 'user'), (2, 'boss', 'a@example.com', 'x', 'admin')"
+        ))
+        connection.execute(text(
+            "INSERT INTO sweets (id, name, category, price, quantity) VALUES (1, 'Ladoo', 'Indian', 2, 10)"
+        ))
+        connection.execute(text(
+            "INSERT INTO purchase_history (user_id, sweet_id, sweet_name, category, price, quantity, total_price, purchased_at) VALUES "
+            "(1, 1, 'Ladoo', 'Indian', 2, 1, 2, '2025-01-01 09:00:00'), "
+            "(1, 1, 'Ladoo', 'Indian', 2, 3, 6, '2025-01-01 18:00:00'), "
+            "(2, 1, 'Ladoo', 'Indian', 2, 5, 10, '2025-01-01 12:00:00'), "
+            "(1, 1, 'Ladoo', 'Indian', 2, 2, 4, '2025-01-02 12:00:00')"
+        ))
+        command.upgrade(config, "head")
+    
+    with fresh_engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT day, units, revenue, purchases FROM sales_daily_rollups ORDER BY day"
+        )).all()
+    assert [tuple(row) for row in rows] == [("2025-01-01", 4, 8, 2), ("2025-01-02", 2, 4, 1)]
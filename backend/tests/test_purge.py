@@ -0,0 +1,95 @@
+import time
+from decimal import Decimal
+from datetime import date, datetime
+from sqlalchemy import event, func
+from app.models import Sweet, PurchaseHistory, PurchaseHistoryArchive, SalesDailyRollup
+from app.purge import purge_deleted_sweets, SweetPurger
+
+def _sold_sweet(db, test_user, name, purchases):
+    sweet = Sweet(name=name, category="Candy", price=Decimal("1.50"), quantity=100)
+    db.add(sweet)
+    db.commit()
+    db.add_all([
+        PurchaseHistory(
+            user_id=test_user.id, sweet_id=sweet.id, sweet_name=name, category="Candy",
+            price=Decimal("1.50"), quantity=1, total_price=Decimal("1.50"), purchased_at=datetime(2025, 1, 1),
+        )
+        for _ in range(purchases)
+    ])
+    db.add(SalesDailyRollup(sweet_id=sweet.id, day=date(2025, 1, 1), units=purchases, revenue=Decimal("1.50") * purchases, purchases=purchases))
+    db.commit()
+    return sweet.id
+
+def test_purge_archives_history_in_batches(db, test_user, session_factory):
+    """Test that only soft-deleted sweets are purged, their history archived a batch per transaction"""
+    deleted_id = _sold_sweet(db, test_user, "Deleted", 7)
+    kept_id = _sold_sweet(db, test_user, "Kept", 2)
+    db.query(Sweet).filter(Sweet.id == deleted_id).update({"deleted_at": func.now()})
+    db.commit()
+    
+    commits = []
+    
+    def record(session):
+        commits.append(session)
+    
+    event.listen(session_factory, "after_commit", record)
+    try:
+        totals = purge_deleted_sweets(session_factory, mode="archive", batch_size=3)
+    finally:
+        event.remove(session_factory, "after_commit", record)
+    
+    assert totals == {"sweets": 1, "purchases": 7}
+    # The id lookup, 3 history batches (3 + 3 + 1 rows), then shards + the sweet
+    assert len(commits) == 5
+    db.expire_all()
+    assert db.query(PurchaseHistory).filter(PurchaseHistory.sweet_id == deleted_id).count() == 0
+    assert db.query(PurchaseHistory).count() == 2
+    archived = db.query(PurchaseHistoryArchive).all()
+    assert len(archived) == 7
+    assert {row.sweet_id for row in archived} == {deleted_id}
+    assert archived[0].archived_at is not None
+    # The rollups, and the soft-deleted sweet they reference, stay for analytics
+    assert sorted(row.sweet_id for row in db.query(SalesDailyRollup).all()) == [deleted_id, kept_id]
+    assert db.get(Sweet, deleted_id).deleted_at is not None
+    assert purge_deleted_sweets(session_factory, mode="archive", batch_size=3) == {"sweets": 0, "purchases": 0}
+
+def test_archived_sweet_revenue_stays_in_analytics(client, admin_token, db, test_admin, test_user, session_factory):
+    """Test that an archived sweet's sales still count in the admin analytics"""
+    deleted_id = _sold_sweet(db, test_user, "Deleted", 3)
+    db.query(Sweet).filter(Sweet.id == deleted_id).update({"deleted_at": func.now(), "created_by_user_id": test_admin.id})
+    db.commit()
+    
+    purge_deleted_sweets(session_factory, mode="archive", batch_size=10)
+    response = client.get("/api/sweets/admin/analytics", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.json()["totals"] == {"units": 3, "revenue": "4.50", "purchases": 3}
+
+def test_purge_delete_mode_keeps_no_archive(db, test_user, session_factory):
+    """Test that delete mode drops the history instead of archiving it"""
+    deleted_id = _sold_sweet(db, test_user, "Deleted", 4)
+    db.query(Sweet).filter(Sweet.id == deleted_id).update({"deleted_at": func.now()})
+    db.commit()
+    
+    assert purge_deleted_sweets(session_factory, mode="delete", batch_size=10) == {"sweets": 1, "purchases": 4}
+    assert db.query(Sweet).count() == 0
+    assert db.query(SalesDailyRollup).count() == 0
+    assert db.query(PurchaseHistoryArchive).count() == 0
+
+def test_purger_runs_when_woken(db, test_user, session_factory):
+    """Test that the background purger runs on wake() without waiting for its interval"""
+    deleted_id = _sold_sweet(db, test_user, "Deleted", 2)
+    db.query(Sweet).filter(Sweet.id == deleted_id).update({"deleted_at": func.now()})
+    db.commit()
+    
+    purger = SweetPurger(interval_seconds=3600, batch_size=10, mode="archive")
+    purger.start(session_factory)
+    try:
+        purger.wake()
+        for _ in range(100):
+            db.expire_all()
+            if db.query(PurchaseHistory).count() == 0:
+                break
+            time.sleep(0.05)
+    finally:
+        purger.stop()
+    assert db.query(PurchaseHistory).count() == 0
+    assert db.query(PurchaseHistoryArchive).count() == 2
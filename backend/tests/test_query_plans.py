@@ -0,0 +1,129 @@
+import re
+import pytest
+from decimal import Decimal
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert, text
+from app.models import User, Sweet, PurchaseHistory, SalesDailyRollup
+
+# Tables whose hot queries must be index lookups, never full scans
+CHECKED_TABLES = ("sweets", "purchase_history", "users", "sales_daily_rollups")
+
+def sequential_scans(connection, statement, parameters) -> list:
+    """Tables the database would read in full to run `statement` (SQLite and PostgreSQL)"""
+    if connection.dialect.name == "postgresql":
+        plan = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).scalars().all()
+        found = [re.search(r"Seq Scan on (\w+)", line) for line in plan]
+    else:
+        plan = [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        # "SCAN t USING [COVERING] INDEX ..." walks an index; a bare "SCAN t" reads the table
+        found = [re.fullmatch(r"SCAN (\w+)", line.strip()) for line in plan]
+    return [match.group(1) for match in found if match and match.group(1) in CHECKED_TABLES]
+
+@pytest.fixture
+def seeded(db, test_admin, test_user):
+    """A catalog big enough for the planner to prefer indexes: 30 admins, 300 sweets, 3000 purchases, 10 days of rollups"""
+    others = [
+        User(username=f"admin{i}", email=f"admin{i}@example.com", hashed_password="x", role="admin")
+        for i in range(29)
+    ]
+    db.add_all(others)
+    db.commit()
+    owners = [test_admin.id] + [admin.id for admin in others]
+
+    db.execute(insert(Sweet), [
+        {
+            "name": f"Sweet {i}",
+            "category": f"Category {i % 20}",
+            "price": Decimal("1.00") + Decimal(i) / 10,
+            "quantity": 1000,
+            "created_by_user_id": owners[i % len(owners)],
+        }
+        for i in range(300)
+    ])
+    buyers = [User(username=f"buyer{i}", email=f"buyer{i}@example.com", hashed_password="x", role="user") for i in range(30)]
+    db.add_all(buyers)
+    db.commit()
+    buyer_ids = [test_user.id] + [buyer.id for buyer in buyers]
+    sweet_ids = db.execute(text("SELECT id FROM sweets ORDER BY id")).scalars().all()
+
+    started = datetime(2025, 1, 1)
+    db.execute(insert(PurchaseHistory), [
+        {
+            "user_id": buyer_ids[i % len(buyer_ids)],
+            "sweet_id": sweet_ids[(i * 7) % len(sweet_ids)],
+            "sweet_name": "Sweet",
+            "category": "Category",
+            "price": Decimal("1.00"),
+            "quantity": 1,
+            "total_price": Decimal("1.00"),
+            "purchased_at": started + timedelta(minutes=i),
+        }
+        for i in range(3000)
+    ])
+    db.execute(insert(SalesDailyRollup), [
+        {"sweet_id": sweet_id, "day": started.date() + timedelta(days=day), "units": 1, "revenue": Decimal("1.00"), "purchases": 1}
+        for sweet_id in sweet_ids
+        for day in range(10)
+    ])
+    db.commit()
+    # Give the planner real statistics, as a production database would have
+    db.execute(text("ANALYZE"))
+    db.commit()
+    return sweet_ids
+
+@pytest.fixture
+def explain_requests(db, client):
+    """Capture every statement the API runs, then report the ones that need a sequential scan"""
+    engine = db.get_bind()
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE"):
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+
+    def check():
+        event.remove(engine, "before_cursor_execute", record)
+        assert captured, "no statements were captured"
+        with engine.connect() as connection:
+            scans = {
+                statement: tables
+                for statement, parameters in captured
+                if (tables := sequential_scans(connection, statement, parameters))
+            }
+        assert scans == {}
+
+    yield check
+    if record in getattr(engine.dispatch, "before_cursor_execute", []):
+        event.remove(engine, "before_cursor_execute", record)
+
+def _headers(client, username, password):
+    response = client.post("/api/auth/login", data={"username": username, "password": password})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_user_hot_queries_use_indexes(client, seeded, explain_requests):
+    """Catalog pages, price-range search, purchases and the buyer's history avoid full scans"""
+    headers = _headers(client, "testuser", "testpassword")
+    sweet_ids = seeded
+
+    assert client.get("/api/sweets/", params={"limit": 20, "after": sweet_ids[100]}, headers=headers).status_code == 200
+    assert client.get("/api/sweets/search", params={"min_price": 5, "max_price": 6}, headers=headers).status_code == 200
+    assert client.post(f"/api/sweets/{sweet_ids[3]}/purchase", json={"quantity": 1}, headers=headers).status_code == 200
+    assert client.post("/api/sweets/checkout", json={"items": [
+        {"sweet_id": sweet_ids[5], "quantity": 1}, {"sweet_id": sweet_ids[9], "quantity": 2}
+    ]}, headers=headers).status_code == 200
+    assert client.get("/api/sweets/purchase-history", headers=headers).status_code == 200
+
+    explain_requests()
+
+def test_admin_hot_queries_use_indexes(client, seeded, explain_requests):
+    """Admin history, analytics and the delete cascade avoid full scans"""
+    headers = _headers(client, "admin", "adminpassword")
+    sweet_ids = seeded
+
+    assert client.get("/api/sweets/admin/purchase-history", params={"limit": 50}, headers=headers).status_code == 200
+    assert client.get("/api/sweets/admin/analytics", headers=headers).status_code == 200
+    assert client.delete(f"/api/sweets/{sweet_ids[30]}/", headers=headers).status_code == 204
+
+    explain_requests()
@@ -0,0 +1,110 @@
+from decimal import Decimal
+import pytest
+from fastapi import status
+from app import hashing
+from app.database import settings
+from app.models import Sweet
+from app.ratelimit import DatabaseBuckets, Limit, parse_limits, rate_limits
+
+def _login(client, username, password="wrongpassword"):
+    return client.post("/api/auth/login", data={"username": username, "password": password})
+
+def test_login_limited_per_username_before_hashing(client, db, test_user, monkeypatch):
+    """Test that repeated logins for one username get 429 with Retry-After and skip bcrypt"""
+    monkeypatch.setitem(rate_limits, ("login", "user"), Limit(2, 60))
+    verified = []
+    original = hashing.verify_password_async
+    
+    async def counting_verify(*args):
+        verified.append(args)
+        return await original(*args)
+    
+    monkeypatch.setattr("app.routers.auth.verify_password_async", counting_verify)
+    
+    assert _login(client, "testuser").status_code == status.HTTP_401_UNAUTHORIZED
+    assert _login(client, "testuser").status_code == status.HTTP_401_UNAUTHORIZED
+    response = _login(client, "testuser", "testpassword")
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert 1 <= int(response.headers["Retry-After"]) <= 30
+    assert len(verified) == 2
+    # Case and surrounding spaces don't make a new bucket
+    assert _login(client, "TestUser ").status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    
+    # Other usernames have their own bucket
+    assert _login(client, "someoneelse").status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_register_limited_per_ip(client, db, monkeypatch):
+    """Test that one client IP can only register so many accounts"""
+    monkeypatch.setitem(rate_limits, ("register", "ip"), Limit(1, 3600))
+    first = client.post("/api/auth/register", json={"username": "first", "email": "first@example.com", "password": "password123"})
+    assert first.status_code == status.HTTP_201_CREATED
+    second = client.post("/api/auth/register", json={"username": "second", "email": "second@example.com", "password": "password123"})
+    assert second.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert second.json()["detail"]
+
+def test_spoofed_forwarded_for_keeps_login_ip_bucket(client, db, monkeypatch):
+    """Test that behind one proxy a client can't open fresh per-IP buckets by sending its own X-Forwarded-For"""
+    monkeypatch.setitem(rate_limits, ("login", "ip"), Limit(2, 60))
+    monkeypatch.setattr(settings, "RATE_LIMIT_PROXY_HOPS", 1)
+    
+    def login_via_proxy(spoofed):
+        # The proxy appends the address it saw to whatever the client sent
+        return client.post(
+            "/api/auth/login",
+            data={"username": f"user{spoofed}", "password": "wrongpassword"},
+            headers={"X-Forwarded-For": f"10.0.0.{spoofed}, 203.0.113.7"},
+        )
+    
+    assert login_via_proxy(1).status_code == status.HTTP_401_UNAUTHORIZED
+    assert login_via_proxy(2).status_code == status.HTTP_401_UNAUTHORIZED
+    assert login_via_proxy(3).status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    
+    # Another client behind the same proxy has its own bucket
+    other = client.post("/api/auth/login", data={"username": "user4", "password": "x"}, headers={"X-Forwarded-For": "198.51.100.9"})
+    assert other.status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_purchases_limited_per_user(client, auth_token, db, monkeypatch):
+    """Test that purchase and checkout share a per-user bucket keyed by the bearer token"""
+    monkeypatch.setitem(rate_limits, ("purchase", "user"), Limit(2, 60))
+    sweet = Sweet(name="Rationed Rock", category="Rock", price=Decimal("1.00"), quantity=10)
+    db.add(sweet)
+    db.commit()
+    sweet_id = sweet.id
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    
+    assert client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 1}, headers=headers).status_code == status.HTTP_200_OK
+    checkout = client.post("/api/sweets/checkout", json={"items": [{"sweet_id": sweet_id, "quantity": 1}]}, headers=headers)
+    assert checkout.status_code == status.HTTP_200_OK
+    limited = client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 1}, headers=headers)
+    assert limited.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    db.expire_all()
+    assert db.get(Sweet, sweet_id).quantity == 8
+
+def test_rate_limiting_can_be_disabled(client, db, test_user, monkeypatch):
+    """Test that RATE_LIMIT_ENABLED=false lets every request through"""
+    monkeypatch.setitem(rate_limits, ("login", "user"), Limit(1, 60))
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    for _ in range(3):
+        assert _login(client, "testuser").status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_database_buckets_are_shared(tmp_path):
+    """Test that two stores on one database draw from the same bucket"""
+    url = f"sqlite:///{tmp_path / 'buckets.db'}"
+    first, second = DatabaseBuckets(url), DatabaseBuckets(url)
+    limit = Limit(2, 60)
+    
+    assert first.take("login:user:alice", limit) == 0
+    assert second.take("login:user:alice", limit) == 0
+    assert 0 < first.take("login:user:alice", limit) <= 30
+    assert second.take("login:user:bob", limit) == 0
+    first.engine.dispose()
+    second.engine.dispose()
+
+def test_parse_limits():
+    """Test that RATE_LIMITS overrides defaults, 0 turns a bucket off and typos are rejected"""
+    limits = parse_limits("login.ip=50/60, purchase.user=0")
+    assert limits[("login", "ip")] == Limit(50, 60)
+    assert limits[("purchase", "user")] is None
+    assert limits[("login", "user")] == Limit(10, 300)
+    with pytest.raises(ValueError):
+        parse_limits("logon.ip=5/60")
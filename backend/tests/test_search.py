@@ -0,0 +1,66 @@
+import pytest
+from fastapi import status
+from decimal import Decimal
+from app.models import Sweet
+from app.search import word_similarity
+
+def search(client, token, query):
+    response = client.get(
+        f"/api/sweets/search?{query}",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return [s["name"] for s in response.json()]
+
+def test_word_similarity_matches_pg_trgm():
+    """Test the Python similarity against pg_trgm's documented example"""
+    assert word_similarity("word", "two words") == pytest.approx(0.8)
+    assert word_similarity("word", "") == 0.0
+
+def test_search_tolerates_typos(client, auth_token, db):
+    """Test that a misspelt name still finds the sweet"""
+    db.add_all([
+        Sweet(name="Chocolate Bar", category="Chocolate", price=Decimal("5.99"), quantity=10),
+        Sweet(name="Caramel Fudge", category="Candy", price=Decimal("3.99"), quantity=20),
+    ])
+    db.commit()
+    
+    assert search(client, auth_token, "name=chocolte") == ["Chocolate Bar"]
+    assert search(client, auth_token, "name=caramell") == ["Caramel Fudge"]
+    assert search(client, auth_token, "category=chocolat") == ["Chocolate Bar"]
+
+def test_search_ranks_by_relevance(client, auth_token, db):
+    """Test that closer matches come first"""
+    db.add_all([
+        Sweet(name="Truffles Box", category="Chocolate", price=Decimal("5.99"), quantity=10),
+        Sweet(name="Truffle", category="Chocolate", price=Decimal("4.99"), quantity=10),
+        Sweet(name="Jelly Beans", category="Candy", price=Decimal("1.99"), quantity=10),
+    ])
+    db.commit()
+    
+    assert search(client, auth_token, "name=truffle") == ["Truffle", "Truffles Box"]
+    assert search(client, auth_token, "name=truffle&category=candy") == []
+
+def test_search_index_follows_updates_and_deletes(client, auth_token, db):
+    """Test that the search index stays in sync with the sweets table"""
+    sweet = Sweet(name="Lemon Drop", category="Candy", price=Decimal("1.50"), quantity=10)
+    gone = Sweet(name="Lemon Tart", category="Pastry", price=Decimal("3.50"), quantity=10)
+    db.add_all([sweet, gone])
+    db.commit()
+    
+    sweet.name = "Orange Drop"
+    db.delete(gone)
+    db.commit()
+    
+    assert search(client, auth_token, "name=lemon") == []
+    assert search(client, auth_token, "name=orange") == ["Orange Drop"]
+
+def test_search_short_terms_use_substring_match(client, auth_token, db):
+    """Test that terms too short for trigrams still match as substrings"""
+    db.add_all([
+        Sweet(name="Kit Kat", category="Chocolate", price=Decimal("1.00"), quantity=10),
+        Sweet(name="Toffee", category="Candy", price=Decimal("1.00"), quantity=10),
+    ])
+    db.commit()
+    
+    assert search(client, auth_token, "name=at") == ["Kit Kat"]
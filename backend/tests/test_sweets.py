@@ -1,7 +1,19 @@
 import pytest
+import csv
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from sqlalchemy import event, create_engine, func
+from sqlalchemy.orm import sessionmaker
 from fastapi import status
 from decimal import Decimal
-from app.models import Sweet
+from datetime import date, datetime, timedelta, timezone
+from app import analytics, catalog, database, serialization
+from app.cache import recent_writers
+from app.models import Sweet, PurchaseHistory, SalesDailyRollup
+from app.routers.sweets import purchase_sweet, restock_sweet
+from app.schemas import PurchaseRequest, RestockRequest, SweetResponse
 
 def test_create_sweet_as_admin(client, admin_token, db):
     """Test creating a sweet as admin"""
@@ -163,9 +175,10 @@ def test_delete_sweet_as_admin(client, admin_token, db):
     )
     assert response.status_code == status.HTTP_204_NO_CONTENT
     
-    # Verify it's deleted
+    # Verify it's soft-deleted (the row itself is removed later by the background purge)
+    db.expire_all()
     deleted_sweet = db.query(Sweet).filter(Sweet.id == sweet_id).first()
-    assert deleted_sweet is None
+    assert deleted_sweet.deleted_at is not None
 
 def test_delete_sweet_as_user_unauthorized(client, auth_token, db):
     """Test that regular users cannot delete sweets"""
@@ -263,3 +276,472 @@ def test_restock_sweet_as_user_unauthorized(client, auth_token, db):
     assert response.status_code == status.HTTP_403_FORBIDDEN
 
 
+
+def test_get_all_sweets_keyset_pagination(client, auth_token, db):
+    """Test paging through sweets with limit/after"""
+    db.add_all([
+        Sweet(name=f"Sweet {i}", category="Test", price=Decimal("1.00"), quantity=i)
+        for i in range(5)
+    ])
+    db.commit()
+    
+    response = client.get(
+        "/api/sweets/?limit=2",
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    first_page = response.json()
+    assert [s["name"] for s in first_page] == ["Sweet 0", "Sweet 1"]
+    cursor = response.headers["X-Next-Cursor"]
+    assert cursor == str(first_page[-1]["id"])
+    
+    response = client.get(
+        f"/api/sweets/?limit=3&after={cursor}",
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    last_page = response.json()
+    assert [s["name"] for s in last_page] == ["Sweet 2", "Sweet 3", "Sweet 4"]
+    assert "X-Next-Cursor" not in response.headers
+
+def test_get_all_sweets_stream(client, auth_token, db):
+    """Test streaming the catalog as NDJSON"""
+    db.add_all([
+        Sweet(name=f"Sweet {i}", category="Test", price=Decimal("1.00"), quantity=i)
+        for i in range(3)
+    ])
+    db.commit()
+    
+    response = client.get(
+        "/api/sweets/?stream=true",
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [s["name"] for s in lines] == ["Sweet 0", "Sweet 1", "Sweet 2"]
+
+def test_purchase_sweet_invalid_quantity(client, auth_token, db):
+    """Test that a non-positive purchase cannot increase stock"""
+    sweet = Sweet(name="Guarded", category="Test", price=Decimal("10.00"), quantity=5)
+    db.add(sweet)
+    db.commit()
+    db.refresh(sweet)
+    
+    response = client.post(
+        f"/api/sweets/{sweet.id}/purchase",
+        json={"quantity": -3},
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_concurrent_purchases_never_oversell(db, test_user, session_factory):
+    """Test that parallel buyers of one sweet cannot take stock below zero"""
+    sweet = Sweet(name="Hot Item", category="Test", price=Decimal("2.50"), quantity=50)
+    db.add(sweet)
+    db.commit()
+    sweet_id = sweet.id
+    buyer_id = test_user.id
+    
+    def buy(_):
+        session = session_factory()
+        buyer = session.get(type(test_user), buyer_id)
+        try:
+            purchase_sweet(sweet_id, PurchaseRequest(quantity=1), session, buyer)
+            return True
+        except HTTPException as e:
+            assert e.status_code == status.HTTP_400_BAD_REQUEST
+            return False
+        finally:
+            session.close()
+    
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(buy, range(300)))
+    
+    assert sum(results) == 50
+    db.expire_all()
+    assert db.get(Sweet, sweet_id).quantity == 0
+    assert db.query(PurchaseHistory).filter(PurchaseHistory.sweet_id == sweet_id).count() == 50
+
+def test_concurrent_restocks_and_purchases_keep_every_unit(db, test_user, test_admin, session_factory):
+    """Test that restocks overlapping purchases neither lose the restock nor bring sold units back"""
+    sweet = Sweet(name="Busy Item", category="Test", price=Decimal("1.00"), quantity=100)
+    db.add(sweet)
+    db.commit()
+    sweet_id = sweet.id
+    buyer_id, admin_id = test_user.id, test_admin.id
+    
+    def run(task):
+        session = session_factory()
+        try:
+            if task % 3 == 0:
+                restock_sweet(sweet_id, RestockRequest(quantity=2), session, session.get(type(test_admin), admin_id))
+            else:
+                purchase_sweet(sweet_id, PurchaseRequest(quantity=1), session, session.get(type(test_user), buyer_id))
+        finally:
+            session.close()
+    
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(run, range(90)))
+    
+    # 30 restocks of 2 and 60 purchases of 1
+    db.expire_all()
+    assert db.get(Sweet, sweet_id).quantity == 100 + 60 - 60
+
+def test_purchase_sweet_round_trips(db, test_user):
+    """Test that a purchase is one conditional UPDATE plus the history INSERT and rollup upsert"""
+    sweet = Sweet(name="Fast Path", category="Test", price=Decimal("1.00"), quantity=10)
+    db.add(sweet)
+    db.commit()
+    sweet_id = sweet.id
+    db.refresh(test_user)  # load the buyer up front, as get_current_user would
+    
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0].upper())
+    
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        purchased = purchase_sweet(sweet_id, PurchaseRequest(quantity=4), db, test_user)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    
+    assert purchased["quantity"] == 6
+    assert statements == ["UPDATE", "INSERT", "INSERT"]
+
+def test_checkout_multiple_sweets(client, auth_token, db):
+    """Test buying a whole basket in one request"""
+    sweet1 = Sweet(name="Toffee", category="Candy", price=Decimal("2.00"), quantity=10)
+    sweet2 = Sweet(name="Fudge", category="Candy", price=Decimal("3.50"), quantity=4)
+    db.add_all([sweet1, sweet2])
+    db.commit()
+    ids = (sweet1.id, sweet2.id)
+    
+    response = client.post(
+        "/api/sweets/checkout",
+        json={"items": [
+            {"sweet_id": ids[1], "quantity": 1},
+            {"sweet_id": ids[0], "quantity": 3},
+            {"sweet_id": ids[1], "quantity": 2},
+        ]},
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [(s["id"], s["quantity"]) for s in data] == [(ids[1], 1), (ids[0], 7)]
+    
+    history = db.query(PurchaseHistory).order_by(PurchaseHistory.sweet_id).all()
+    assert [(h.sweet_id, h.quantity, h.total_price) for h in history] == [
+        (ids[0], 3, Decimal("6.00")),
+        (ids[1], 3, Decimal("10.50")),
+    ]
+
+def test_checkout_is_all_or_nothing(client, auth_token, db):
+    """Test that one short line cancels the whole basket"""
+    sweet1 = Sweet(name="Toffee", category="Candy", price=Decimal("2.00"), quantity=10)
+    sweet2 = Sweet(name="Fudge", category="Candy", price=Decimal("3.50"), quantity=1)
+    db.add_all([sweet1, sweet2])
+    db.commit()
+    ids = (sweet1.id, sweet2.id)
+    
+    response = client.post(
+        "/api/sweets/checkout",
+        json={"items": [
+            {"sweet_id": ids[0], "quantity": 3},
+            {"sweet_id": ids[1], "quantity": 2},
+        ]},
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    response = client.post(
+        "/api/sweets/checkout",
+        json={"items": [{"sweet_id": ids[0], "quantity": 1}, {"sweet_id": 99999, "quantity": 1}]},
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    
+    db.expire_all()
+    assert [db.get(Sweet, i).quantity for i in ids] == [10, 1]
+    assert db.query(PurchaseHistory).count() == 0
+
+def _admin_sales(db, admin, buyer):
+    """Three purchases of an admin's sweet on consecutive days"""
+    sweet = Sweet(name="Ladoo", category="Indian", price=Decimal("2.00"), quantity=50, created_by_user_id=admin.id)
+    db.add(sweet)
+    db.commit()
+    for day in (1, 2, 3):
+        db.add(PurchaseHistory(
+            user_id=buyer.id, sweet_id=sweet.id, sweet_name=sweet.name, category=sweet.category,
+            price=sweet.price, quantity=day, total_price=sweet.price * day,
+            purchased_at=datetime(2025, 1, day, 12, 0, 0)
+        ))
+    db.commit()
+    return sweet
+
+def test_admin_purchase_history(client, admin_token, db, test_admin, test_user):
+    """Test admin history with usernames, date filters and keyset pages"""
+    _admin_sales(db, test_admin, test_user)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    
+    response = client.get("/api/sweets/admin/purchase-history", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [p["quantity"] for p in data] == [3, 2, 1]
+    assert {p["username"] for p in data} == {"testuser"}
+    
+    response = client.get(
+        "/api/sweets/admin/purchase-history?start=2025-01-02T00:00:00&end=2025-01-03T00:00:00",
+        headers=headers
+    )
+    assert [p["quantity"] for p in response.json()] == [2]
+    
+    response = client.get("/api/sweets/admin/purchase-history?limit=2", headers=headers)
+    assert [p["quantity"] for p in response.json()] == [3, 2]
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get(f"/api/sweets/admin/purchase-history?limit=2&before={cursor}", headers=headers)
+    assert [p["quantity"] for p in response.json()] == [1]
+    assert "X-Next-Cursor" not in response.headers
+
+def test_admin_purchase_history_stream(client, admin_token, db, test_admin, test_user):
+    """Test streaming admin history as NDJSON"""
+    _admin_sales(db, test_admin, test_user)
+    
+    response = client.get(
+        "/api/sweets/admin/purchase-history?stream=true",
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(p["username"], p["quantity"]) for p in lines] == [("testuser", 3), ("testuser", 2), ("testuser", 1)]
+
+def test_catalog_conditional_get(client, auth_token, db):
+    """Test that an unchanged catalog answers 304 and a purchase invalidates the ETag"""
+    sweet = Sweet(name="Barfi", category="Indian", price=Decimal("3.00"), quantity=10)
+    db.add(sweet)
+    db.commit()
+    sweet_id = sweet.id
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    
+    response = client.get("/api/sweets/", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+    
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(db.get_bind(), "before_cursor_execute", record)
+    try:
+        response = client.get("/api/sweets/", headers={**headers, "If-None-Match": etag})
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", record)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    assert statements == []  # served from the version stamp and the user cache
+    
+    # Different query strings are different representations
+    response = client.get("/api/sweets/search?name=barfi", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    search_etag = response.headers["ETag"]
+    assert search_etag != etag
+    
+    client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 1}, headers=headers)
+    
+    response = client.get("/api/sweets/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()[0]["quantity"] == 9
+    response = client.get("/api/sweets/search?name=barfi", headers={**headers, "If-None-Match": search_etag})
+    assert response.status_code == status.HTTP_200_OK
+
+def test_catalog_etags_need_shared_versions_across_workers(client, auth_token, db, monkeypatch):
+    """Test that several workers on the local event bus serve the catalog without ETags"""
+    assert catalog.etags_enabled(True, 1, "local")
+    assert catalog.etags_enabled(True, 4, "postgres")
+    assert not catalog.etags_enabled(True, 4, "local")
+    assert not catalog.etags_enabled(False, 1, "local")
+    
+    monkeypatch.setattr(catalog, "catalog_etags", False)
+    headers = {"Authorization": f"Bearer {auth_token}", "If-None-Match": "*"}
+    response = client.get("/api/sweets/", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert "ETag" not in response.headers
+
+def test_reads_use_replica_except_after_own_write(client, auth_token, db, test_user, tmp_path, monkeypatch):
+    """History reads go to the replica; a user who just purchased reads from the primary; the catalog always does"""
+    replica_engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    database.Base.metadata.create_all(bind=replica_engine)
+    ReplicaSession = sessionmaker(bind=replica_engine)
+    with ReplicaSession() as replica:
+        replica.add(Sweet(name="Replica Only", category="Candy", price=Decimal("1.00"), quantity=1))
+        replica.add(PurchaseHistory(
+            user_id=test_user.id, sweet_id=1, sweet_name="Replica Only", category="Candy",
+            price=Decimal("1.00"), quantity=1, total_price=Decimal("1.00"),
+        ))
+        replica.commit()
+    monkeypatch.setattr(database, "ReadSessionLocal", ReplicaSession)
+    
+    sweet = Sweet(name="Primary", category="Candy", price=Decimal("1.00"), quantity=5)
+    db.add(sweet)
+    db.commit()
+    sweet_id = sweet.id
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    
+    def history_names():
+        return [h["sweet_name"] for h in client.get("/api/sweets/purchase-history", headers=headers).json()]
+    
+    assert history_names() == ["Replica Only"]
+    # The catalog carries an ETag stamped at primary commit, so it never reads a lagging replica
+    assert [s["name"] for s in client.get("/api/sweets/", headers=headers).json()] == ["Primary"]
+    assert [s["name"] for s in client.get("/api/sweets/search?category=Candy", headers=headers).json()] == ["Primary"]
+    
+    assert client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 1}, headers=headers).status_code == 200
+    assert history_names() == ["Primary"]
+    
+    recent_writers.clear()
+    assert history_names() == ["Replica Only"]
+    replica_engine.dispose()
+
+def test_sales_analytics_from_rollup(client, auth_token, admin_token, db, test_admin):
+    """Test that purchases update the daily rollup and analytics fold it by period, sweet and category"""
+    ladoo = Sweet(name="Ladoo", category="Indian", price=Decimal("2.00"), quantity=50, created_by_user_id=test_admin.id)
+    fudge = Sweet(name="Fudge", category="Toffee", price=Decimal("5.00"), quantity=50, created_by_user_id=test_admin.id)
+    db.add_all([ladoo, fudge])
+    db.commit()
+    ladoo_id, fudge_id = ladoo.id, fudge.id
+    # Earlier sales, as the rollup would hold them
+    db.add_all([
+        SalesDailyRollup(sweet_id=ladoo_id, day=date(2025, 1, 6), units=1, revenue=Decimal("2.00"), purchases=1),
+        SalesDailyRollup(sweet_id=ladoo_id, day=date(2025, 1, 8), units=2, revenue=Decimal("4.00"), purchases=1),
+        SalesDailyRollup(sweet_id=fudge_id, day=date(2025, 2, 3), units=1, revenue=Decimal("5.00"), purchases=1),
+    ])
+    db.commit()
+    
+    user_headers = {"Authorization": f"Bearer {auth_token}"}
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    client.post(f"/api/sweets/{ladoo_id}/purchase", json={"quantity": 3}, headers=user_headers)
+    client.post("/api/sweets/checkout", json={"items": [
+        {"sweet_id": ladoo_id, "quantity": 1}, {"sweet_id": fudge_id, "quantity": 2}
+    ]}, headers=user_headers)
+    # Admin purchases are not sales
+    client.post(f"/api/sweets/{fudge_id}/purchase", json={"quantity": 1}, headers=admin_headers)
+    
+    today = client.get("/api/sweets/admin/analytics", params={"start": "2025-03-01"}, headers=admin_headers).json()
+    assert today["totals"] == {"units": 6, "revenue": "18.00", "purchases": 3}
+    assert [(row["sweet_name"], row["units"]) for row in today["by_sweet"]] == [("Fudge", 2), ("Ladoo", 4)]
+    
+    weekly = client.get(
+        "/api/sweets/admin/analytics", params={"period": "week", "end": "2025-03-01"}, headers=admin_headers
+    ).json()
+    assert [(row["period_start"], row["units"]) for row in weekly["by_period"]] == [("2025-01-06", 3), ("2025-02-03", 1)]
+    
+    monthly = client.get("/api/sweets/admin/analytics", params={"period": "month"}, headers=admin_headers).json()
+    assert [row["period_start"] for row in monthly["by_period"]][:2] == ["2025-01-01", "2025-02-01"]
+    assert {row["category"]: row["revenue"] for row in monthly["by_category"]} == {"Indian": "14.00", "Toffee": "15.00"}
+    
+    assert client.get("/api/sweets/admin/analytics", headers=user_headers).status_code == status.HTTP_403_FORBIDDEN
+
+def test_rollup_fallback_without_on_conflict(client, auth_token, db, monkeypatch):
+    """Test that databases without ON CONFLICT get update-then-insert, dated like date(purchased_at)"""
+    monkeypatch.setattr(analytics, "_UPSERT_INSERTS", {})
+    sweet = Sweet(name="Portable Praline", category="Praline", price=Decimal("1.50"), quantity=20)
+    db.add(sweet)
+    db.commit()
+    sweet_id = sweet.id
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    
+    for quantity in (2, 3):
+        assert client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": quantity}, headers=headers).status_code == status.HTTP_200_OK
+    
+    rollup = db.query(SalesDailyRollup).filter(SalesDailyRollup.sweet_id == sweet_id).one()
+    assert (rollup.units, rollup.revenue, rollup.purchases) == (5, Decimal("7.50"), 2)
+    purchase_day = db.query(func.date(PurchaseHistory.purchased_at)).filter(PurchaseHistory.sweet_id == sweet_id).first()[0]
+    assert rollup.day.isoformat() == purchase_day
+
+def test_export_purchase_history_csv(client, auth_token, admin_token, db, test_admin, test_user):
+    """Test CSV exports of the buyer's and the admin's history, with date filters"""
+    _admin_sales(db, test_admin, test_user)
+    
+    response = client.get(
+        "/api/sweets/purchase-history/export?start=2025-01-02T00:00:00",
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == 'attachment; filename="purchase-history.csv"'
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["quantity"] for row in rows] == ["3", "2"]
+    assert rows[0]["total_price"] == "6.00"
+    
+    response = client.get(
+        "/api/sweets/admin/purchase-history/export?end=2025-01-03T00:00:00",
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row["username"], row["quantity"]) for row in rows] == [("testuser", "2"), ("testuser", "1")]
+
+def test_export_purchase_history_ndjson(client, admin_token, db, test_admin, test_user):
+    """Test the NDJSON export format"""
+    _admin_sales(db, test_admin, test_user)
+    response = client.get(
+        "/api/sweets/admin/purchase-history/export?format=ndjson",
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="sales.ndjson"'
+    assert [json.loads(line)["quantity"] for line in response.text.splitlines()] == [3, 2, 1]
+
+def test_deleted_sweet_is_hidden(client, auth_token, admin_token, db, test_admin):
+    """Test that a soft-deleted sweet leaves the catalog and search and can no longer be bought"""
+    kept = Sweet(name="Kept Fudge", category="Fudge", price=Decimal("2.00"), quantity=5, created_by_user_id=test_admin.id)
+    gone = Sweet(name="Gone Fudge", category="Fudge", price=Decimal("2.00"), quantity=5, created_by_user_id=test_admin.id)
+    db.add_all([kept, gone])
+    db.commit()
+    kept_id, gone_id = kept.id, gone.id
+    
+    response = client.delete(f"/api/sweets/{gone_id}/", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    assert [sweet["id"] for sweet in client.get("/api/sweets/", headers=headers).json()] == [kept_id]
+    assert [sweet["id"] for sweet in client.get("/api/sweets/search?category=Fudge", headers=headers).json()] == [kept_id]
+    
+    response = client.post(f"/api/sweets/{gone_id}/purchase", json={"quantity": 1}, headers=headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    response = client.post("/api/sweets/checkout", json={"items": [
+        {"sweet_id": kept_id, "quantity": 1}, {"sweet_id": gone_id, "quantity": 1}
+    ]}, headers=headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    response = client.delete(f"/api/sweets/{gone_id}/", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_fast_json_matches_response_model(client, auth_token, admin_token, db, test_admin, test_user, monkeypatch):
+    """Test that the FAST_JSON list responses are byte-for-byte what the response_model path returns"""
+    _admin_sales(db, test_admin, test_user)
+    db.add(Sweet(name="Crème Brûlée", category="Dessert", price=Decimal("4.10"), quantity=3))
+    db.commit()
+    requests = [
+        ("/api/sweets/", auth_token),
+        ("/api/sweets/?limit=1", auth_token),
+        ("/api/sweets/search?name=ladoo", auth_token),
+        ("/api/sweets/purchase-history", auth_token),
+        ("/api/sweets/admin/purchase-history?limit=2", admin_token),
+    ]
+    
+    def fetch(fast):
+        monkeypatch.setattr(database.settings, "FAST_JSON", fast)
+        responses = [client.get(url, headers={"Authorization": f"Bearer {token}"}) for url, token in requests]
+        return [(response.content, response.headers.get("X-Next-Cursor")) for response in responses]
+    
+    fast = fetch(True)
+    assert all(content.startswith(b"[{") for content, _ in fast)
+    assert fast == fetch(False)
+    
+    # Timezone-aware values too (SQLite hands back naive datetimes)
+    sweet = SweetResponse(
+        id=1, name="Barfi", category="Indian", price=Decimal("3.50"), quantity=1,
+        created_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        updated_at=datetime(2025, 1, 1, 5, 30, 0, 123, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+    )
+    assert serialization.dumps([sweet.model_dump()]) == f"[{sweet.model_dump_json()}]".encode()
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert serialization.dumps([sweet.model_dump()]) == f"[{sweet.model_dump_json()}]".encode()
@@ -0,0 +1,82 @@
+from decimal import Decimal
+from fastapi import status
+from sqlalchemy import func
+from app.database import settings
+from app.models import Sweet, PurchaseHistory, PurchaseHistoryOutbox
+from app.purge import purge_deleted_sweets
+from app.write_behind import flush_outbox, HistoryFlusher
+
+def _buy(client, token, sweet_id, quantity=1):
+    return client.post(
+        f"/api/sweets/{sweet_id}/purchase",
+        json={"quantity": quantity},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+def _history(client, token):
+    response = client.get("/api/sweets/purchase-history", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+def _sweet(db, name="Queued Toffee"):
+    sweet = Sweet(name=name, category="Toffee", price=Decimal("2.00"), quantity=50)
+    db.add(sweet)
+    db.commit()
+    return sweet.id
+
+def test_purchases_are_queued_and_flushed_in_batches(client, auth_token, db, session_factory, monkeypatch):
+    """Test that write-behind purchases land in the outbox, show in the buyer's history and move over in batches"""
+    monkeypatch.setattr(settings, "PURCHASE_HISTORY_WRITE_BEHIND", True)
+    sweet_id = _sweet(db)
+    
+    for quantity in (1, 2, 3):
+        assert _buy(client, auth_token, sweet_id, quantity).status_code == status.HTTP_200_OK
+    
+    assert db.query(PurchaseHistory).count() == 0
+    assert db.query(PurchaseHistoryOutbox).count() == 3
+    pending = _history(client, auth_token)
+    assert sorted(row["quantity"] for row in pending) == [1, 2, 3]
+    assert all(row["id"] < 0 for row in pending)
+    
+    assert flush_outbox(session_factory, batch_size=2) == 3
+    db.expire_all()
+    assert db.query(PurchaseHistoryOutbox).count() == 0
+    # Queue order is kept: history ids follow the purchases
+    assert [row.quantity for row in db.query(PurchaseHistory).order_by(PurchaseHistory.id)] == [1, 2, 3]
+    flushed = _history(client, auth_token)
+    assert sorted(row["quantity"] for row in flushed) == [1, 2, 3]
+    assert all(row["id"] > 0 for row in flushed)
+    assert flushed[0]["sweet_name"] == "Queued Toffee"
+    assert flush_outbox(session_factory) == 0
+
+def test_flusher_stop_flushes_queue(client, auth_token, db, session_factory, monkeypatch):
+    """Test that stopping the flusher (app shutdown) moves everything still queued"""
+    monkeypatch.setattr(settings, "PURCHASE_HISTORY_WRITE_BEHIND", True)
+    sweet_id = _sweet(db)
+    flusher = HistoryFlusher(interval_seconds=3600, batch_size=10)
+    flusher.start(session_factory)
+    try:
+        assert _buy(client, auth_token, sweet_id).status_code == status.HTTP_200_OK
+    finally:
+        flusher.stop()
+    
+    db.expire_all()
+    assert db.query(PurchaseHistoryOutbox).count() == 0
+    assert db.query(PurchaseHistory).count() == 1
+
+def test_purge_waits_for_queued_history(client, auth_token, db, session_factory, monkeypatch):
+    """Test that a deleted sweet with queued purchases is only purged after they are flushed"""
+    monkeypatch.setattr(settings, "PURCHASE_HISTORY_WRITE_BEHIND", True)
+    sweet_id = _sweet(db)
+    assert _buy(client, auth_token, sweet_id).status_code == status.HTTP_200_OK
+    db.query(Sweet).filter(Sweet.id == sweet_id).update({"deleted_at": func.now()})
+    db.commit()
+    
+    purge_deleted_sweets(session_factory, mode="delete", batch_size=10)
+    db.expire_all()
+    assert db.get(Sweet, sweet_id) is not None
+    
+    flush_outbox(session_factory)
+    assert purge_deleted_sweets(session_factory, mode="delete", batch_size=10) == {"sweets": 1, "purchases": 1}
+    db.expire_all()
+    assert db.get(Sweet, sweet_id) is None